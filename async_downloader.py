@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: async_downloader.py
+Update: 2026.10.18
+"""
+
+import os
+import time
+import asyncio
+import aiohttp
+
+from logger import logger
+from image_fetch import ImageFetcher, ImageRejected, HTTPStatusError
+from retry_policy import RetryQueue, PROXY
+from metrics import metrics
+
+
+class AsyncDownloader:
+    """
+    基于 asyncio/aiohttp 的图片下载引擎，同时保持大量请求在途。
+    concurrency 为全局并发上限，per_host 为单个主机的并发上限。
+    request_slots 为多个任务共享的请求并发上限（threading.Semaphore），在协程中非阻塞地获取，不会卡住事件循环。
+    """
+
+    def __init__(self, concurrency=200, per_host=8, timeout=10, should_stop=None, save_image=None, proxy_pool=None,
+                 on_failed=None, fetcher=None, on_rejected=None, rate_limiter=None, retry_policy=None,
+                 request_slots=None):
+        self.concurrency = max(1, int(concurrency))
+        self.per_host = max(1, int(per_host))
+        self.timeout = timeout
+        self.should_stop = should_stop or (lambda: False)
+        self.save_image = save_image or self._save_image
+        self.proxy_pool = proxy_pool
+        self.on_failed = on_failed
+        self.fetcher = fetcher or ImageFetcher()
+        self.on_rejected = on_rejected
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy  # 为 None 时失败不重试
+        self.request_slots = request_slots
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def download(self, tasks, download_path, get_user_agent, get_proxy):
+        """
+        tasks 为 (img_url, file_name) 的可迭代对象（file_name 不含扩展名），阻塞直到全部完成或被终止。
+        get_proxy 接受一个需要避开的代理（可能为 None），返回本次使用的代理。
+        """
+        return asyncio.run(self._run(tasks, download_path, get_user_agent, get_proxy))
+
+    async def _run(self, tasks, download_path, get_user_agent, get_proxy):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        retry_queue = RetryQueue(tasks)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            workers = [
+                asyncio.create_task(self._worker(session, retry_queue, download_path, get_user_agent, get_proxy))
+                for _ in range(self.concurrency)
+            ]
+            await asyncio.gather(*workers)
+
+        return self.downloaded
+
+    async def _worker(self, session, retry_queue, download_path, get_user_agent, get_proxy):
+        # 所有协程共享同一个任务队列，等待重试的任务不占用协程
+        while not self.should_stop():  # 如果处于终止状态，则退出下载任务
+            task = retry_queue.pop()
+            if task is None:
+                delay = retry_queue.next_delay()
+                if delay is None:
+                    return
+                await asyncio.sleep(min(delay, 0.5))
+                continue
+            await self._download_one(session, task, retry_queue, download_path, get_user_agent(),
+                                     get_proxy(task.avoid_proxy))
+
+    async def _download_one(self, session, task, retry_queue, download_path, user_agent, proxy):
+        img_url, file_name = task.item
+        headers = {
+            "User-Agent": user_agent,
+        }
+        # 与 requests 的 {"http": proxy} 保持一致，仅对 http 链接走代理
+        request_proxy = proxy if proxy and img_url.startswith('http://') else None
+
+        try:
+            logger.debug(f"Trying proxy: {proxy}")
+            if self.rate_limiter is not None:
+                await self.rate_limiter.async_acquire(img_url, request_proxy)
+            await self._acquire_slot()
+            start_time = time.time()
+            latency = None
+            try:
+                async with session.get(img_url, headers=headers, proxy=request_proxy) as response:
+                    # 与 requests 一致，收到响应头即视为请求成功
+                    latency = time.time() - start_time
+                    self._report_success(request_proxy, latency)
+                    metrics.observe_request(img_url, request_proxy, latency)
+                    image = await self.fetcher.async_fetch(response, download_path)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if latency is None:
+                    self._report_failure(request_proxy)
+                    metrics.observe_request(img_url, request_proxy, time.time() - start_time, ok=False)
+                raise
+            finally:
+                if self.request_slots is not None:
+                    self.request_slots.release()
+            logger.debug(f"Downloaded image data size: {image.size}")
+            # 保存时的去重、近似重复计算与后处理提交可能阻塞（反压），放到线程池中执行，不卡住事件循环
+            saved = await asyncio.get_running_loop().run_in_executor(None, self.save_image, image, img_url,
+                                                                     file_name, download_path)
+            if saved:
+                self.downloaded += 1
+            else:
+                self.skipped += 1
+        except ImageRejected as e:
+            # 类型或大小不符的图片不是下载失败，不计入代理失败
+            self.skipped += 1
+            if self.on_rejected is not None:
+                self.on_rejected(img_url, file_name, e)
+            else:
+                logger.warning(f"{file_name} does not match, do not download: {e}")
+        except Exception as e:
+            self._handle_failure(task, retry_queue, request_proxy, e)
+
+    async def _acquire_slot(self):
+        # 名额可能被其他线程中的任务占用，轮询等待而不阻塞事件循环
+        if self.request_slots is None:
+            return
+        while not self.request_slots.acquire(blocking=False):
+            await asyncio.sleep(0.01)
+
+    def _handle_failure(self, task, retry_queue, request_proxy, error):
+        img_url = task.item[0]
+        kind = delay = None
+        if self.retry_policy is not None:
+            kind, delay = self.retry_policy.reschedule(task, error, retry_queue, request_proxy)
+            metrics.observe_error(img_url, kind)
+            if kind == PROXY and isinstance(error, HTTPStatusError):
+                self._report_failure(request_proxy)
+            if delay is not None:
+                logger.warning(f"Retry {img_url} in {delay:.1f}s ({kind}, attempt {task.attempt}): {error}")
+                return
+
+        self.failed += 1
+        if self.on_failed is not None:
+            self.on_failed(img_url, kind)
+        logger.error(f"Failed to download {img_url} with proxy {request_proxy}: {error}")
+
+    def _report_success(self, proxy, latency):
+        if self.proxy_pool is not None:
+            self.proxy_pool.report_success(proxy, latency)
+
+    def _report_failure(self, proxy):
+        if self.proxy_pool is not None:
+            self.proxy_pool.report_failure(proxy)
+
+    @staticmethod
+    def _save_image(image, img_url, file_name, download_path):
+        # 大小已在下载时检查，这里只需移动到最终路径
+        file_name += image.extension  # 扩展名按图片的实际格式确定
+        image.commit(os.path.join(download_path, file_name))
+        logger.debug(f"Downloaded {file_name}")
+        return True
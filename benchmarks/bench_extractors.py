@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: bench_extractors.py
+Update: 2026.10.18
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractors import EXTRACTORS  # noqa: E402
+
+# 按各搜索引擎结果页的数据格式生成的合成页面（大量无关标签加上图片数据），不是真实抓取的结果页，
+# 只用于检查新旧解析结果一致以及粗略比较，速度数据不代表真实页面上的表现
+SYNTHETIC_PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'synthetic_pages')
+
+
+# 改造前的解析方式，作为对照
+def legacy_so(html):
+    img_urls_str = re.findall('"thumb":"(.*?)",', html, re.S)
+    return [url.replace('\\/', '/') for url in img_urls_str]
+
+
+def legacy_sogou(html):
+    img_urls_str = re.findall('"picUrl":"(.*?)",', html, re.S)
+    return [json.loads('"' + url + '"') for url in img_urls_str]
+
+
+def legacy_bing(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    urls = []
+    for link in soup.find_all('a', class_='iusc'):
+        m = link.attrs.get('m')
+        if m:
+            m_json = json.loads(m)
+            if 'murl' in m_json:
+                urls.append(m_json['murl'])
+    return urls
+
+
+def legacy_baidu(html):
+    return re.findall('"thumbURL":"(.*?)",', html, re.S)
+
+
+LEGACY_EXTRACTORS = {
+    '360': legacy_so,
+    'sogou': legacy_sogou,
+    'bing': legacy_bing,
+    'baidu': legacy_baidu,
+}
+
+
+def pages_per_second(extract, page, duration):
+    count = 0
+    start_time = time.perf_counter()
+    while True:
+        extract(page)
+        count += 1
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= duration:
+            return count / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark search result extractors against the legacy parsers")
+    parser.add_argument('-d', '--duration', type=float, default=1.0, help="seconds to run each extractor")
+    parser.add_argument('-p', '--pages', default=SYNTHETIC_PAGES_DIR,
+                        help="folder with one <engine>.html result page per engine; defaults to the bundled "
+                             "synthetic pages, pass real saved result pages for meaningful numbers")
+    args = parser.parse_args(argv)
+
+    if os.path.abspath(args.pages) == SYNTHETIC_PAGES_DIR:
+        print("Using synthetic pages: rates only show that both parsers agree, not real-page performance")
+    print(f"{'engine':<8}{'urls':>6}{'legacy pages/s':>18}{'new pages/s':>16}{'speedup':>10}")
+    for web_name, extract in EXTRACTORS.items():
+        page_path = os.path.join(args.pages, f"{web_name}.html")
+        if not os.path.exists(page_path):
+            print(f"{web_name}: no page at {page_path}, skipped")
+            continue
+        with open(page_path, 'r', encoding='utf-8') as file:
+            page = file.read()
+
+        legacy = LEGACY_EXTRACTORS[web_name]
+        urls = extract(page)
+        if urls != legacy(page):
+            print(f"{web_name}: extracted URLs differ from the legacy parser")
+            return 1
+
+        legacy_rate = pages_per_second(legacy, page, args.duration)
+        new_rate = pages_per_second(extract, page, args.duration)
+        print(f"{web_name:<8}{len(urls):>6}{legacy_rate:>18.1f}{new_rate:>16.1f}{new_rate / legacy_rate:>9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: cli.py
+Update: 2026.10.18
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+
+from logger import logger, set_verbosity
+from utils import pic_utils
+from search_engines import engine_names
+from scheduler import JobScheduler, combine_summaries
+
+
+def read_keywords(source, default_num):
+    """
+    读取关键词列表，每行一个关键词，可用 “关键词,数量” 单独指定下载数量，# 开头为注释。
+    source 为 '-' 时从标准输入读取。
+    """
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as file:
+            lines = file.read().splitlines()
+
+    keywords = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        keyword, _, num = line.rpartition(',')
+        if keyword and num.strip().isdigit():
+            keywords.append((keyword.strip(), int(num)))
+        else:
+            keywords.append((line, default_num))
+    return keywords
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless image crawler")
+    parser.add_argument('-k', '--keywords', default='-',
+                        help="keyword file, one 'keyword' or 'keyword,count' per line; '-' reads stdin")
+    parser.add_argument('-e', '--engines', nargs='+', default=['baidu'], choices=engine_names() + ['all'],
+                        help="search engines to crawl")
+    parser.add_argument('-n', '--num', type=int, default=100, help="default number of images per keyword")
+    parser.add_argument('-o', '--output', default='downloads', help="root download folder")
+    parser.add_argument('-j', '--jobs', type=int, default=4, help="number of keyword jobs running at the same time")
+    parser.add_argument('-w', '--workers', type=int,
+                        help="download threads shared by all jobs, taken in turn; defaults to threads_num")
+    parser.add_argument('--max-requests', type=int, default=50,
+                        help="global limit of concurrent HTTP requests across all jobs")
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="override log_level from settings; DEBUG also logs every URL")
+    return parser.parse_args(argv)
+
+
+def format_summary(name, summary):
+    elapsed = max(summary['elapsed'], 1e-6)
+    line = (f"{name}: found {summary['urls_found']}, downloaded {summary['downloaded']}, "
+            f"skipped {summary['skipped']}, failed {summary['failed']}, "
+            f"{summary['downloaded'] / elapsed:.2f} images/s, "
+            f"{summary['bytes'] / elapsed / 1024 / 1024:.2f} MB/s, {elapsed:.1f}s")
+    formats = {fmt: count for fmt, count in summary.get('formats', {}).items() if count}
+    if formats:
+        line += " [" + ", ".join(f"{fmt} {count}" for fmt, count in sorted(formats.items())) + "]"
+    return line
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.log_level:
+        set_verbosity(args.log_level)
+    keywords = read_keywords(args.keywords, args.num)
+    if not keywords:
+        logger.error("No keywords given.")
+        return 1
+
+    # 所有任务共享连接池、代理池、按主机限速、全局请求并发上限、搜索结果缓存与下载线程
+    scheduler = JobScheduler(pic_utils(), max_jobs=args.jobs, max_workers=args.workers,
+                             max_requests=args.max_requests)
+    for keyword, num_images in keywords:
+        for web_name in args.engines:
+            scheduler.add(keyword, web_name, num_images, os.path.join(args.output, keyword))
+
+    start_time = time.time()
+    try:
+        jobs = scheduler.run()
+    finally:
+        scheduler.close()
+
+    failed_jobs = 0
+    print("==== Summary ====")
+    for job in jobs:
+        if job.summary is None:
+            # 失败或因中断未运行的任务
+            failed_jobs += job.status == 'failed'
+            print(f"{job.name}: job {job.status}")
+            continue
+        print(format_summary(job.name, job.summary))
+    totals = combine_summaries(job.summary for job in jobs if job.summary is not None)
+    totals['elapsed'] = time.time() - start_time
+    print(format_summary(f"TOTAL ({len(jobs)} jobs, {failed_jobs} failed)", totals))
+    return 1 if failed_jobs else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: dedup.py
+Update: 2026.10.18
+"""
+
+import os
+import json
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from logger import logger
+
+INDEX_FILE_NAME = '.dedup_index.jsonl'
+
+# 下载目录的绝对路径 -> 共用的 DedupIndex
+_shared_indexes = {}
+_shared_lock = threading.Lock()
+
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    # 去掉默认端口
+    if scheme == 'http' and netloc.endswith(':80'):
+        netloc = netloc[:-3]
+    elif scheme == 'https' and netloc.endswith(':443'):
+        netloc = netloc[:-4]
+    # 查询参数排序，忽略锚点
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+
+def unique_urls(img_urls):
+    """
+    按归一化后的链接去重，保持原有顺序。
+    """
+    seen = set()
+    result = []
+    for img_url in img_urls:
+        key = normalize_url(img_url)
+        if key not in seen:
+            seen.add(key)
+            result.append(img_url)
+    return result
+
+
+def open_dedup_index(download_path=None, persist=False):
+    """
+    返回下载目录共用的 DedupIndex：同一目录中同时运行的多个任务（如同一关键词的多个搜索引擎）
+    共享一个实例与索引文件，最后一个使用者 close() 后才关闭文件。不持久化时每次返回独立的实例。
+    """
+    if not (persist and download_path):
+        return DedupIndex(download_path, persist)
+    key = os.path.abspath(download_path)
+    with _shared_lock:
+        index = _shared_indexes.get(key)
+        if index is None:
+            index = DedupIndex(download_path, persist=True)
+            index._shared_key = key
+            _shared_indexes[key] = index
+        else:
+            index._users += 1
+        return index
+
+
+class DedupIndex:
+    """
+    下载去重索引：下载前按归一化链接去重，下载后按内容 SHA-1 去重。
+    persist 为 True 时在下载目录中维护索引文件，重复运行时跳过已下载的内容。
+    """
+
+    def __init__(self, download_path=None, persist=False):
+        self.seen_urls = set()
+        self.seen_hashes = set()
+        self._lock = threading.Lock()
+        self._index_file = None
+        self._users = 1  # 通过 open_dedup_index 共享时的使用者数量
+        self._shared_key = None
+
+        if persist and download_path:
+            index_path = os.path.join(download_path, INDEX_FILE_NAME)
+            self._load(index_path, download_path)
+            self._index_file = open(index_path, 'a', encoding='utf-8')
+
+    def _load(self, index_path, download_path):
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                # 文件已被删除的记录不再生效
+                if not os.path.exists(os.path.join(download_path, entry.get('file', ''))):
+                    continue
+                self.seen_urls.add(entry['url'])
+                self.seen_hashes.add(entry['sha1'])
+        logger.info(f"Loaded {len(self.seen_hashes)} downloaded images from dedup index")
+
+    def add_url(self, img_url):
+        """
+        记录链接，首次出现返回 True，重复返回 False。
+        """
+        key = normalize_url(img_url)
+        with self._lock:
+            if key in self.seen_urls:
+                return False
+            self.seen_urls.add(key)
+            return True
+
+    def add_digest(self, digest):
+        """
+        记录已计算好的内容 SHA-1，首次出现返回 True。
+        """
+        with self._lock:
+            if digest in self.seen_hashes:
+                return False
+            self.seen_hashes.add(digest)
+            return True
+
+    def discard_content(self, digest):
+        # 内容未能成功保存时撤销记录，允许后续再次下载
+        with self._lock:
+            self.seen_hashes.discard(digest)
+
+    def record(self, img_url, digest, file_name):
+        if self._index_file is None:
+            return
+        line = json.dumps({'url': normalize_url(img_url), 'sha1': digest, 'file': file_name}, ensure_ascii=False)
+        with self._lock:
+            self._index_file.write(line + '\n')
+            self._index_file.flush()
+
+    def close(self):
+        with _shared_lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+            if self._shared_key is not None:
+                _shared_indexes.pop(self._shared_key, None)
+        with self._lock:
+            if self._index_file is not None:
+                self._index_file.close()
+                self._index_file = None
@@ -0,0 +1,455 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: distributed.py
+Update: 2026.10.18
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+import multiprocessing
+
+from logger import logger, set_verbosity
+from utils import pic_utils
+from cli import read_keywords, format_summary
+from dedup import unique_urls, normalize_url
+from image_fetch import ImageRejected
+from job_process import JobStats, last_file_index
+from metrics import start_reporter, start_http_server
+from retry_policy import RetryTask, TRANSIENT
+from scheduler import JobScheduler, combine_summaries
+from search_engines import ENGINES, engine_names
+from task_queue import TaskQueue, serve_queue, connect_queue
+
+TIME_SETTINGS_PATH = 'setting/time_settings.toml'
+
+
+def job_engines(web_name):
+    return engine_names() if web_name == 'all' else [web_name]
+
+
+class SharedDedup:
+    """
+    在任务队列中以下载任务 task_id 的名义登记图片内容摘要，接口与 DedupIndex 的内容去重部分相同，所有节点共享。
+    """
+
+    def __init__(self, task_queue, job_id, task_id):
+        self.task_queue = task_queue
+        self.job_id = job_id
+        self.task_id = task_id
+
+    def add_digest(self, digest):
+        return self.task_queue.claim_digest(self.job_id, digest, self.task_id)
+
+    def discard_content(self, digest):
+        self.task_queue.release_digest(self.job_id, digest, self.task_id)
+
+    def record(self, img_url, digest, file_name):
+        self.task_queue.record_digest(self.job_id, digest, img_url, file_name)
+
+
+class LeaseRetry:
+    """
+    把 RetryPolicy 的重试请求转为任务队列中的延迟重新排队，接口与 RetryQueue.push 相同。
+    """
+
+    def __init__(self, task_queue, task_id, worker_id):
+        self.task_queue = task_queue
+        self.task_id = task_id
+        self.worker_id = worker_id
+        self.pushed = False
+
+    def push(self, task, delay=0.0):
+        self.task_queue.retry(self.task_id, self.worker_id, delay, task.attempt, task.avoid_proxy)
+        self.pushed = True
+
+
+class Coordinator:
+    """
+    把 (关键词, 搜索引擎, 数量) 任务拆分为搜索页任务写入队列，工作进程搜索到的链接作为下载任务加入同一队列。
+    定期检查进度：下载够数量的任务提前结束，其余子任务取消；搜索页全部完成仍不够数量时，
+    除非末尾连续 search_empty_pages 页都没有新链接（获取失败的页面不计入），否则追加搜索页，
+    最多追加到预计页数的 search_max_pages_factor 倍。
+    """
+
+    def __init__(self, task_queue, pic_utils_instance):
+        self.task_queue = task_queue
+        time_settings = pic_utils_instance.get_settings(TIME_SETTINGS_PATH)
+        self.fan_out = max(1, time_settings.get('search_threads_num', 4))
+        self.max_pages_factor = max(1, time_settings.get('search_max_pages_factor', 3))
+        self.empty_pages = max(1, time_settings.get('search_empty_pages', 2))
+        self.poll_interval = time_settings.get('distributed_poll_interval', 1.0)
+        self.progress_interval = time_settings.get('scheduler_progress_interval', 10)
+
+    def submit(self, keyword, web_name, num_images, download_folder):
+        engines = job_engines(web_name)
+        page_count = max(ENGINES[engine].page_count(num_images) for engine in engines)
+        job_id, created = self.task_queue.add_job(keyword, web_name, num_images, download_folder,
+                                                  page_count * self.max_pages_factor,
+                                                  last_file_index(download_folder, f"{keyword}_{web_name}"))
+        if created:
+            self.task_queue.add_search_pages(job_id, engines, 0, page_count)
+        else:
+            logger.info(f"Job {keyword}/{web_name} already queued, resuming")
+        return job_id
+
+    def update(self):
+        """
+        检查各任务进度，返回仍在运行的任务数。
+        """
+        self.task_queue.requeue_expired()
+        running = 0
+        for job in self.task_queue.jobs():
+            if job['status'] != 'running':
+                continue
+            name = f"{job['keyword']}/{job['web_name']}"
+            if job['downloaded'] >= job['num_images']:
+                self.task_queue.finish_job(job['id'])
+                logger.info(f"Job {name} finished: downloaded {job['downloaded']}/{job['num_images']}")
+                continue
+
+            counts = self.task_queue.task_counts(job['id'])
+            if any(count for (_, status), count in counts.items() if status in ('pending', 'leased')):
+                running += 1
+                continue
+
+            # 已有子任务全部结束但数量不足
+            next_pn = job['next_pn']
+            if next_pn < job['max_pages'] and self.task_queue.trailing_empty_pages(job['id']) < self.empty_pages:
+                end_pn = min(job['max_pages'], next_pn + self.fan_out)
+                self.task_queue.add_search_pages(job['id'], job_engines(job['web_name']), next_pn, end_pn)
+                logger.info(f"Job {name} has {job['downloaded']}/{job['num_images']} images, "
+                            f"searching pages {next_pn}-{end_pn - 1}")
+                running += 1
+            else:
+                self.task_queue.finish_job(job['id'])
+                logger.info(f"Job {name} finished: no more results, "
+                            f"downloaded {job['downloaded']}/{job['num_images']}, "
+                            f"failed pages {counts.get(('search', 'failed'), 0)}")
+        return running
+
+    def log_progress(self):
+        for job in self.task_queue.jobs():
+            if job['status'] != 'running':
+                continue
+            counts = self.task_queue.task_counts(job['id'])
+            logger.info(f"{job['keyword']}/{job['web_name']}: downloaded {job['downloaded']}/{job['num_images']}, "
+                        f"pending {counts.get(('download', 'pending'), 0)}, "
+                        f"leased {counts.get(('download', 'leased'), 0)}, "
+                        f"failed {counts.get(('download', 'failed'), 0)}, "
+                        f"pages {counts.get(('search', 'done'), 0)}, "
+                        f"failed pages {counts.get(('search', 'failed'), 0)}")
+
+    def run(self):
+        """
+        阻塞直到所有任务结束，返回各任务的最终状态。
+        """
+        next_report = time.time() + self.progress_interval
+        while self.update() > 0:
+            if self.progress_interval and time.time() >= next_report:
+                self.log_progress()
+                next_report = time.time() + self.progress_interval
+            time.sleep(self.poll_interval)
+        return self.task_queue.jobs()
+
+
+class Worker:
+    """
+    从任务队列租用搜索页与下载任务，用 JobProcessor 执行后汇报结果。
+    num_threads 个线程同时执行任务，心跳线程定期延长本进程持有的所有租约；
+    进程崩溃后租约过期，任务由其他工作进程重新执行。
+    每个节点使用自己的代理池、连接池与限速，近似重复过滤只在单机模式中可用。
+    开启后处理时，图片校验通过后才汇报下载完成。
+    """
+
+    def __init__(self, task_queue, pic_utils_instance, worker_id=None, num_threads=None):
+        self.task_queue = task_queue
+        time_settings = pic_utils_instance.get_settings(TIME_SETTINGS_PATH)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.num_threads = max(1, num_threads or time_settings.get('threads_num', 10))
+        self.lease_seconds = time_settings.get('distributed_lease_seconds', 60)
+        self.poll_interval = time_settings.get('distributed_poll_interval', 1.0)
+        self.metrics_interval = time_settings.get('metrics_interval', 10)
+        self.metrics_port = time_settings.get('metrics_port', 0)
+        # 为各任务创建共用连接池、代理池、限速与搜索结果缓存的 JobProcessor
+        self.resources = JobScheduler(pic_utils_instance, max_workers=self.num_threads)
+        self.processors = {}  # 任务编号 -> (任务信息, JobProcessor, ImageFetcher)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _job_processor(self, job_id):
+        with self._lock:
+            entry = self.processors.get(job_id)
+            if entry is None:
+                job = self.task_queue.get_job(job_id)
+                processor = self.resources.create_processor()
+                processor.stats = JobStats(job['web_name'])
+                os.makedirs(job['download_folder'], exist_ok=True)
+                entry = (job, processor, processor.create_image_fetcher())
+                self.processors[job_id] = entry
+            return entry
+
+    def run(self, wait=False):
+        """
+        执行任务直到所有任务结束（wait 为 True 时一直等待新任务），返回本进程各任务的统计。
+        """
+        logger.info(f"Worker {self.worker_id} started with {self.num_threads} threads")
+        start_reporter(self.metrics_interval)
+        start_http_server(self.metrics_port)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat.start()
+        threads = [threading.Thread(target=self._work_loop, args=(wait,), daemon=True)
+                   for _ in range(self.num_threads)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            logger.warning("Interrupted, stopping worker...")
+            self.stop()
+            for thread in threads:
+                thread.join()
+        finally:
+            self._stop.set()
+            heartbeat.join()
+
+        summaries = {}
+        for job, processor, _ in self.processors.values():
+            processor.wait_post_processing()
+            summaries[f"{job['keyword']}/{job['web_name']}"] = processor.stats.summary()
+        self.resources.close()
+        return summaries
+
+    def stop(self):
+        self._stop.set()
+        for _, processor, _ in list(self.processors.values()):
+            processor.terminate_download()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self.task_queue.heartbeat(self.worker_id, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Heartbeat failed: {e}")
+
+    def _finished(self):
+        # 队列中已有任务且全部结束
+        jobs = self.task_queue.jobs()
+        return bool(jobs) and all(job['status'] != 'running' for job in jobs)
+
+    def _work_loop(self, wait):
+        while not self._stop.is_set():
+            try:
+                task = self.task_queue.lease(self.worker_id, self.lease_seconds)
+                if task is None:
+                    if not wait and self._finished():
+                        return
+                    self._stop.wait(self.poll_interval)
+                    continue
+            except Exception as e:
+                logger.error(f"Failed to lease a task: {e}")
+                self._stop.wait(self.poll_interval)
+                continue
+
+            try:
+                if task.kind == 'search':
+                    self.search(task)
+                else:
+                    self.download(task)
+            except Exception as e:
+                logger.error(f"Task {task.id} failed: {e}")
+                self.task_queue.complete(task.id, self.worker_id, 'failed')
+
+    def search(self, task):
+        job, processor, _ = self._job_processor(task.job_id)
+        engine, pn = task.payload['engine'], task.payload['pn']
+        img_urls = processor.search_page(engine, job['keyword'], pn)
+        if img_urls is None:
+            # 获取失败的页面不能当作空页，按重试策略稍后重新排队，由其他线程或节点再次获取
+            if processor.terminate:
+                self.task_queue.retry(task.id, self.worker_id, 0, task.attempts)
+                return
+            attempts = task.attempts + 1
+            delay = processor.retry_policy.retry_delay(TRANSIENT, attempts)
+            if delay is None:
+                logger.error(f"Search page {pn} of {engine} failed {attempts} times, giving up")
+                self.task_queue.complete(task.id, self.worker_id, 'failed')
+            else:
+                logger.warning(f"Search page {pn} of {engine} failed, retrying in {delay:.1f}s")
+                self.task_queue.retry(task.id, self.worker_id, delay, attempts)
+            return
+        found = self.task_queue.add_downloads(
+            task.job_id, [(normalize_url(img_url), img_url) for img_url in unique_urls(img_urls)])
+        processor.stats.add('urls_found', found)
+        self.task_queue.complete(task.id, self.worker_id, 'done', found)
+
+    def download(self, task):
+        job, processor, fetcher = self._job_processor(task.job_id)
+        img_url = task.payload['url']
+        download_path = job['download_folder']
+        dedup = SharedDedup(self.task_queue, task.job_id, task.id)
+        retry = LeaseRetry(self.task_queue, task.id, self.worker_id)
+        retry_task = RetryTask(img_url, task.attempts, task.avoid_proxy)
+        proxy = processor.proxy_pool.choose(exclude=task.avoid_proxy)
+        try:
+            logger.debug(f"Trying proxy: {proxy}")
+            image = processor.download_image(img_url, proxy, download_path, fetcher)
+            phash = processor.check_image(image, img_url, dedup)
+            if phash is False:
+                self.task_queue.complete(task.id, self.worker_id, 'skipped')
+                return
+            # 成功后才分配序号，保证各节点的文件名连续且不超过 num_images；重新排队的任务沿用原序号
+            idx = self.task_queue.claim_slot(task.job_id, task.id)
+            if idx is None:
+                image.discard()
+                dedup.discard_content(image.digest)
+                self.task_queue.complete(task.id, self.worker_id, 'cancelled')
+                return
+            name = f"{job['keyword']}_{job['web_name']}_{job['name_base'] + idx}"
+            checked = []
+            checked_event = threading.Event()
+
+            def on_checked(valid):
+                checked.append(valid)
+                checked_event.set()
+
+            processor.write_image(image, img_url, name, download_path, dedup, None, phash, on_checked=on_checked)
+            # 开启后处理时等校验结果返回：无效图片已被删除，记为跳过并释放序号与摘要，由其他图片补足数量
+            if processor.post_processor is not None:
+                checked_event.wait()
+                if not checked[0]:
+                    self.task_queue.complete(task.id, self.worker_id, 'skipped')
+                    return
+            self.task_queue.complete(task.id, self.worker_id, 'done')
+        except Exception as e:
+            processor.handle_failure(retry_task, img_url, img_url, proxy, e, retry)
+            if not retry.pushed:
+                status = 'skipped' if isinstance(e, ImageRejected) else 'failed'
+                self.task_queue.complete(task.id, self.worker_id, status)
+
+
+QUEUE_HELP = "task queue database on this machine, or tcp://host:port of a queue served with 'serve'"
+
+
+def open_task_queue(spec, max_attempts, authkey):
+    """
+    spec 为 tcp://host:port 时连接队列服务，否则直接打开本机的数据库文件。
+    """
+    if spec.startswith('tcp://'):
+        if not authkey:
+            raise ValueError("A shared key is required for a tcp:// queue, use --authkey or CRAWLER_QUEUE_KEY")
+        host, port = spec[len('tcp://'):].rsplit(':', 1)
+        return connect_queue(host, int(port), authkey.encode('utf-8'))
+    return TaskQueue(spec, max_attempts=max_attempts)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Distributed image crawler backed by a shared SQLite task queue")
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="override log_level from settings; DEBUG also logs every URL")
+    parser.add_argument('--authkey', default=os.environ.get('CRAWLER_QUEUE_KEY', ''),
+                        help="shared key of the tcp queue service, defaults to $CRAWLER_QUEUE_KEY")
+    subparsers = parser.add_subparsers(dest='role', required=True)
+
+    serve = subparsers.add_parser('serve', help="serve a local queue database to other machines over TCP")
+    serve.add_argument('-q', '--queue', required=True, help="task queue database on this machine")
+    serve.add_argument('-l', '--listen', default='0.0.0.0:7070', help="host:port to listen on")
+
+    coordinator = subparsers.add_parser('coordinator', help="queue keyword jobs and track them until finished")
+    coordinator.add_argument('-q', '--queue', required=True, help=QUEUE_HELP)
+    coordinator.add_argument('-k', '--keywords', default='-',
+                             help="keyword file, one 'keyword' or 'keyword,count' per line; '-' reads stdin")
+    coordinator.add_argument('-e', '--engines', nargs='+', default=['baidu'], choices=engine_names() + ['all'],
+                             help="search engines to crawl")
+    coordinator.add_argument('-n', '--num', type=int, default=100, help="default number of images per keyword")
+    coordinator.add_argument('-o', '--output', default='downloads',
+                             help="root download folder, the same path is used on every worker node")
+
+    worker = subparsers.add_parser('worker', help="lease and run tasks from the queue")
+    worker.add_argument('-q', '--queue', required=True, help=QUEUE_HELP)
+    worker.add_argument('-t', '--threads', type=int, help="tasks run at the same time, defaults to threads_num")
+    worker.add_argument('--id', help="worker name, defaults to host name and process id")
+    worker.add_argument('--wait', action='store_true', help="keep waiting for new jobs when all jobs are finished")
+    return parser.parse_args(argv)
+
+
+def run_coordinator(args, task_queue):
+    keywords = read_keywords(args.keywords, args.num)
+    if not keywords:
+        logger.error("No keywords given.")
+        return 1
+
+    coordinator = Coordinator(task_queue, pic_utils())
+    for keyword, num_images in keywords:
+        for web_name in args.engines:
+            coordinator.submit(keyword, web_name, num_images, os.path.join(args.output, keyword))
+
+    start_time = time.time()
+    jobs = coordinator.run()
+    print("==== Summary ====")
+    for job in jobs:
+        print(f"{job['keyword']}/{job['web_name']}: downloaded {job['downloaded']}/{job['num_images']}")
+    print(f"TOTAL ({len(jobs)} jobs): downloaded {sum(job['downloaded'] for job in jobs)}, "
+          f"{time.time() - start_time:.1f}s")
+    return 0
+
+
+def run_worker(args, task_queue):
+    worker = Worker(task_queue, pic_utils(), args.id, args.threads)
+    start_time = time.time()
+    summaries = worker.run(wait=args.wait)
+    print(f"==== Worker {worker.worker_id} ====")
+    for name, summary in summaries.items():
+        print(format_summary(name, summary))
+    totals = combine_summaries(summaries.values())
+    totals['elapsed'] = time.time() - start_time
+    print(format_summary(f"TOTAL ({len(summaries)} jobs)", totals))
+    return 0
+
+
+def run_server(args, task_queue):
+    if not args.authkey:
+        logger.error("A shared key is required, use --authkey or CRAWLER_QUEUE_KEY")
+        return 1
+    host, port = args.listen.rsplit(':', 1)
+    logger.info(f"Serving task queue {args.queue} on tcp://{host}:{port}")
+    try:
+        serve_queue(task_queue, host, int(port), args.authkey.encode('utf-8'))
+    except KeyboardInterrupt:
+        logger.info("Queue service stopped")
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.log_level:
+        set_verbosity(args.log_level)
+    time_settings = pic_utils().get_settings(TIME_SETTINGS_PATH)
+    max_attempts = time_settings.get('retry_max_attempts', 4)
+    if args.role == 'serve':
+        return run_server(args, TaskQueue(args.queue, max_attempts=max_attempts))
+    try:
+        task_queue = open_task_queue(args.queue, max_attempts, args.authkey)
+    except (ValueError, OSError, multiprocessing.AuthenticationError) as e:
+        logger.error(f"Failed to open task queue {args.queue}: {e}")
+        return 1
+    try:
+        if args.role == 'coordinator':
+            return run_coordinator(args, task_queue)
+        return run_worker(args, task_queue)
+    finally:
+        task_queue.close()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: extractors.py
+Update: 2026.10.18
+"""
+
+import re
+import json
+import html
+
+# 链接中不会出现引号，用 [^"]* 代替 (.*?) 的非贪婪匹配，避免逐字符回溯
+SO_THUMB_PATTERN = re.compile(r'"thumb":"([^"]*)",')
+SOGOU_PIC_URL_PATTERN = re.compile(r'"picUrl":"([^"]*)",')
+BAIDU_THUMB_URL_PATTERN = re.compile(r'"thumbURL":"([^"]*)",')
+# a 标签的属性部分，允许引号内出现 >
+BING_A_TAG_PATTERN = re.compile(r'<a\s((?:[^>"]|"[^"]*")*)>')
+BING_IUSC_CLASS_PATTERN = re.compile(r'\bclass="(?:[^"]*\s)?iusc(?:\s[^"]*)?"')
+# m 属性是 HTML 转义后的 JSON，直接在转义文本中匹配 murl，只对链接本身反转义
+BING_MURL_PATTERN = re.compile(r'&quot;murl&quot;:\s*&quot;(.*?)&quot;')
+
+
+def decode_json_strings(values):
+    """
+    批量解析 JSON 字符串的转义字符，整页只调用一次 json.loads。
+    """
+    if not values:
+        return []
+    try:
+        return json.loads('["' + '","'.join(values) + '"]')
+    except ValueError:
+        # 个别链接的转义不合法时逐个解析，跳过无法解析的链接
+        urls = []
+        for value in values:
+            try:
+                urls.append(json.loads('"' + value + '"'))
+            except ValueError:
+                continue
+        return urls
+
+
+def extract_so(page):
+    # 360 的链接只转义了斜杠
+    return [url.replace('\\/', '/') for url in SO_THUMB_PATTERN.findall(page)]
+
+
+def extract_sogou(page):
+    return decode_json_strings(SOGOU_PIC_URL_PATTERN.findall(page))
+
+
+def extract_baidu(page):
+    return BAIDU_THUMB_URL_PATTERN.findall(page)
+
+
+def extract_bing(page):
+    """
+    提取 a.iusc 标签 m 属性（HTML 转义的 JSON）中的 murl，无需构建整棵文档树。
+    """
+    values = []
+    for attrs in BING_A_TAG_PATTERN.findall(page):
+        if 'iusc' not in attrs or BING_IUSC_CLASS_PATTERN.search(attrs) is None:
+            continue
+        murl = BING_MURL_PATTERN.search(attrs)
+        if murl is not None:
+            values.append(html.unescape(murl.group(1)))
+    return decode_json_strings(values)
+
+
+# 搜索引擎 -> 结果页链接提取函数
+EXTRACTORS = {
+    '360': extract_so,
+    'sogou': extract_sogou,
+    'bing': extract_bing,
+    'baidu': extract_baidu,
+}
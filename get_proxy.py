@@ -5,66 +5,71 @@ Project Name: Crawler
 File Created: 2024.05.29
 Author: ZhangYuetao
 File Name: get_proxy.py
-Update: 2024.05.30
+Update: 2026.10.18
 """
 
 import os
+import time
 import requests
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 # 配置日志记录
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_PROBE_URL = "http://www.baidu.com"
 
-def get_zdaye_proxies(num_pages=5):
+
+def get_zdaye_page_proxies(page, timeout=10):
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
     }
 
-    base_url = "https://www.zdaye.com/free"
-
-    all_proxies = []
+    url = f"https://www.zdaye.com/free/{page}/"
 
-    for page in range(1, num_pages + 1):
-        url = f"{base_url}/{page}/"
-        try:
-            logger.info(f"Fetching proxies from {url}")
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
+    try:
+        logger.info(f"Fetching proxies from {url}")
+        response = requests.get(url, headers=headers, timeout=timeout)
+        response.raise_for_status()
 
-            html_content = response.text
-            soup = BeautifulSoup(html_content, "html.parser")
+        html_content = response.text
+        soup = BeautifulSoup(html_content, "html.parser")
 
-            # 根据网页结构，找到包含IP的表格
-            proxy_table = soup.find("table", attrs={"id": "ipc"})
-            if not proxy_table:
-                logger.error("Proxy table not found on page {page}.")
-                continue
+        # 根据网页结构，找到包含IP的表格
+        proxy_table = soup.find("table", attrs={"id": "ipc"})
+        if not proxy_table:
+            logger.error(f"Proxy table not found on page {page}.")
+            return []
 
-            # 提取表格中的所有行
-            rows = proxy_table.find_all("tr")
+        # 提取表格中的所有行
+        rows = proxy_table.find_all("tr")
 
-            # 跳过表头，从第二行开始
-            proxies = []
-            for row in rows[1:]:
-                cols = row.find_all("td")
-                if len(cols) > 1:
-                    ip = cols[0].text.strip()
-                    port = cols[1].text.strip()
-                    proxies.append(f"{ip}:{port}")
+        # 跳过表头，从第二行开始
+        proxies = []
+        for row in rows[1:]:
+            cols = row.find_all("td")
+            if len(cols) > 1:
+                ip = cols[0].text.strip()
+                port = cols[1].text.strip()
+                proxies.append(f"{ip}:{port}")
+
+        logger.info(f"Found proxies on page {page}: {proxies}")
+        return proxies
+    except Exception as e:
+        logger.error(f"Failed to fetch proxies from {url}: {e}")
+        return []
 
-            logger.info(f"Found proxies on page {page}: {proxies}")
-            all_proxies.extend(proxies)
-        except Exception as e:
-            logger.error(f"Failed to fetch proxies from {url}: {e}")
-            continue
 
-    return all_proxies
+def get_zdaye_proxies(num_pages=5, timeout=10):
+    # 各页并发获取，结果按页码顺序合并
+    with ThreadPoolExecutor(max_workers=max(1, num_pages)) as executor:
+        pages = executor.map(lambda page: get_zdaye_page_proxies(page, timeout), range(1, num_pages + 1))
+        return [proxy for proxies in pages for proxy in proxies]
 
 
-def get_docip_proxies():
+def get_docip_proxies(timeout=10):
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
     }
@@ -73,7 +78,7 @@ def get_docip_proxies():
 
     try:
         logger.info(f"Fetching proxies from {url}")
-        response = requests.get(url, headers=headers)
+        response = requests.get(url, headers=headers, timeout=timeout)
         response.raise_for_status()
 
         html_content = response.text
@@ -106,3 +111,49 @@ def save_proxies_to_file(proxies, file_path):
         logger.info(f"Proxies saved to {file_path}")
     except Exception as e:
         logger.error(f"Failed to save proxies to file: {e}")
+
+
+def harvest_proxies(num_pages=5, timeout=10):
+    """
+    并行从所有来源获取候选代理，统一为 http:// 前缀并去重。
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        zdaye_future = executor.submit(get_zdaye_proxies, num_pages, timeout)
+        docip_future = executor.submit(get_docip_proxies, timeout)
+        candidates = zdaye_future.result() + docip_future.result()
+
+    proxies = []
+    for proxy in candidates:
+        if not proxy.startswith(('http://', 'https://')):
+            proxy = f"http://{proxy}"
+        if proxy not in proxies:
+            proxies.append(proxy)
+    return proxies
+
+
+def validate_proxy(proxy, probe_url=DEFAULT_PROBE_URL, timeout=5):
+    """
+    通过代理请求探测地址，可用时返回耗时（秒），不可用返回 None。
+    """
+    start_time = time.time()
+    try:
+        response = requests.get(probe_url, proxies={'http': proxy, 'https': proxy}, timeout=timeout)
+        response.raise_for_status()
+    except Exception:
+        return None
+    return time.time() - start_time
+
+
+def validate_proxies(proxies, probe_url=DEFAULT_PROBE_URL, timeout=5, max_workers=50):
+    """
+    并发验证全部代理，只返回可用代理，按耗时从低到高排序。
+    """
+    if not proxies:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(proxies))) as executor:
+        latencies = list(executor.map(lambda proxy: validate_proxy(proxy, probe_url, timeout), proxies))
+
+    live = sorted((latency, proxy) for proxy, latency in zip(proxies, latencies) if latency is not None)
+    logger.info(f"{len(live)} of {len(proxies)} proxies passed validation")
+    return [proxy for _, proxy in live]
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: image_fetch.py
+Update: 2026.10.18
+"""
+
+import os
+import hashlib
+import tempfile
+
+# 允许的非 image/* 内容类型（部分图床不返回准确的类型）
+BINARY_CONTENT_TYPES = ('application/octet-stream', 'binary/octet-stream')
+
+# 识别图片格式所需的文件头字节数
+SNIFF_BYTES = 16
+
+# 图片格式 -> 该格式可用的扩展名，第一个为保存时使用的扩展名；下载与后处理共用这张表
+IMAGE_FORMATS = {
+    'jpeg': ('.jpg', '.jpeg'),
+    'png': ('.png',),
+    'gif': ('.gif',),
+    'webp': ('.webp',),
+    'bmp': ('.bmp',),
+    'tiff': ('.tif', '.tiff'),
+    'avif': ('.avif',),
+    'heic': ('.heic', '.heif'),
+}
+
+# Pillow 中名称与上表不同的格式
+PILLOW_FORMAT_ALIASES = {
+    'MPO': 'jpeg',
+    'HEIF': 'heic',
+}
+
+
+def format_key(image_format):
+    """
+    把 Pillow 的格式名称（如 JPEG、TIFF）转换为 IMAGE_FORMATS 中的名称。
+    """
+    return PILLOW_FORMAT_ALIASES.get(image_format, image_format.lower())
+
+
+def format_extension(image_format):
+    return IMAGE_FORMATS[format_key(image_format)][0]
+
+
+def sniff_image_format(head):
+    """
+    根据文件头（魔数）识别图片格式，不是已知的图片格式时返回 None。
+    """
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head.startswith(b'BM'):
+        return 'bmp'
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'tiff'
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        if brand in (b'avif', b'avis'):
+            return 'avif'
+        if brand in (b'heic', b'heix', b'mif1', b'msf1'):
+            return 'heic'
+    return None
+
+
+class ImageRejected(Exception):
+    """
+    响应不是可保存的图片（类型或大小不符），属于永久性失败，无需重试。
+    """
+
+
+class HTTPStatusError(Exception):
+    """
+    图片请求返回了错误状态码，retry_after 为响应中的 Retry-After 头（可能为 None）。
+    """
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP status {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class DownloadedImage:
+    """
+    已完整写入临时文件的图片，确认保留后通过 commit 原子地移动到最终路径。
+    """
+
+    def __init__(self, path, size, digest, image_format):
+        self.path = path
+        self.size = size
+        self.digest = digest
+        self.format = image_format
+
+    @property
+    def extension(self):
+        return format_extension(self.format)
+
+    def commit(self, final_path):
+        os.replace(self.path, final_path)
+        self.path = final_path
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _TempImageWriter:
+    """
+    把响应分块写入下载目录中的临时文件，同时计算 SHA-1、检查大小，并在收到文件头后立即识别格式。
+    """
+
+    def __init__(self, fetcher, download_path):
+        self.fetcher = fetcher
+        fd, self.path = tempfile.mkstemp(prefix='.', suffix='.part', dir=download_path)
+        self.file = os.fdopen(fd, 'wb')
+        self.sha1 = hashlib.sha1()
+        self.size = 0
+        self.head = b''
+        self.format = None
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.fetcher.max_bytes:
+            raise ImageRejected(f"size exceeds {self.fetcher.max_bytes} bytes")
+        if self.format is None:
+            self.head += chunk[:SNIFF_BYTES]
+            if len(self.head) >= SNIFF_BYTES:
+                self.sniff()
+        self.sha1.update(chunk)
+        self.file.write(chunk)
+
+    def sniff(self):
+        # 不是图片（如 HTML 错误页）时不再继续下载
+        self.format = sniff_image_format(self.head)
+        if self.format is None:
+            raise ImageRejected(f"content is not an image (starts with {self.head[:8]!r})")
+
+    def finish(self):
+        self.file.close()
+        if self.format is None:
+            self.sniff()
+        self.fetcher.check_size(self.size)
+        return DownloadedImage(self.path, self.size, self.sha1.hexdigest(), self.format)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.path)
+
+
+class ImageFetcher:
+    """
+    分块流式下载图片到临时文件，边下载边计算 SHA-1，内存占用与图片大小无关。
+    根据 Content-Length、Content-Type 与文件头提前放弃，大小不在 (min_bytes, max_bytes] 内的图片不保存。
+    """
+
+    def __init__(self, min_bytes=1024, max_bytes=20 * 1024 * 1024, chunk_size=64 * 1024):
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def check_status(status, headers):
+        if status >= 400:
+            raise HTTPStatusError(status, headers.get('Retry-After'))
+
+    def check_headers(self, headers):
+        content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type and not content_type.startswith('image/') and content_type not in BINARY_CONTENT_TYPES:
+            raise ImageRejected(f"content type {content_type} is not an image")
+
+        content_length = headers.get('Content-Length')
+        if content_length is not None and content_length.isdigit():
+            self.check_size(int(content_length))
+
+    def check_size(self, size):
+        if size <= self.min_bytes:
+            raise ImageRejected(f"size {size} is not larger than {self.min_bytes} bytes")
+        if size > self.max_bytes:
+            raise ImageRejected(f"size {size} exceeds {self.max_bytes} bytes")
+
+    def fetch(self, response, download_path):
+        """
+        读取 requests 的流式响应（stream=True），返回 DownloadedImage。
+        """
+        self.check_status(response.status_code, response.headers)
+        self.check_headers(response.headers)
+        writer = _TempImageWriter(self, download_path)
+        try:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if chunk:
+                    writer.write(chunk)
+            return writer.finish()
+        except BaseException:
+            writer.abort()
+            raise
+
+    async def async_fetch(self, response, download_path):
+        """
+        读取 aiohttp 响应，返回 DownloadedImage。
+        """
+        self.check_status(response.status, response.headers)
+        self.check_headers(response.headers)
+        writer = _TempImageWriter(self, download_path)
+        try:
+            async for chunk in response.content.iter_chunked(self.chunk_size):
+                writer.write(chunk)
+            return writer.finish()
+        except BaseException:
+            writer.abort()
+            raise
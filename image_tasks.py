@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: image_tasks.py
+Update: 2026.10.18
+"""
+
+import os
+
+from PIL import Image
+
+from image_fetch import IMAGE_FORMATS, SNIFF_BYTES, format_key, format_extension, sniff_image_format
+
+# 在子进程中执行的图片处理函数，本模块不导入 logger 等有副作用的模块，子进程启动时不会创建日志文件
+
+def extension_matches(path, image_format):
+    return os.path.splitext(path)[1].lower() in IMAGE_FORMATS.get(format_key(image_format), ())
+
+
+def pillow_can_open(image_format):
+    """
+    当前安装的 Pillow（及插件）能否解码该格式，如较旧的 Pillow 不支持 AVIF，HEIC 需要额外插件。
+    """
+    extensions = Image.registered_extensions()
+    return any(extension in extensions for extension in IMAGE_FORMATS.get(image_format, ()))
+
+
+def process_image(path, max_side=0, target_format=None, quality=90):
+    """
+    完整解码图片以确认其有效，并按需缩放（最长边不超过 max_side）或转换为 target_format，
+    转换格式时同时更换扩展名。返回可序列化的结果字典，path 为处理后的文件路径。
+    """
+    result = {'path': path, 'source_path': path, 'valid': False, 'format': None, 'width': 0, 'height': 0,
+              'normalized': False, 'error': None}
+    try:
+        with open(path, 'rb') as file:
+            sniffed = sniff_image_format(file.read(SNIFF_BYTES))
+        if sniffed is not None and not pillow_can_open(sniffed):
+            # Pillow 无法解码的格式不做校验，按文件头判断的格式保留原图
+            result.update(valid=True, format=sniffed.upper())
+            result['extension_ok'] = extension_matches(path, sniffed)
+            return result
+        with Image.open(path) as img:
+            img.verify()  # 检查文件结构
+        with Image.open(path) as img:
+            img.load()  # 完整解码，截断的图片在这里报错
+            result.update(valid=True, format=img.format, width=img.width, height=img.height)
+
+            resize = max_side and max(img.size) > max_side
+            convert = target_format and img.format != target_format
+            if resize or convert:
+                output = img.copy()
+                if resize:
+                    output.thumbnail((max_side, max_side))
+                output_format = target_format or img.format
+                if output_format == 'JPEG' and output.mode not in ('RGB', 'L'):
+                    output = output.convert('RGB')
+                output_path = path
+                if not extension_matches(path, output_format) and format_key(output_format) in IMAGE_FORMATS:
+                    output_path = os.path.splitext(path)[0] + format_extension(output_format)
+                temp_path = output_path + '.part'
+                output.save(temp_path, format=output_format, quality=quality)
+                os.replace(temp_path, output_path)
+                if output_path != path:
+                    os.remove(path)
+                result.update(path=output_path, normalized=True, format=output_format, width=output.width,
+                              height=output.height)
+    except Exception as e:
+        result['error'] = str(e)
+    result['extension_ok'] = result['valid'] and extension_matches(result['path'], result['format'])
+    return result
@@ -5,181 +5,434 @@ Project Name: Crawler
 File Created: 2024.05.28
 Author: ZhangYuetao
 File Name: job_process.py
-Update: 2024.06.05
+Update: 2026.10.18
 """
 
 import os
-import json
+import re
 import time
-import random
+import queue
 import requests
-import re
-from PyQt5.QtWidgets import QApplication
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from contextlib import nullcontext
+from collections import deque
+from itertools import zip_longest
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from logger import logger
 from utils import pic_utils
+from async_downloader import AsyncDownloader
+from session_pool import SessionPool
+from dedup import open_dedup_index, unique_urls, normalize_url
+from near_dup import NearDupFilter
+from image_fetch import ImageFetcher, ImageRejected, HTTPStatusError
+from proxy_pool import ProxyPool
+from journal import JobJournal
+from search_cache import SearchCache
+from rate_limiter import RateLimiter
+from metrics import metrics, start_reporter, start_http_server
+from retry_policy import RetryPolicy, RetryQueue, RetryTask, classify_error, PROXY, PERMANENT
+from search_engines import create_engine, engine_names
+from postprocess import PostProcessor
+
+def wait_threads(threads):
+    for thread in threads:
+        thread.join()
+
+
+# JobStats 计数名称与全局指标名称的对应关系
+METRIC_NAMES = {
+    'urls_found': 'urls_found',
+    'downloaded': 'images_downloaded',
+    'skipped': 'images_skipped',
+    'failed': 'images_failed',
+    'bytes': 'bytes_downloaded',
+}
+
+
+class JobStats:
+    """
+    单个任务的计数统计，可在多个下载线程中并发累加，同时计入按搜索引擎区分的全局指标。
+    """
+
+    def __init__(self, engine=None):
+        self.counts = {'urls_found': 0, 'downloaded': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+        self.formats = {}  # 已下载图片按实际格式的数量
+        self.engine = engine or 'unknown'
+        self.start_time = time.time()
+        self._lock = threading.Lock()
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.counts[name] += value
+        metrics.inc(METRIC_NAMES[name], value, engine=self.engine)
+
+    def add_format(self, image_format, value=1):
+        with self._lock:
+            self.formats[image_format] = self.formats.get(image_format, 0) + value
+        metrics.inc('images_by_format', value, engine=self.engine, format=image_format)
+
+    def summary(self):
+        with self._lock:
+            summary = dict(self.counts)
+            summary['formats'] = dict(self.formats)
+        summary['elapsed'] = time.time() - self.start_time
+        return summary
+
+
+def last_file_index(download_path, prefix):
+    """
+    返回下载目录中 {prefix}_{序号}.扩展名 形式文件的最大序号，没有时返回 0。
+    """
+    return FileNamer(download_path).last.get(prefix, 0)
+
+
+class FileNamer:
+    """
+    为保存的图片分配不与下载目录中已有文件重名的文件名（不含扩展名）。
+    首选名称已被占用（如重复运行时之前下载的图片）时，改用同一前缀下最大序号之后的序号，不会覆盖已有文件。
+    """
+    NAME_PATTERN = re.compile(r'(.+)_(\d+)$')
+
+    def __init__(self, download_path):
+        self.stems = set()  # 已占用的文件名（不含扩展名）
+        self.last = {}  # 前缀 -> 最大序号
+        self._lock = threading.Lock()
+        try:
+            with os.scandir(download_path) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') or not entry.is_file():
+                        continue
+                    self._add(os.path.splitext(entry.name)[0])
+        except FileNotFoundError:
+            pass
+
+    def _add(self, stem):
+        self.stems.add(stem)
+        match = self.NAME_PATTERN.match(stem)
+        if match:
+            prefix, idx = match.group(1), int(match.group(2))
+            self.last[prefix] = max(self.last.get(prefix, 0), idx)
+
+    def claim(self, name):
+        """
+        占用首选名称 name（形如 {前缀}_{序号}），返回实际使用的名称。
+        """
+        with self._lock:
+            if name in self.stems:
+                match = self.NAME_PATTERN.match(name)
+                prefix = match.group(1) if match else name
+                name = f"{prefix}_{self.last.get(prefix, 0) + 1}"
+            self._add(name)
+            return name
 
 
 class JobProcessor:
-    def __init__(self, pic_utils_instance):
+    def __init__(self, pic_utils_instance, session_pool=None, proxy_pool=None, request_slots=None, rate_limiter=None,
+                 post_processor=None, search_cache=None, download_executor=None):
         self.pic_utils_instance = pic_utils_instance
         self.terminate = False  # 初始状态为未终止
         self.time_settings_path = 'setting/time_settings.toml'
         self.pic_utils_instance = pic_utils()
+        self.stats = JobStats()
+        self.journal = None  # 当前任务的检查点日志，仅在 run_job 中启用
+
+        # 搜索与下载共用的长连接池，多个任务可传入同一个实例共享
+        time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
+        self.session_pool = session_pool or SessionPool(
+            pool_connections=time_settings.get('pool_connections', 10),
+            pool_maxsize=time_settings.get('pool_maxsize', 10),
+        )
+        # 按健康度选择代理，统计信息跨运行保存
+        self.proxy_pool = proxy_pool or ProxyPool(self.pic_utils_instance.get_proxies)
+        # 可选的全局请求并发上限（threading.Semaphore），多个任务共享时限制总并发
+        self.request_slots = request_slots
+        # 按主机限速：搜索接口保持低频，图片 CDN 可以全速下载
+        self.rate_limiter = rate_limiter or RateLimiter.from_settings(time_settings)
+        # 下载失败时按错误类型决定是否重试、何时重试
+        self.retry_policy = RetryPolicy.from_settings(time_settings)
+        # 可选的进程池后处理（解码校验与规格化），多个任务可传入同一个实例共享
+        if post_processor is None and time_settings.get('postprocess', False):
+            post_processor = PostProcessor.from_settings(time_settings)
+        self.post_processor = post_processor
+        self._post_pending = 0  # 本任务提交后尚未处理完结果的图片数
+        self._post_cond = threading.Condition()
+        self.on_image_invalid = None  # 后处理判定图片无效时的回调，边搜索边下载时用于释放名额
+        # 可选的搜索结果页磁盘缓存，多个任务可传入同一个实例共享
+        self.search_cache = search_cache if search_cache is not None else SearchCache.from_settings(time_settings)
+        # 可选的共享下载线程池（scheduler.FairExecutor），多线程下载时各任务轮流使用其中的线程
+        self.download_executor = download_executor
 
     def terminate_download(self):
         self.terminate = True
 
-    def so_image_search(self, keyword, n):
-        headers = {
-            "User-Agent": self.pic_utils_instance.get_random_user_agent(),
-        }
-        all_urls = []
-
-        for pn in range(n):
-            if self.terminate:  # 如果处于终止状态，则退出获取任务
-                logger.info("Get url terminated.")
-                break
-            search_url = f"https://image.so.com/i?q={keyword}&sn={pn * 30}"
-            proxy = {'http': self.pic_utils_instance.get_random_proxy()}
-
+    def _get(self, url, proxy, read=None, **kwargs):
+        """
+        通过连接池发起请求，并把代理的成功、失败与耗时计入代理池统计。
+        传入 read 时在占用并发名额期间调用 read(response) 读完响应体，关闭响应后返回 read 的结果。
+        """
+        # 代理仅对 http 链接生效
+        report_proxy = SessionPool.effective_proxy(url, proxy)
+        # 在占用并发名额之前等待令牌，等待期间不阻塞其他主机的请求
+        self.rate_limiter.acquire(url, report_proxy)
+        with self.request_slots if self.request_slots is not None else nullcontext():
+            start_time = time.time()
             try:
-                logger.info(f"Trying proxy: {proxy}")
-                response = requests.get(search_url, headers=headers, proxies=proxy, timeout=10)
-                logger.info(f"Response status code: {response.status_code}")
-                response.encoding = 'utf-8'
-                html = response.text
-                img_urls_str = re.findall('"thumb":"(.*?)",', html, re.S)
-                # 解析转义字符的URL
-                img_urls = [url.replace('\\/', '/') for url in img_urls_str]
-                logger.info(f"Found image URLs: {img_urls}")
-                all_urls.extend(img_urls)
-
-                QApplication.processEvents()  # 防止界面冻结
-
-            except Exception as e:
-                logger.error(f"Image search failed with proxy {proxy}: {e}")
-                continue
-
-        return all_urls
-
-    def sogou_image_search(self, keyword, n):
-        headers = {
-            "User-Agent": self.pic_utils_instance.get_random_user_agent(),
-        }
-        all_urls = []
-
-        search_url = f"https://pic.sogou.com/pics?"
-
-        params = self.pic_utils_instance.get_params('sogou_text_search_param.json')
-        params['query'] = keyword
-
-        for pn in range(n):
-            if self.terminate:  # 如果处于终止状态，则退出获取任务
-                logger.info("Get url terminated.")
-                break
-
-            proxy = {'http': self.pic_utils_instance.get_random_proxy()}
-            params['start'] = pn * 48
-
+                response = self.session_pool.get(url, proxy=proxy, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.proxy_pool.report_failure(report_proxy)
+                metrics.observe_request(url, report_proxy, time.time() - start_time, ok=False)
+                raise
+            latency = time.time() - start_time
+            self.proxy_pool.report_success(report_proxy, latency)
+            metrics.observe_request(url, report_proxy, latency)
+            if read is None:
+                return response
+            # 流式响应在读取响应体时才真正下载，名额要保持到读完为止
+            with response:
+                return read(response)
+
+    def run_job(self, web_name, keyword, num_images, download_folder):
+        """
+        执行一次完整的搜索与下载任务，不依赖界面，可在后台线程中运行，返回任务统计。
+        """
+        self.terminate = False
+        self.stats = JobStats(web_name)
+        time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
+        download_way = time_settings.get('download_way', 0)
+        # 周期性输出汇总信息，并按需开放本机的 Prometheus 指标接口（均只启动一次）
+        start_reporter(time_settings.get('metrics_interval', 10))
+        start_http_server(time_settings.get('metrics_port', 0))
+
+        if not os.path.exists(download_folder):
+            os.makedirs(download_folder)
+        if time_settings.get('journal', True):
+            self.journal = JobJournal.for_job(download_folder, keyword, web_name)
+        completed = False
+        try:
+            self._run_job(web_name, keyword, num_images, download_folder, download_way)
+            completed = not self.terminate  # 出错或被终止的任务保留检查点，下次继续
+        finally:
+            self.wait_post_processing()  # 后处理结果会修改统计与检查点日志，需在关闭日志前完成
+            if self.journal is not None:
+                self.journal.close(completed=completed)
+                self.journal = None
+        return self.stats.summary()
+
+    def _run_job(self, web_name, keyword, num_images, download_folder, download_way):
+        if download_way == 3:
+            # 边搜索边下载
+            web_names = engine_names() if web_name == 'all' else [web_name]
+            self.stream_download_images(web_names, keyword, web_name, download_folder, num_images)
+            return
+
+        if web_name == 'all':
+            img_urls = self.multi_engine_search(keyword, num_images)
+        else:
+            img_urls = self.image_search(web_name, keyword, num_images)
+
+        # elif input_type == 'image':
+        #     img_urls = self.baidu_image_search_by_image(image_file)
+        # else:
+        #     logger.error(f"{input_type} type error!")
+
+        if not img_urls:
+            logger.warning(f"No image URLs found for {keyword}")
+            return
+
+        img_urls = unique_urls(img_urls)[:num_images]  # 去重后再截取，避免重复图片占用下载数量
+        self.stats.add('urls_found', len(img_urls))
+        if download_way == 0:
+            self.download_images(img_urls, keyword, web_name, download_folder)
+        elif download_way == 1:
+            self.threads_download_images(img_urls, keyword, web_name, download_folder)
+        elif download_way == 2:
+            self.async_download_images(img_urls, keyword, web_name, download_folder)
+        else:
+            logger.error(f"{download_way} type error!")
+
+    def _search_page(self, engine, pn):
+        """
+        获取第 pn 页的图片链接。请求失败时按 retry_policy 换代理重试，仍失败或任务已终止时返回 None，
+        与确实没有结果的空页（[]）区分。
+        """
+        if self.terminate:  # 如果处于终止状态，则不再获取
+            return None
+
+        # 恢复任务时直接使用日志中已获取的页面
+        journal = self.journal
+        if journal is not None:
+            img_urls = journal.get_page(engine.name, pn)
+            if img_urls is not None:
+                return img_urls
+
+        # 重复运行时直接使用缓存中已解析的链接
+        cache = self.search_cache
+        cache_key = engine.cache_key(pn) if cache is not None else None
+        if cache_key is not None:
+            img_urls = cache.get(cache_key)
+            if img_urls is not None:
+                logger.debug(f"Found {len(img_urls)} cached image URLs on page {pn}")
+                metrics.inc('search_cache_hits', engine=engine.name)
+                if journal is not None and img_urls:
+                    journal.record_page(engine.name, pn, img_urls)
+                return img_urls
+            metrics.inc('search_cache_misses', engine=engine.name)
+
+        # 代理仅对 http 链接生效，未走代理时连接错误按临时错误退避
+        uses_proxy = engine.build_request(pn)[0].startswith('http://')
+        proxy = None
+        attempt = 0
+        while True:
+            # 上次因代理失败时换一个代理
+            proxy = self.proxy_pool.choose(exclude=proxy)
             try:
-                logger.info(f"Trying proxy: {proxy}")
-                response = requests.get(search_url, headers=headers, params=params, proxies=proxy, timeout=10)
-                logger.info(f"Response status code: {response.status_code}")
-                response.encoding = 'utf-8'
-                html = response.text
-                img_urls_str = re.findall('"picUrl":"(.*?)",', html, re.S)
-                # 解析转义字符的URL
-                img_urls = [json.loads('"' + url + '"') for url in img_urls_str]
-                logger.info(f"Found image URLs: {img_urls}")
-                all_urls.extend(img_urls)
-
-                QApplication.processEvents()  # 防止界面冻结
-
-            except Exception as e:
-                logger.error(f"Image search failed with proxy {proxy}: {e}")
-                continue
-
-        return all_urls
-
-    def bing_image_search(self, keyword, n):
-        headers = {
-            "User-Agent": self.pic_utils_instance.get_random_user_agent(),
-        }
-        all_urls = []
-
-        for pn in range(n):
-            if self.terminate:  # 如果处于终止状态，则退出获取任务
-                logger.info("Get url terminated.")
+                logger.debug(f"Trying proxy: {proxy}")
+                img_urls = self._fetch_page(engine, pn, proxy)
                 break
-            search_url = f"https://www.bing.com/images/search?q={keyword}&first={pn * 35 + 1}&count=35"
-            proxy = {'http': self.pic_utils_instance.get_random_proxy()}
-
-            try:
-                logger.info(f"Trying proxy: {proxy}")
-                response = requests.get(search_url, headers=headers, proxies=proxy, timeout=10)
-                logger.info(f"Response status code: {response.status_code}")
-                soup = BeautifulSoup(response.text, 'html.parser')
-
-                # 通过class选择器找到所有图片链接
-                image_links = soup.find_all('a', class_='iusc')
-
-                # 提取图片链接
-                urls = []
-                for link in image_links:
-                    m = link.attrs.get('m')
-                    if m:
-                        m_json = json.loads(m)
-                        if 'murl' in m_json:
-                            urls.append(m_json['murl'])
-                logger.info(f"Found image URLs: {urls}")
-                all_urls.extend(urls)
-
-                QApplication.processEvents()  # 防止界面冻结
-
             except Exception as e:
-                logger.error(f"Image search failed with proxy {proxy}: {e}")
-                continue
-
-        return all_urls
-
-    def baidu_image_search(self, keyword, n):
-        search_url = "https://image.baidu.com/search/index?tn=baiduimage&word="
-        headers = {
-            "User-Agent": self.pic_utils_instance.get_random_user_agent(),
-        }
-        params = self.pic_utils_instance.get_params('baidu_text_search_param.json')
-        params['queryWord'] = keyword
-        params['word'] = keyword
-
+                attempt += 1
+                kind = classify_error(e, proxy if uses_proxy else None)
+                delay = self.retry_policy.retry_delay(kind, attempt, e)
+                if delay is None or self.terminate:
+                    logger.error(f"Image search failed on page {pn} with proxy {proxy}: {e}")
+                    metrics.inc('pages_failed', engine=engine.name)
+                    return None
+                logger.warning(f"Retry page {pn} in {delay:.1f}s ({kind}, attempt {attempt}): {e}")
+                self._sleep(delay)
+
+        logger.info(f"Found {len(img_urls)} image URLs on page {pn}")
+        logger.debug("Found image URLs: %s", img_urls)  # 延迟格式化，未开启 DEBUG 时不拼接整页链接
+        metrics.inc('pages_fetched', engine=engine.name)
+        if img_urls:
+            # 空页可能是被拦截或临时错误，不写入缓存与检查点日志
+            if cache_key is not None:
+                cache.put(cache_key, img_urls)
+            if journal is not None:
+                journal.record_page(engine.name, pn, img_urls)
+        return img_urls
+
+    def _sleep(self, seconds):
+        # 分段等待，任务终止时及时返回
+        deadline = time.time() + seconds
+        while not self.terminate and time.time() < deadline:
+            time.sleep(min(0.2, max(0.0, deadline - time.time())))
+
+    def _fetch_page(self, engine, pn, proxy):
+        search_url, params = engine.build_request(pn)
+        response = self._get(search_url, proxy, headers=engine.headers, params=params, timeout=10)
+        logger.debug(f"Response status code: {response.status_code}")
+        # 错误状态码（如被拦截）按请求失败处理，不当作空页
+        ImageFetcher.check_status(response.status_code, response.headers)
+        if engine.encoding:
+            response.encoding = engine.encoding
+        return engine.parse(response.text)
+
+    def _iter_pages(self, engine, num_images, need_more=None):
+        """
+        并发获取搜索结果页，同时在途的页数不超过 search_threads_num，按页码顺序逐页产出。
+        页数随结果自适应：去重后的链接数达到 num_images、某页没有带来新链接、连续 search_empty_pages 页为空
+        或搜索引擎表明结果已取完时停止；结果重复较多时自动多取，最多取预计页数的 search_max_pages_factor 倍。
+        传入 need_more 时改由它判断是否还需要更多链接（如已保存的图片数不足），链接数达到 num_images 后
+        仍继续逐页获取；暂时不需要时产出空列表等待，直到调用方关闭生成器。
+        """
+        time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
+        max_empty_pages = max(1, time_settings.get('search_empty_pages', 2))
+        max_pages = engine.page_count(num_images) * max(1, time_settings.get('search_max_pages_factor', 3))
+        fan_out = max(1, min(max_pages, time_settings.get('search_threads_num', 4)))
+        seen = set()
+        empty_pages = 0
+        stop_reason = None
+
+        with ThreadPoolExecutor(max_workers=fan_out) as executor:
+            futures = deque()
+            next_pn = 0
+            while True:
+                # 已有链接加上在途页面的预计数量不足 num_images 时才请求新页面；
+                # 由 need_more 判断时，预计数量已足够后每次只请求一页
+                while (stop_reason is None and next_pn < max_pages and len(futures) < fan_out and not self.terminate
+                       and (len(seen) + len(futures) * engine.page_size < num_images
+                            or (need_more is not None and not futures and need_more()))):
+                    futures.append((next_pn, executor.submit(self._search_page, engine, next_pn)))
+                    next_pn += 1
+                if not futures:
+                    if need_more is None or stop_reason is not None or next_pn >= max_pages or self.terminate:
+                        break
+                    # 暂时不需要更多链接（如图片仍在下载或后处理中），稍后再判断
+                    self._sleep(0.1)
+                    yield []
+                    continue
+
+                pn, future = futures.popleft()
+                img_urls = future.result()
+                if img_urls is None:
+                    # 重试后仍获取失败的页面不计为空页，也不据此停止翻页
+                    yield []
+                    continue
+                if stop_reason is None:
+                    stop_reason = self._page_stop_reason(engine, pn, img_urls, seen, empty_pages, max_empty_pages)
+                    empty_pages = 0 if img_urls else empty_pages + 1
+                    if stop_reason is None and need_more is None and len(seen) >= num_images:
+                        stop_reason = f"{len(seen)} unique URLs found"
+                    if stop_reason is not None:
+                        logger.info(f"Stop searching {engine.name} after page {pn}: {stop_reason}")
+                yield img_urls
+
+        if self.terminate:
+            logger.info("Get url terminated.")
+        elif stop_reason is None:
+            logger.info(f"Reached the page limit of {engine.name} with {len(seen)} unique URLs")
+        # 与按预计页数固定翻页相比少请求的页数
+        metrics.inc('pages_saved', max(0, engine.page_count(num_images) - next_pn), engine=engine.name)
+
+    @staticmethod
+    def _page_stop_reason(engine, pn, img_urls, seen, empty_pages, max_empty_pages):
+        """
+        把第 pn 页的链接计入 seen，返回应停止翻页的原因，不需要停止时返回 None。
+        """
+        if not img_urls:
+            if empty_pages + 1 >= max_empty_pages:
+                return f"{empty_pages + 1} empty pages in a row"
+        else:
+            count = len(seen)
+            seen.update(normalize_url(img_url) for img_url in img_urls)
+            if len(seen) == count:
+                return "no new URLs on the page"
+        if engine.is_exhausted(pn, img_urls):
+            return "no more results"
+        return None
+
+    def create_engine(self, web_name, keyword):
+        return create_engine(web_name, keyword, self.pic_utils_instance)
+
+    def search_page(self, web_name, keyword, pn):
+        """
+        获取单个搜索结果页（从 0 开始）的图片链接，重试后仍获取失败时返回 None。
+        """
+        return self._search_page(self.create_engine(web_name, keyword), pn)
+
+    def iter_image_search(self, web_name, keyword, num_images, need_more=None):
+        """
+        逐页产出搜索结果的生成器，停止迭代后不再请求后续页面。need_more 见 _iter_pages。
+        """
+        return self._iter_pages(self.create_engine(web_name, keyword), num_images, need_more)
+
+    def image_search(self, web_name, keyword, num_images):
         all_urls = []
+        for img_urls in self.iter_image_search(web_name, keyword, num_images):
+            all_urls.extend(img_urls)
+        return all_urls
 
-        for pn in range(n):
-            if self.terminate:  # 如果处于终止状态，则退出获取任务
-                logger.info("Get url terminated.")
-                break
-
-            params['pn'] = pn * 30
-            proxy = {'http': self.pic_utils_instance.get_random_proxy()}
-            try:
-                logger.info(f"Trying proxy: {proxy}")
-                response = requests.get(search_url, headers=headers, params=params, proxies=proxy, timeout=10)
-                logger.info(f"Response status code: {response.status_code}")
-                response.encoding = 'utf-8'
-                html = response.text
-                img_urls = re.findall('"thumbURL":"(.*?)",', html, re.S)
-                logger.info(f"Found image URLs: {img_urls}")
-                all_urls.extend(img_urls)
-
-                QApplication.processEvents()  # 防止界面冻结
-
-            except Exception as e:
-                logger.error(f"Image search failed with proxy {proxy}: {e}")
-                continue
+    def multi_engine_search(self, keyword, num_images):
+        """
+        同时在所有搜索引擎中搜索同一关键词，各引擎结果轮流合并。
+        """
+        web_names = engine_names()
+        with ThreadPoolExecutor(max_workers=len(web_names)) as executor:
+            futures = [executor.submit(self.image_search, web_name, keyword, num_images) for web_name in web_names]
+            results = [future.result() for future in futures]
 
-        return all_urls
+        return [url for urls in zip_longest(*results) for url in urls if url is not None]
 
     # def baidu_image_search_by_image(self, image_path):
     #     upload_url = "https://graph.baidu.com/upload"
@@ -236,100 +489,499 @@ class JobProcessor:
     #
     #     return all_urls
 
+    def create_dedup_index(self, download_path):
+        time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
+        return open_dedup_index(download_path, persist=time_settings.get('dedup_index', True))
+
+    def create_near_dup_filter(self, download_path):
+        time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
+        if not time_settings.get('near_dup_filter', False):
+            return None
+        return NearDupFilter(
+            download_path,
+            radius=time_settings.get('near_dup_radius', 4),
+            action=time_settings.get('near_dup_action', 'quarantine'),
+        )
+
+    def create_image_fetcher(self):
+        time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
+        return ImageFetcher(
+            min_bytes=time_settings.get('min_image_bytes', 1024),
+            max_bytes=time_settings.get('max_image_bytes', 20 * 1024 * 1024),
+            chunk_size=time_settings.get('download_chunk_size', 64 * 1024),
+        )
+
+    def download_image(self, img_url, proxy, download_path, fetcher):
+        """
+        流式下载单张图片到下载目录中的临时文件，返回 DownloadedImage。
+        """
+        headers = {
+            "User-Agent": self.pic_utils_instance.get_random_user_agent(),
+        }
+        image = self._get(img_url, proxy, read=lambda response: fetcher.fetch(response, download_path),
+                          headers=headers, timeout=10, stream=True)
+        logger.debug(f"Downloaded image data size: {image.size}")
+        return image
+
+    def reject_image(self, img_url, label, error):
+        logger.warning(f"{label} does not match, do not download: {error}")
+        self.stats.add('skipped')
+        self.record_state(img_url, 'skipped')
+
+    def handle_failure(self, task, img_url, label, proxy, error, retry_queue):
+        """
+        处理下载失败：可重试的任务按错误类型放回任务队列，其余计为跳过或失败。
+        """
+        if isinstance(error, ImageRejected):
+            self.reject_image(img_url, label, error)
+            return
+
+        request_proxy = proxy if img_url.startswith('http://') else None
+        kind, delay = self.retry_policy.reschedule(task, error, retry_queue, request_proxy)
+        metrics.observe_error(img_url, kind)
+        if kind == PROXY and isinstance(error, HTTPStatusError):
+            self.proxy_pool.report_failure(request_proxy)  # 连接错误已在 _get 中计入
+        if delay is None:
+            self.stats.add('failed')
+            self.record_failure(img_url, kind)
+            logger.error(f"Failed to download {img_url} with proxy {proxy}: {error}")
+        else:
+            logger.warning(f"Retry {img_url} in {delay:.1f}s ({kind}, attempt {task.attempt}): {error}")
+
+    def check_image(self, image, label, dedup, near_dup=None):
+        """
+        检查内容重复与近似重复（大小已在下载时检查），通过时返回感知哈希（未启用时为 None），
+        否则删除临时文件并返回 False。
+        """
+        self.stats.add('bytes', image.size)
+        try:
+            is_new = dedup.add_digest(image.digest)
+        except Exception:
+            image.discard()
+            raise
+        if not is_new:
+            logger.warning(f"{label} is a duplicate image, do not download")
+            image.discard()
+            self.stats.add('skipped')
+            return False
+
+        phash = None
+        try:
+            if near_dup is not None:
+                is_unique, phash, match_name = near_dup.add_image(image.path)
+                if not is_unique:
+                    near_dup.reject(image, f"{image.digest}{image.extension}", match_name)
+                    self.stats.add('skipped')
+                    return False
+        except Exception:
+            # 出错时不留下临时文件，也不占用内容摘要，重试时可以再次下载
+            image.discard()
+            dedup.discard_content(image.digest)
+            raise
+        return phash
+
+    def write_image(self, image, img_url, name, download_path, dedup, near_dup, phash, namer=None,
+                    on_checked=None):
+        """
+        保存通过检查的图片，name 为不含扩展名的文件名，扩展名按图片的实际格式确定。
+        传入 namer（FileNamer）时 name 已被占用则改用新的序号。
+        开启后处理时，得到结果后调用 on_checked(图片是否有效)。
+        """
+        if namer is not None:
+            name = namer.claim(name)
+        file_name = name + image.extension
+        try:
+            image.commit(os.path.join(download_path, file_name))  # 原子地移动到最终路径
+        except Exception:
+            image.discard()
+            dedup.discard_content(image.digest)
+            if near_dup is not None:
+                near_dup.discard(phash)
+            raise
+        dedup.record(img_url, image.digest, file_name)
+        if near_dup is not None:
+            near_dup.record(phash, file_name)
+        self.stats.add('downloaded')
+        self.stats.add_format(image.format)
+        self.record_state(img_url, 'downloaded', file_name)
+        logger.debug(f"Downloaded {file_name}")
+        if self.post_processor is not None:
+            def on_renamed(new_file_name):
+                # 转换格式后去重索引与感知哈希索引改记新文件名，重复运行时仍能识别已下载的图片
+                dedup.record(img_url, image.digest, new_file_name)
+                if near_dup is not None:
+                    near_dup.record(phash, new_file_name)
+
+            self.post_process(img_url, image.path, image.format, on_renamed, on_checked)
+
+    def post_process(self, img_url, path, image_format, on_renamed=None, on_checked=None):
+        """
+        把已保存的图片交给进程池校验，在途数量达到上限时阻塞当前下载线程。
+        转换格式导致文件改名时调用 on_renamed(新文件名)，处理完成后调用 on_checked(图片是否有效)，
+        处理过程本身出错时保留图片，视为有效。
+        """
+        with self._post_cond:
+            self._post_pending += 1
+
+        def on_result(result):
+            try:
+                if result is not None:
+                    self.on_post_processed(img_url, image_format, result, on_renamed)
+            finally:
+                if on_checked is not None:
+                    on_checked(result is None or result['valid'])
+                self._post_finished()
+
+        try:
+            self.post_processor.submit(path, on_result)
+        except Exception as e:
+            logger.error(f"Failed to submit {path} for post-processing: {e}")
+            if on_checked is not None:
+                on_checked(True)
+            self._post_finished()
+
+    def _post_finished(self):
+        with self._post_cond:
+            self._post_pending -= 1
+            self._post_cond.notify_all()
+
+    def wait_post_processing(self):
+        with self._post_cond:
+            self._post_cond.wait_for(lambda: self._post_pending <= 0)
+
+    def on_post_processed(self, img_url, image_format, result, on_renamed=None):
+        file_name = os.path.basename(result['path'])
+        if not result['valid']:
+            # 无法解码的图片从已下载改记为跳过
+            logger.warning(f"{file_name} is not a valid image, removed: {result['error']}")
+            try:
+                os.remove(result['path'])
+            except FileNotFoundError:
+                pass
+            self.stats.add('downloaded', -1)
+            self.stats.add_format(image_format, -1)
+            self.stats.add('skipped')
+            self.record_state(img_url, 'invalid', file_name)
+            metrics.inc('images_invalid', engine=self.stats.engine)
+            if self.on_image_invalid is not None:
+                self.on_image_invalid(img_url)
+            return
+
+        if not result['extension_ok']:
+            logger.debug(f"{file_name} is actually {result['format']}")
+            metrics.inc('format_mismatch', format=result['format'])
+        if result['normalized']:
+            metrics.inc('images_normalized', engine=self.stats.engine)
+            if result['path'] != result['source_path']:
+                # 转换格式后扩展名随之改变
+                self.record_state(img_url, 'downloaded', file_name)
+                if on_renamed is not None:
+                    on_renamed(file_name)
+
+    def save_image(self, image, img_url, name, download_path, dedup, near_dup=None, namer=None):
+        phash = self.check_image(image, name, dedup, near_dup)
+        if phash is False:
+            self.record_state(img_url, 'skipped')
+            return False
+        self.write_image(image, img_url, name, download_path, dedup, near_dup, phash, namer)
+        return True
+
+    def record_failure(self, img_url, kind=None):
+        # 永久性失败（如 404）在恢复任务时不再重试，其余失败下次继续尝试
+        self.record_state(img_url, 'failed_permanent' if kind == PERMANENT else 'failed')
+
+    def record_state(self, img_url, status, file_name=None):
+        if self.journal is not None:
+            self.journal.record_state(img_url, status, file_name)
+
+    def pending_tasks(self, img_urls, dedup):
+        """
+        返回待下载的 (序号, 链接) 列表，序号沿用链接在原列表中的位置，
+        跳过重复链接、已下载的链接以及检查点日志中已完成的链接。
+        """
+        tasks = []
+        for idx, img_url in enumerate(img_urls):
+            if self.journal is not None and self.journal.is_done(img_url):
+                continue
+            if dedup.add_url(img_url):
+                tasks.append((idx, img_url))
+        return tasks
+
+    def close_indexes(self, dedup, near_dup):
+        self.wait_post_processing()  # 后处理结果可能还要更新索引中的文件名
+        dedup.close()
+        if near_dup is not None:
+            near_dup.close()
+
     def download_images(self, img_urls, keyword, web_name, download_path):
         if not os.path.exists(download_path):
             os.makedirs(download_path)
 
-        for idx, img_url in enumerate(img_urls):
+        dedup = self.create_dedup_index(download_path)
+        near_dup = self.create_near_dup_filter(download_path)
+        fetcher = self.create_image_fetcher()
+        namer = FileNamer(download_path)
+        retry_queue = RetryQueue(self.pending_tasks(img_urls, dedup))
+
+        while True:
             if self.terminate:  # 如果处于终止状态，则退出下载任务
                 logger.info("Download terminated.")
                 break
 
-            headers = {
-                "User-Agent": self.pic_utils_instance.get_random_user_agent(),
-            }
-            proxies = self.pic_utils_instance.get_proxies()
-
-            try_times = 0
+            task = retry_queue.pop()
+            if task is None:
+                delay = retry_queue.next_delay()
+                if delay is None:
+                    break
+                time.sleep(min(delay, 0.5))  # 只剩等待重试的任务
+                continue
+            self.download_image_thread(task, keyword, web_name, download_path, dedup, near_dup, fetcher, retry_queue,
+                                       namer)
 
-            for proxy in proxies:
-                try_times = try_times + 1
-                if try_times < 3:
-                    try:
-                        logger.info(f"Trying proxy: {proxy}")
-                        img_data = requests.get(img_url, headers=headers, proxies={"http": proxy}, timeout=10).content
-                        logger.info(f"Downloaded image data size: {len(img_data)}")
-                        if len(img_data) > 1024:
-                            with open(os.path.join(download_path, f"{keyword}_{web_name}_{idx + 1}.jpg"), 'wb') as img_file:
-                                img_file.write(img_data)
-                            logger.info(f"Downloaded {keyword}_{web_name}_{idx + 1}.jpg")
+        self.close_indexes(dedup, near_dup)
+        self.proxy_pool.save()
+        if not self.terminate:  # 如果未被终止，则打印下载完成信息
+            logger.info(f"Downloaded image finished")
 
-                        else:
-                            logger.warning(f"{keyword}_{web_name}_{idx + 1}.jpg size does not match, do not download")
+    def download_image_thread(self, task, keyword, web_name, download_path, dedup, near_dup, fetcher, retry_queue,
+                              namer=None):
+        """
+        下载一个任务，失败时由 handle_failure 决定是否放回队列重试，不在当前线程中等待。
+        """
+        idx, img_url = task.item
+        file_name = f"{keyword}_{web_name}_{idx + 1}"  # 扩展名在保存时按实际格式确定
+        # 按代理健康度选择代理，上次因代理失败时换一个
+        proxy = self.proxy_pool.choose(exclude=task.avoid_proxy)
+        try:
+            logger.debug(f"Trying proxy: {proxy}")
+            image = self.download_image(img_url, proxy, download_path, fetcher)
+            self.save_image(image, img_url, file_name, download_path, dedup, near_dup, namer)
+        except Exception as e:
+            self.handle_failure(task, img_url, file_name, proxy, e, retry_queue)
 
-                        QApplication.processEvents()  # 防止界面冻结
+    def threads_download_images(self, img_urls, keyword, web_name, download_path):
+        if not os.path.exists(download_path):
+            os.makedirs(download_path)
 
-                        break
-                    except Exception as e:
-                        logger.error(f"Failed to download {img_url} with proxy {proxy}: {e}")
-                        continue
+        dedup = self.create_dedup_index(download_path)
+        near_dup = self.create_near_dup_filter(download_path)
+        fetcher = self.create_image_fetcher()
+        namer = FileNamer(download_path)
+        retry_queue = RetryQueue(self.pending_tasks(img_urls, dedup))
 
-            time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
-            min_download_time = time_settings.get('min_download_time', 0.2)
-            max_download_time = time_settings.get('max_download_time', 0.6)
-            time.sleep(random.uniform(min_download_time, max_download_time))  # 随机延时，避免请求过于频繁
+        time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
+        num_threads = time_settings.get('threads_num', 10)
 
+        if self.download_executor is not None:
+            executor = self.download_executor.lane(f"{keyword}/{web_name}")
+        else:
+            executor = ThreadPoolExecutor(max_workers=num_threads)  # 使用10个线程
+        with executor:
+            running = set()
+            while True:
+                if self.terminate:  # 如果处于终止状态，则退出下载任务
+                    logger.info("Download terminated.")
+                    break
+
+                # 在途任务数有上限，重试任务到期后可以及时插队
+                task = retry_queue.pop() if len(running) < num_threads * 2 else None
+                if task is not None:
+                    running.add(executor.submit(self.download_image_thread, task, keyword, web_name, download_path,
+                                                dedup, near_dup, fetcher, retry_queue, namer))
+                    continue
+
+                if running:
+                    _, running = wait(running, timeout=0.1, return_when=FIRST_COMPLETED)
+                    continue
+                delay = retry_queue.next_delay()
+                if delay is None:
+                    break
+                time.sleep(min(delay, 0.5))  # 只剩等待重试的任务
+
+        self.close_indexes(dedup, near_dup)
+        self.proxy_pool.save()
         if not self.terminate:  # 如果未被终止，则打印下载完成信息
             logger.info(f"Downloaded image finished")
 
-    def download_image_thread(self, img_url, keyword, web_name, idx, download_path, proxy):
-        try:
-            headers = {
-                "User-Agent": self.pic_utils_instance.get_random_user_agent(),
-            }
-            logger.info(f"Trying proxy: {proxy}")
-            img_data = requests.get(img_url, headers=headers, proxies={"http": proxy}, timeout=10).content
-            logger.info(f"Downloaded image data size: {len(img_data)}")
-            if len(img_data) > 1024:
-                with open(os.path.join(download_path, f"{keyword}_{web_name}_{idx + 1}.jpg"), 'wb') as img_file:
-                    img_file.write(img_data)
-                logger.info(f"Downloaded {keyword}_{web_name}_{idx + 1}.jpg")
-            else:
-                logger.warning(f"{keyword}_{web_name}_{idx + 1}.jpg size does not match, do not download")
-
-            QApplication.processEvents()  # 防止界面冻结
-
-            time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
-            min_download_time = time_settings.get('min_download_time', 0.2)
-            max_download_time = time_settings.get('max_download_time', 0.6)
-            time.sleep(random.uniform(min_download_time, max_download_time))  # 随机延时，避免请求过于频繁
+    def async_download_images(self, img_urls, keyword, web_name, download_path):
+        if not os.path.exists(download_path):
+            os.makedirs(download_path)
 
-        except Exception as e:
-            logger.error(f"Failed to download {img_url} with proxy {proxy}: {e}")
+        dedup = self.create_dedup_index(download_path)
+        near_dup = self.create_near_dup_filter(download_path)
+        namer = FileNamer(download_path)
+        tasks = self.pending_tasks(img_urls, dedup)
 
-    def threads_download_images(self, img_urls, keyword, web_name, download_path):
+        time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
+        downloader = AsyncDownloader(
+            concurrency=time_settings.get('async_concurrency', 200),
+            per_host=time_settings.get('async_per_host', 8),
+            should_stop=lambda: self.terminate,
+            proxy_pool=self.proxy_pool,
+            rate_limiter=self.rate_limiter,
+            request_slots=self.request_slots,
+            retry_policy=self.retry_policy,
+            fetcher=self.create_image_fetcher(),
+            on_failed=self.record_failure,
+            on_rejected=lambda img_url, file_name, e: self.reject_image(img_url, file_name, e),
+            save_image=lambda image, img_url, file_name, path: self.save_image(image, img_url, file_name, path,
+                                                                               dedup, near_dup, namer),
+        )
+        tasks = ((img_url, f"{keyword}_{web_name}_{idx + 1}") for idx, img_url in tasks)
+        downloader.download(tasks, download_path,
+                            self.pic_utils_instance.get_random_user_agent,
+                            self.proxy_pool.choose)
+        self.stats.add('failed', downloader.failed)
+        self.close_indexes(dedup, near_dup)
+        self.proxy_pool.save()
+
+        if self.terminate:
+            logger.info("Download terminated.")
+        else:  # 如果未被终止，则打印下载完成信息
+            logger.info(f"Downloaded image finished")
+
+    def stream_download_images(self, web_names, keyword, web_name, download_path, num_images):
+        """
+        边搜索边下载：各搜索引擎逐页把链接放入有界队列，下载线程随取随下，
+        成功下载 num_images 张后停止，剩余页面不再请求。
+        """
         if not os.path.exists(download_path):
             os.makedirs(download_path)
 
-        # 将图片URL列表划分成n个子列表
         time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
         num_threads = time_settings.get('threads_num', 10)
-        chunk_size = (len(img_urls) + num_threads - 1) // num_threads
-        chunks = [img_urls[i:i+chunk_size] for i in range(0, len(img_urls), chunk_size)]
-
-        with ThreadPoolExecutor(max_workers=num_threads) as executor:  # 使用10个线程
-            proxies = self.pic_utils_instance.get_proxies()  # 获取代理IP列表
-            for chunk_id, chunk in enumerate(chunks):
-                for idx, img_url in enumerate(chunk):
-                    if self.terminate:  # 如果处于终止状态，则退出下载任务
-                        logger.info("Download terminated.")
+        url_queue = queue.Queue(maxsize=time_settings.get('stream_queue_size', 200))
+        stop_event = threading.Event()
+        producers_done = threading.Event()
+        lock = threading.Lock()
+        dedup = self.create_dedup_index(download_path)
+        near_dup = self.create_near_dup_filter(download_path)
+        fetcher = self.create_image_fetcher()
+        namer = FileNamer(download_path)
+        retry_queue = RetryQueue()  # 只存放等待重试的链接
+        # 恢复任务时从已下载的数量继续编号
+        downloaded = [self.journal.count('downloaded') if self.journal is not None else 0]
+        writing = [0]  # 已分配序号、尚未保存并提交后处理的图片数
+        if downloaded[0] >= num_images:
+            stop_event.set()
+
+        def should_stop():
+            return self.terminate or stop_event.is_set()
+
+        def release_slot(img_url):
+            # 后处理判定无效或保存失败的图片不计入数量
+            with lock:
+                downloaded[0] -= 1
+
+        def settle():
+            # 名额已满时，正在保存或后处理中的图片仍可能被判定无效并释放名额，
+            # 等这些图片全部有了结果、名额仍然已满才停止，返回是否已停止
+            while not self.terminate:
+                if self.post_processor is not None:
+                    self.wait_post_processing()
+                with lock:
+                    if downloaded[0] < num_images:
+                        return False
+                    with self._post_cond:
+                        idle = self._post_pending <= 0
+                    if writing[0] == 0 and idle:
+                        stop_event.set()
+                        return True
+                time.sleep(0.01)
+            return True
+
+        def claim_slot():
+            # 成功后才分配序号，保证不超过 num_images
+            while not should_stop():
+                with lock:
+                    if downloaded[0] < num_images:
+                        downloaded[0] += 1
+                        writing[0] += 1
+                        return downloaded[0]
+                if settle():
+                    return None
+            return None
+
+        def need_more():
+            # 按已保存的图片数而不是找到的链接数决定是否继续翻页，失效、重复或无效的图片由后续页面补足
+            with lock:
+                return downloaded[0] < num_images
+
+        def produce(engine):
+            pages = self.iter_image_search(engine, keyword, num_images, need_more)
+            try:
+                for img_urls in pages:
+                    img_urls = [img_url for _, img_url in self.pending_tasks(img_urls, dedup)]
+                    self.stats.add('urls_found', len(img_urls))
+                    for img_url in img_urls:
+                        while not should_stop():
+                            try:
+                                url_queue.put(img_url, timeout=0.1)
+                                break
+                            except queue.Full:
+                                continue
+                    if should_stop():
                         break
+            finally:
+                pages.close()
 
-                    # 为每个图片选择一个代理IP
-                    proxy = random.choice(proxies)
-
-                    # 提交任务给线程池
-                    executor.submit(self.download_image_thread, img_url, keyword, web_name, chunk_id * chunk_size + idx, download_path, proxy)
+        def consume():
+            while not should_stop():
+                task = retry_queue.pop()
+                if task is None:
+                    try:
+                        task = RetryTask(url_queue.get(timeout=0.1))
+                    except queue.Empty:
+                        if producers_done.is_set() and retry_queue.next_delay() is None:
+                            return
+                        continue
 
-        if not self.terminate:  # 如果未被终止，则打印下载完成信息
+                img_url = task.item
+                proxy = self.proxy_pool.choose(exclude=task.avoid_proxy)
+                try:
+                    logger.debug(f"Trying proxy: {proxy}")
+                    image = self.download_image(img_url, proxy, download_path, fetcher)
+                    phash = self.check_image(image, img_url, dedup, near_dup)
+                    if phash is False:
+                        self.record_state(img_url, 'skipped')
+                    else:
+                        idx = claim_slot()
+                        if idx is None:
+                            image.discard()
+                            dedup.discard_content(image.digest)
+                            if near_dup is not None:
+                                near_dup.discard(phash)
+                            return
+                        try:
+                            self.write_image(image, img_url, f"{keyword}_{web_name}_{idx}", download_path,
+                                             dedup, near_dup, phash, namer)
+                        except Exception:
+                            release_slot(img_url)
+                            raise
+                        finally:
+                            with lock:
+                                writing[0] -= 1
+                        if idx >= num_images:
+                            settle()
+                except Exception as e:
+                    self.handle_failure(task, img_url, img_url, proxy, e, retry_queue)
+
+        self.on_image_invalid = release_slot
+        producers = [threading.Thread(target=produce, args=(engine,), daemon=True) for engine in web_names]
+        consumers = [threading.Thread(target=consume, daemon=True) for _ in range(num_threads)]
+        for thread in producers + consumers:
+            thread.start()
+
+        wait_threads(producers)
+        producers_done.set()
+        wait_threads(consumers)
+        self.wait_post_processing()
+        self.on_image_invalid = None
+        self.close_indexes(dedup, near_dup)
+        self.proxy_pool.save()
+
+        if self.terminate:
+            logger.info("Download terminated.")
+        else:  # 如果未被终止，则打印下载完成信息
             logger.info(f"Downloaded image finished")
+        return downloaded[0]
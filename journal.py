@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: journal.py
+Update: 2026.10.18
+"""
+
+import os
+import json
+import queue
+import threading
+
+from logger import logger
+
+JOURNAL_DIR_NAME = '.journal'
+
+
+class JobJournal:
+    """
+    任务检查点日志（追加写入的 JSONL），记录已获取的搜索页与每个链接的下载状态，
+    任务中断后重新运行时只处理未完成的部分。
+    写入由后台线程批量完成，不阻塞下载线程。
+    """
+
+    def __init__(self, path, batch_size=500, flush_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pages = {}  # (搜索引擎, 页码) -> 链接列表
+        self.states = {}  # 链接 -> 下载状态
+        self.completed = False
+        self._queue = queue.Queue()
+        self._closed = False
+
+        self._load()
+        if self.completed:
+            # 上次任务已完成，重新开始
+            self.pages.clear()
+            self.states.clear()
+            self.completed = False
+            os.remove(self.path)
+        elif self.pages or self.states:
+            logger.info(f"Resuming job from {path}: {len(self.pages)} pages, "
+                        f"{self.count('downloaded')} images downloaded")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    @classmethod
+    def for_job(cls, download_folder, keyword, web_name):
+        return cls(os.path.join(download_folder, JOURNAL_DIR_NAME, f"{keyword}_{web_name}.jsonl"))
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 中断时可能留下不完整的最后一行
+                entry_type = entry.get('type')
+                if entry_type == 'page':
+                    self.pages[(entry['web'], entry['pn'])] = entry['urls']
+                elif entry_type == 'state':
+                    self.states[entry['url']] = entry['status']
+                elif entry_type == 'complete':
+                    self.completed = True
+
+    def _write_loop(self):
+        while True:
+            try:
+                entries = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(entries) < self.batch_size:
+                try:
+                    entries.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in entries
+            lines = [json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries if entry is not None]
+            try:
+                self._file.writelines(lines)
+                self._file.flush()
+            except Exception as e:
+                logger.error(f"Failed to write job journal: {e}")
+            if stop:
+                return
+
+    def get_page(self, web_name, pn):
+        return self.pages.get((web_name, pn))
+
+    def record_page(self, web_name, pn, urls):
+        self.pages[(web_name, pn)] = urls
+        self._queue.put({'type': 'page', 'web': web_name, 'pn': pn, 'urls': urls})
+
+    def is_done(self, img_url):
+        # 可重试的失败（failed）在恢复时重试，永久性失败（failed_permanent）与其余状态视为已完成
+        return self.states.get(img_url, 'failed') != 'failed'
+
+    def record_state(self, img_url, status, file_name=None):
+        self.states[img_url] = status
+        self._queue.put({'type': 'state', 'url': img_url, 'status': status, 'file': file_name})
+
+    def count(self, status):
+        return sum(1 for value in list(self.states.values()) if value == status)
+
+    def close(self, completed=False):
+        if self._closed:
+            return
+        self._closed = True
+        if completed:
+            self._queue.put({'type': 'complete'})
+        self._queue.put(None)
+        self._writer.join()
+        self._file.close()
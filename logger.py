@@ -5,13 +5,17 @@ Project Name: Crawler
 File Created: 2024.05.27
 Author: ZhangYuetao
 File Name: logger.py
-Update: 2024.05.28
+Update: 2026.10.18
 """
 
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 from datetime import datetime
 import colorlog
+import toml
 
 log_folder = "log"
 if not os.path.exists(log_folder):
@@ -25,11 +29,9 @@ log_format = "%(asctime)s - %(levelname)s - %(message)s"
 color_log_format = "%(log_color)s%(asctime)s - %(levelname)s - %(message)s"
 
 file_handler = logging.FileHandler(log_filename)
-file_handler.setLevel(logging.INFO)
 file_handler.setFormatter(logging.Formatter(log_format))
 
 stream_handler = colorlog.StreamHandler()
-stream_handler.setLevel(logging.INFO)
 stream_handler.setFormatter(colorlog.ColoredFormatter(
     color_log_format,
     log_colors={
@@ -41,10 +43,52 @@ stream_handler.setFormatter(colorlog.ColoredFormatter(
     }
 ))
 
+
+def get_log_level(settings_path='setting/time_settings.toml'):
+    """
+    读取日志级别设置（log_level），默认为 INFO；设为 DEBUG 时输出每个链接的详细日志。
+    """
+    try:
+        level = toml.load(settings_path).get('log_level', 'INFO')
+    except Exception:
+        return logging.INFO
+    level = logging.getLevelName(str(level).upper())
+    return level if isinstance(level, int) else logging.INFO
+
+
+# 下载线程只把日志记录放入队列，格式化与写文件、写终端由后台监听线程完成
+log_queue = queue.SimpleQueue()
+listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
+
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-logger.addHandler(file_handler)
-logger.addHandler(stream_handler)
+logger.setLevel(get_log_level())
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+logger.propagate = False
+
+# 根日志（含 get_proxy 等模块的日志）同样交给监听线程，与本项目日志输出到相同的文件、终端与界面
+root_logger = logging.getLogger()
+root_logger.setLevel(logging.INFO)
+root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+
+def set_verbosity(level):
+    """
+    调整日志级别，level 可以是 logging 的级别常量或 'DEBUG'、'INFO' 等名称。
+    """
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    logger.setLevel(level)
+
+
+def add_log_handler(handler):
+    """
+    在后台监听线程中增加一个日志输出（如界面控件），本项目日志与根日志都会输出到这里，
+    handler.emit 不会在下载线程中调用。
+    """
+    listener.handlers = listener.handlers + (handler,)
+
 
 # Example usage
 if __name__ == "__main__":
@@ -5,24 +5,29 @@ Project Name: Crawler
 File Created: 2024.05.23
 Author: ZhangYuetao
 File Name: main.py
-Update: 2024.11.18
+Update: 2026.10.18
 """
 
 import os
 import shutil
 import subprocess
 import sys
+import re
 import time
+import multiprocessing
 
-from PyQt5.QtWidgets import QApplication, QMainWindow, QMessageBox
+from PyQt5.QtWidgets import QApplication, QMainWindow, QMessageBox, QProgressBar, QLabel
 from PyQt5 import QtGui, QtCore
+from PyQt5.QtCore import QThread, QTimer
 import qt_material
 import logging
+from collections import deque
 
 from Crawler import Ui_MainWindow
 from utils import pic_utils
-from job_process import JobProcessor
-from logger import logger
+from search_engines import engine_names
+from scheduler import JobScheduler, combine_summaries
+from logger import logger, add_log_handler
 import server_connect
 
 
@@ -34,10 +39,14 @@ class MyClass(QMainWindow, Ui_MainWindow):
         self.setWindowIcon(QtGui.QIcon("sunny.ico"))
 
         self.pic_utils_instance = pic_utils()
-        self.job_processor = JobProcessor(self.pic_utils_instance)
 
         self.pic_path = None
+        self.crawl_thread = None
         self.time_settings_path = 'setting/time_settings.toml'
+        # 多个关键词作为独立任务并发运行，共享连接池、代理池与下载线程
+        # 同时运行的任务数与下载线程数在每次开始任务时按最新设置确定
+        self.scheduler = JobScheduler(self.pic_utils_instance)
+        self.current_jobs = []
         self.current_software_path = self.get_file_path()
         self.current_software_version = server_connect.get_current_software_version(self.current_software_path)
 
@@ -48,13 +57,26 @@ class MyClass(QMainWindow, Ui_MainWindow):
         self.software_update_action.triggered.connect(self.update_software)
 
         self.web = 'baidu'
-        self.web_select_box.addItems(['baidu', 'bing', 'sogou', '360'])
+        self.web_select_box.addItems(engine_names() + ['all'])
         self.web_select_box.currentIndexChanged.connect(self.select_web)
 
-        # 连接日志信息输出到 text_edit 控件
-        log_handler = QTextEditLogger(self.log_edit)
-        logging.getLogger().addHandler(log_handler)
-        logging.getLogger().setLevel(logging.INFO)  # 设置日志级别
+        # 连接日志信息输出到 text_edit 控件，日志在后台监听线程中收集，由定时器批量刷新到界面
+        self.log_handler = QTextEditLogger(self.log_edit)
+        add_log_handler(self.log_handler)
+        self.log_timer = QTimer(self)
+        self.log_timer.timeout.connect(self.log_handler.flush_to_widget)
+        self.log_timer.start(200)
+
+        # 状态栏显示当前任务的下载进度与速率
+        self.progress_label = QLabel()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(240)
+        self.statusbar.addWidget(self.progress_label)
+        self.statusbar.addPermanentWidget(self.progress_bar)
+        self.progress_total = 0
+        self.progress_start = time.time()
+        self.progress_timer = QTimer(self)
+        self.progress_timer.timeout.connect(self.update_progress)
 
         self.auto_update()
         self.init_update()
@@ -169,6 +191,10 @@ class MyClass(QMainWindow, Ui_MainWindow):
     #     self.pic_utils_instance.refresh_proxies()
 
     def submit(self):
+        if self.crawl_thread is not None and self.crawl_thread.isRunning():
+            logger.warning("A crawl job is already running.")
+            return
+
         self.refresh_setting()
         settings = self.pic_utils_instance.get_settings(self.pic_utils_instance.settings_path)
         keyword = settings.get('keyword', 'default_keyword')
@@ -176,35 +202,48 @@ class MyClass(QMainWindow, Ui_MainWindow):
         num_images = int(settings.get('num_images', 10))
         input_type = settings.get('input_type', 'text')
         image_file = settings.get('image_file', '')
-        img_urls = None
-        self.job_processor.terminate = False  # 打开
-
-        if self.web == 'baidu':
-            img_urls = self.job_processor.baidu_image_search(keyword, int(num_images / 30 + 1))
-        elif self.web == 'bing':
-            img_urls = self.job_processor.bing_image_search(keyword, int(num_images / 35 + 1))
-        elif self.web == 'sogou':
-            img_urls = self.job_processor.sogou_image_search(keyword, int(num_images / 48 + 1))
-        elif self.web == '360':
-            img_urls = self.job_processor.so_image_search(keyword, int(num_images / 30 + 1))
-
-        # elif input_type == 'image':
-        #     img_urls = self.job_processor.baidu_image_search_by_image(image_file)
-        # else:
-        #     logger.error(f"{input_type} type error!")
-
-        if img_urls:
-            time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
-            download_way = time_settings.get('download_way', 0)
-            if download_way == 0:
-                self.job_processor.download_images(img_urls[:num_images], keyword, self.web, download_folder)
-            if download_way == 1:
-                self.job_processor.threads_download_images(img_urls[:num_images], keyword, self.web, download_folder)
-            else:
-                logger.error(f"{download_way} type error!")
+
+        # 关键词之间用逗号、分号或换行分隔，多个关键词时每个关键词保存到单独的子文件夹
+        keywords = [word.strip() for word in re.split(r'[,，;；\n]+', keyword) if word.strip()]
+        if not keywords:
+            logger.warning("No keyword given.")
+            return
+        self.current_jobs = []
+        for word in keywords:
+            folder = os.path.join(download_folder, word) if len(keywords) > 1 else download_folder
+            self.current_jobs.append(self.scheduler.add(word, self.web, num_images, folder))
+
+        # 在后台线程中执行搜索与下载，界面保持响应
+        self.crawl_thread = CrawlThread(self.scheduler)
+        self.crawl_thread.finished.connect(self.crawl_finished)
+        self.submit_button.setEnabled(False)
+        self.progress_total = num_images * len(keywords)
+        self.progress_start = time.time()
+        self.progress_bar.setRange(0, max(1, self.progress_total))
+        self.progress_bar.setValue(0)
+        self.crawl_thread.start()
+        self.progress_timer.start(500)
+
+    def crawl_finished(self):
+        self.progress_timer.stop()
+        self.update_progress()
+        self.submit_button.setEnabled(True)
+        self.crawl_thread = None
+
+    def update_progress(self):
+        progress = [job.progress() for job in self.current_jobs]
+        finished = sum(1 for job in progress if job['status'] not in ('pending', 'running'))
+        summary = combine_summaries(progress)
+        elapsed = max(time.time() - self.progress_start, 1e-6)
+        self.progress_bar.setValue(min(summary['downloaded'], self.progress_bar.maximum()))
+        self.progress_label.setText(
+            f"任务 {finished}/{len(progress)}，已下载 {summary['downloaded']}/{self.progress_total}，跳过 {summary['skipped']}，"
+            f"失败 {summary['failed']}，{summary['downloaded'] / elapsed:.2f} 张/秒，"
+            f"{summary['bytes'] / elapsed / 1024 / 1024:.2f} MB/s"
+        )
 
     def stop_download(self):
-        self.job_processor.terminate_download()
+        self.scheduler.stop()
 
     def select_web(self):
         self.web = self.web_select_box.currentText()
@@ -213,26 +252,61 @@ class MyClass(QMainWindow, Ui_MainWindow):
         reply = QMessageBox.question(self, '二次确认', '确定要退出吗？', QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
             self.stop_download()  # 调用停止下载方法
+            if self.crawl_thread is not None:
+                self.crawl_thread.wait()
+            self.scheduler.close()
             event.accept()
         else:
             event.ignore()
 
 
+# CrawlThread 类在后台线程中执行爬取任务
+class CrawlThread(QThread):
+    def __init__(self, scheduler):
+        super().__init__()
+        self.scheduler = scheduler
+
+    def run(self):
+        try:
+            self.scheduler.run()
+        except Exception as e:
+            logger.error(f"Crawl job failed: {e}")
+
+
 # QTextEditLogger 类用于将日志信息输出到 QTextEdit 控件
 class QTextEditLogger(logging.Handler):
+    max_pending = 2000  # 刷新间隔内最多保留的日志条数，超出时丢弃最早的
+    max_blocks = 5000  # 控件中最多保留的日志行数（每行一个段落），避免文档无限增长
+
     def __init__(self, text_edit):
         super().__init__()
         self.text_edit = text_edit
+        self.text_edit.document().setMaximumBlockCount(self.max_blocks)
         self.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        # emit 在日志监听线程中调用，只把消息放入缓冲区，控件由界面线程的定时器批量更新
+        self.pending = deque(maxlen=self.max_pending)
 
     def emit(self, record):
         msg = self.format(record)
         color = self.get_color(record.levelname)
-        html_msg = f'<span style="color:{color}">{msg}</span>'
-        self.text_edit.append(html_msg)
-        # 强制刷新QTextEdit
+        self.pending.append(f'<span style="color:{color}">{msg}</span>')
+
+    def flush_to_widget(self):
+        if not self.pending:
+            return
+        # 每条日志单独成段，setMaximumBlockCount 才能按行数裁剪；整批作为一次编辑插入，只重排一次
+        document = self.text_edit.document()
+        cursor = QtGui.QTextCursor(document)
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.beginEditBlock()
+        first = document.isEmpty()
+        while self.pending:
+            if not first:
+                cursor.insertBlock()
+            first = False
+            cursor.insertHtml(self.pending.popleft())
+        cursor.endEditBlock()
         self.text_edit.ensureCursorVisible()
-        self.text_edit.repaint()
 
     def get_color(self, levelname):
         colors = {
@@ -246,6 +320,7 @@ class QTextEditLogger(logging.Handler):
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包后的程序启动后处理子进程时需要
     QApplication.setAttribute(QtCore.Qt.AA_EnableHighDpiScaling)  # 自适应适配不同分辨率
     QApplication.setAttribute(QtCore.Qt.AA_UseHighDpiPixmaps)
     app = QApplication(sys.argv)
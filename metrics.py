@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: metrics.py
+Update: 2026.10.18
+"""
+
+import time
+import bisect
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from logger import logger
+
+# 请求耗时直方图的桶上界（秒），与 Prometheus 的 le 标签对应
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 指标名称 -> Prometheus 的 HELP 说明
+METRIC_HELP = {
+    'requests_total': "HTTP requests by target host, proxy and outcome.",
+    'request_seconds': "Latency of successful HTTP requests in seconds.",
+    'download_errors': "Failed image downloads by host and failure kind.",
+    'pages_fetched': "Search result pages fetched.",
+    'pages_failed': "Search result pages that could not be fetched.",
+    'pages_saved': "Search result pages skipped compared with fixed pagination.",
+    'search_cache_hits': "Search result pages served from the disk cache.",
+    'search_cache_misses': "Search result pages not found in the disk cache.",
+    'urls_found': "Unique image URLs found.",
+    'images_downloaded': "Images saved.",
+    'images_skipped': "Images skipped as duplicates or not matching.",
+    'images_failed': "Images that failed to download.",
+    'images_invalid': "Saved images removed because they could not be decoded.",
+    'images_normalized': "Images resized or converted by post-processing.",
+    'images_by_format': "Images saved by actual format.",
+    'format_mismatch': "Images whose content did not match their extension.",
+    'bytes_downloaded': "Bytes of image data downloaded.",
+}
+
+# 后处理判定无效时会减少的计数，按 gauge 输出
+GAUGE_NAMES = {'images_downloaded', 'images_by_format'}
+
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+class Histogram:
+    """
+    累计分桶直方图，另保留最近 window 个样本用于计算分位数。
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=1024):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def percentiles(self, quantiles=(0.5, 0.9, 0.99)):
+        samples = sorted(self.recent)
+        if not samples:
+            return {q: None for q in quantiles}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in quantiles}
+
+
+class Metrics:
+    """
+    进程内的计数器与直方图，按引擎、主机、代理等标签区分，可在多个线程中并发更新。
+    """
+
+    def __init__(self):
+        self.counters = {}  # (名称, 标签) -> 数值
+        self.histograms = {}  # (名称, 标签) -> Histogram
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def observe_request(self, url, proxy, seconds, ok=True):
+        """
+        记录一次 HTTP 请求的结果与耗时，按目标主机与代理区分。
+        """
+        host = urlsplit(url).hostname or ''
+        proxy = proxy or 'direct'
+        self.inc('requests_total', host=host, proxy=proxy, outcome='ok' if ok else 'error')
+        if ok:
+            self.observe('request_seconds', seconds, host=host, proxy=proxy)
+
+    def observe_error(self, url, kind):
+        """
+        记录一次下载失败，kind 为 retry_policy 中的失败类型。
+        """
+        self.inc('download_errors', host=urlsplit(url).hostname or '', kind=kind)
+
+    def total(self, name, **labels):
+        """
+        汇总名称为 name、且包含给定标签的所有计数器。
+        """
+        wanted = {(key, str(value)) for key, value in labels.items()}
+        with self._lock:
+            return sum(value for (counter_name, counter_labels), value in self.counters.items()
+                       if counter_name == name and wanted.issubset(counter_labels))
+
+    def latency(self, name='request_seconds', quantiles=(0.5, 0.9, 0.99), **labels):
+        """
+        合并包含给定标签的直方图最近样本，返回 {分位数: 秒数}。
+        """
+        wanted = {(key, str(value)) for key, value in labels.items()}
+        merged = Histogram()
+        with self._lock:
+            for (histogram_name, histogram_labels), histogram in self.histograms.items():
+                if histogram_name == name and wanted.issubset(histogram_labels):
+                    merged.recent.extend(histogram.recent)
+        return merged.percentiles(quantiles)
+
+    def snapshot(self):
+        """
+        返回所有指标的副本：{'counters': [...], 'histograms': [...]}，标签展开为字典。
+        """
+        with self._lock:
+            counters = [(name, dict(labels), value) for (name, labels), value in self.counters.items()]
+            histograms = [(name, dict(labels), histogram.count, histogram.sum, histogram.percentiles())
+                          for (name, labels), histogram in self.histograms.items()]
+        return {
+            'counters': [{'name': name, 'labels': labels, 'value': value} for name, labels, value in counters],
+            'histograms': [{'name': name, 'labels': labels, 'count': count, 'sum': total, 'percentiles': pcts}
+                           for name, labels, count, total, pcts in histograms],
+        }
+
+    def render_prometheus(self):
+        """
+        以 Prometheus 文本格式输出全部指标。
+        """
+        def format_labels(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ''
+            return '{' + ','.join(f'{key}="{escape_label_value(value)}"' for key, value in items) + '}'
+
+        def add_header(name, metric_type):
+            # 同一指标的所有样本连续输出，HELP 与 TYPE 只在第一个样本之前输出一次
+            lines.append(f"# HELP crawler_{name} {escape_help(METRIC_HELP.get(name, name))}")
+            lines.append(f"# TYPE crawler_{name} {metric_type}")
+
+        lines = []
+        with self._lock:
+            previous = None
+            for (name, labels), value in sorted(self.counters.items()):
+                if name != previous:
+                    add_header(name, 'gauge' if name in GAUGE_NAMES else 'counter')
+                    previous = name
+                lines.append(f"crawler_{name}{format_labels(labels)} {value}")
+            previous = None
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                if name != previous:
+                    add_header(name, 'histogram')
+                    previous = name
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f"crawler_{name}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"crawler_{name}_bucket{format_labels(labels, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"crawler_{name}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"crawler_{name}_count{format_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def summary_line(self, elapsed=None, last=None):
+        """
+        生成一行汇总信息，传入上一次的汇总结果 last 与间隔 elapsed 时同时给出速率。
+        """
+        current = {name: self.total(name) for name in
+                   ('pages_fetched', 'urls_found', 'images_downloaded', 'images_skipped', 'images_failed',
+                    'bytes_downloaded')}
+        p = self.latency()
+        line = (f"pages {current['pages_fetched']}, urls {current['urls_found']}, "
+                f"downloaded {current['images_downloaded']}, skipped {current['images_skipped']}, "
+                f"failed {current['images_failed']}")
+        if elapsed and last is not None:
+            images_rate = (current['images_downloaded'] - last['images_downloaded']) / elapsed
+            bytes_rate = (current['bytes_downloaded'] - last['bytes_downloaded']) / elapsed
+            line += f", {images_rate:.2f} images/s, {bytes_rate / 1024 / 1024:.2f} MB/s"
+        if p[0.5] is not None:
+            line += f", latency p50 {p[0.5]:.2f}s p90 {p[0.9]:.2f}s p99 {p[0.99]:.2f}s"
+        return line, current
+
+
+metrics = Metrics()
+
+_reporter = None
+_server = None
+_start_lock = threading.Lock()
+
+
+def start_reporter(interval=10):
+    """
+    启动后台线程，每隔 interval 秒输出一行汇总信息（仅在有变化时），重复调用不会启动多个。
+    """
+    global _reporter
+    with _start_lock:
+        if _reporter is not None or interval <= 0:
+            return
+
+        def report():
+            _, last = metrics.summary_line()
+            last_time = time.time()
+            while True:
+                time.sleep(interval)
+                now = time.time()
+                line, current = metrics.summary_line(now - last_time, last)
+                if current != last:
+                    logger.info(f"Metrics: {line}")
+                last, last_time = current, now
+
+        _reporter = threading.Thread(target=report, daemon=True)
+        _reporter.start()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = metrics.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 不把抓取请求写入日志
+
+
+def start_http_server(port, host='127.0.0.1'):
+    """
+    在本机启动 Prometheus 文本格式的 /metrics 接口，port 为 0 时不启动。
+    """
+    global _server
+    with _start_lock:
+        if _server is not None or not port:
+            return
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            logger.error(f"Failed to start metrics endpoint on {host}:{port}: {e}")
+            return
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        logger.info(f"Metrics endpoint listening on http://{host}:{port}/metrics")
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: near_dup.py
+Update: 2026.10.18
+"""
+
+import io
+import os
+import json
+import threading
+
+import numpy as np
+from PIL import Image
+
+from logger import logger
+
+INDEX_FILE_NAME = '.phash_index.jsonl'
+QUARANTINE_DIR_NAME = 'near_duplicates'
+
+
+def dhash(source, hash_size=8):
+    """
+    计算图片的差异哈希（dHash），返回 hash_size * hash_size 位的整数。
+    source 可以是图片的字节内容或文件路径。
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    with Image.open(source) as img:
+        gray = img.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+        pixels = np.asarray(gray, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """
+    以汉明距离为度量的 BK 树，半径查询只访问满足三角不等式的子树，复杂度低于线性扫描。
+    删除的节点只做标记，仍用于查询时的路径划分。
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+        self.removed = set()
+
+    def add(self, value):
+        self.size += 1
+        if value in self.removed:
+            self.removed.discard(value)
+            return
+        if self.root is None:
+            self.root = (value, {})
+            return
+
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (value, {})
+                return
+            node = child
+
+    def remove(self, value):
+        if value not in self.removed:
+            self.removed.add(value)
+            self.size -= 1
+
+    def find(self, value, radius):
+        """
+        返回距离不超过 radius 的最近节点 (距离, 值)，没有则返回 None。
+        """
+        if self.root is None:
+            return None
+
+        best = None
+        stack = [self.root]
+        while stack:
+            node_value, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= radius and (best is None or distance < best[0]) and node_value not in self.removed:
+                best = (distance, node_value)
+                if distance == 0:
+                    break
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return best
+
+
+class NearDupFilter:
+    """
+    基于感知哈希的近似重复图片过滤，action 为 'drop' 时直接丢弃，
+    为 'quarantine' 时移入下载目录下的 near_duplicates 文件夹。
+    """
+
+    def __init__(self, download_path, radius=4, action='quarantine'):
+        self.download_path = download_path
+        self.radius = radius
+        self.action = action
+        self.tree = BKTree()
+        self.names = {}  # 哈希值 -> 文件名
+        self._lock = threading.Lock()
+
+        index_path = os.path.join(download_path, INDEX_FILE_NAME)
+        self._load(index_path)
+        self._index_file = open(index_path, 'a', encoding='utf-8')
+
+    def _load(self, index_path):
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not os.path.exists(os.path.join(self.download_path, entry.get('file', ''))):
+                    continue
+                value = int(entry['phash'], 16)
+                if value not in self.names:
+                    self.tree.add(value)
+                self.names[value] = entry['file']
+        logger.info(f"Loaded {self.tree.size} perceptual hashes from near duplicate index")
+
+    def add_image(self, source):
+        """
+        计算感知哈希并查询近邻，返回 (是否保留, 哈希值, 相似的已有文件名)。
+        图片无法解码时不做判断，直接保留。
+        """
+        try:
+            value = dhash(source)
+        except Exception as e:
+            logger.warning(f"Failed to compute perceptual hash: {e}")
+            return True, None, None
+
+        with self._lock:
+            match = self.tree.find(value, self.radius)
+            if match is not None:
+                return False, value, self.names.get(match[1])
+            self.tree.add(value)
+            self.names[value] = None
+            return True, value, None
+
+    def discard(self, value):
+        """
+        撤销 add_image 加入、但最终没有保存的图片的哈希，重新下载同一图片时不会与自身匹配。
+        """
+        if value is None:
+            return
+        with self._lock:
+            if value in self.names and self.names[value] is None:
+                del self.names[value]
+                self.tree.remove(value)
+
+    def record(self, value, file_name):
+        if value is None:
+            return
+        line = json.dumps({'phash': f"{value:016x}", 'file': file_name}, ensure_ascii=False)
+        with self._lock:
+            self.names[value] = file_name
+            self._index_file.write(line + '\n')
+            self._index_file.flush()
+
+    def reject(self, image, file_name, match_name):
+        """
+        处理近似重复的图片，image 为下载完成的临时图片（DownloadedImage）。
+        """
+        if self.action == 'quarantine':
+            quarantine_dir = os.path.join(self.download_path, QUARANTINE_DIR_NAME)
+            os.makedirs(quarantine_dir, exist_ok=True)
+            image.commit(os.path.join(quarantine_dir, file_name))
+            logger.warning(f"{file_name} is similar to {match_name}, moved to {QUARANTINE_DIR_NAME}")
+        else:
+            image.discard()
+            logger.warning(f"{file_name} is similar to {match_name}, do not download")
+
+    def close(self):
+        with self._lock:
+            if self._index_file is not None:
+                self._index_file.close()
+                self._index_file = None
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: postprocess.py
+Update: 2026.10.18
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from logger import logger
+from image_tasks import process_image
+
+
+class PostProcessor:
+    """
+    在进程池中对已保存的图片做解码校验与可选的规格化，避免 CPU 密集的工作受 GIL 限制拖慢下载线程。
+    同时在途的图片数不超过 max_in_flight，超出时 submit 阻塞，形成反压。
+    多个任务可共享同一个实例。
+    """
+
+    def __init__(self, max_workers=None, max_in_flight=64, max_side=0, target_format=None, quality=90):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_side = max_side
+        self.target_format = target_format.upper() if target_format else None
+        self.quality = quality
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            max_workers=settings.get('postprocess_workers', 0) or None,
+            max_in_flight=settings.get('postprocess_in_flight', 64),
+            max_side=settings.get('normalize_max_side', 0),
+            target_format=settings.get('normalize_format', '') or None,
+            quality=settings.get('normalize_quality', 90),
+        )
+
+    def _get_executor(self):
+        # 首次使用时才启动子进程
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def submit(self, path, on_result):
+        """
+        提交一个图片文件，处理完成后在回调线程中调用 on_result(result)，返回 Future。
+        处理过程本身出错（如子进程异常退出）时 result 为 None。
+        """
+        self._slots.acquire()
+        try:
+            future = self._get_executor().submit(process_image, path, self.max_side, self.target_format,
+                                                 self.quality)
+        except Exception:
+            self._slots.release()
+            raise
+
+        def done(finished):
+            self._slots.release()
+            try:
+                result = finished.result()
+            except Exception as e:
+                # 子进程异常退出等情况，不能据此判断图片无效
+                logger.error(f"Post-processing failed for {path}: {e}")
+                result = None
+            on_result(result)
+
+        future.add_done_callback(done)
+        return future
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: proxy_pool.py
+Update: 2026.10.18
+"""
+
+import os
+import json
+import time
+import random
+import threading
+
+from logger import logger
+
+
+class ProxyStats:
+    def __init__(self, successes=0, failures=0, consecutive_failures=0, latency=None, cooldown_until=0.0):
+        self.successes = successes
+        self.failures = failures
+        self.consecutive_failures = consecutive_failures
+        self.latency = latency  # 响应时间的指数加权移动平均（秒）
+        self.cooldown_until = cooldown_until
+
+    def to_dict(self):
+        return {
+            'successes': self.successes,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'latency': self.latency,
+            'cooldown_until': self.cooldown_until,
+        }
+
+
+class ProxyPool:
+    """
+    代理健康度统计与加权选择。
+    按成功率与平均延迟加权随机选择代理，连续失败的代理按指数退避冷却，统计信息保存在 stats_path 中。
+    """
+
+    def __init__(self, get_proxies, stats_path='lake/proxy_stats.json', alpha=0.3,
+                 base_cooldown=10, max_cooldown=1800, default_latency=2.0, save_interval=60):
+        self.get_proxies = get_proxies
+        self.stats_path = stats_path
+        self.alpha = alpha
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.default_latency = default_latency
+        self.save_interval = save_interval
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._last_save = time.time()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.stats_path):
+            return
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            self.stats = {proxy: ProxyStats(**values) for proxy, values in data.items()}
+        except Exception as e:
+            logger.error(f"Failed to load proxy stats: {e}")
+
+    def save(self):
+        with self._lock:
+            data = {proxy: stats.to_dict() for proxy, stats in self.stats.items()}
+            self._last_save = time.time()
+        try:
+            with open(self.stats_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file, indent=2)
+        except Exception as e:
+            logger.error(f"Failed to save proxy stats: {e}")
+
+    def _stats(self, proxy):
+        stats = self.stats.get(proxy)
+        if stats is None:
+            stats = ProxyStats()
+            self.stats[proxy] = stats
+        return stats
+
+    def weight(self, stats):
+        # 成功率使用拉普拉斯平滑，未测过的代理也有被选中的机会
+        success_rate = (stats.successes + 1) / (stats.successes + stats.failures + 2)
+        latency = stats.latency if stats.latency is not None else self.default_latency
+        return success_rate / max(latency, 0.05)
+
+    def choose(self, exclude=None):
+        """
+        按健康度加权随机选择代理，exclude 为刚刚失败、本次不希望再选中的代理。
+        """
+        proxies = self.get_proxies()
+        if exclude is not None and len(proxies) > 1:
+            proxies = [proxy for proxy in proxies if proxy != exclude]
+        if not proxies:
+            return None
+
+        now = time.time()
+        with self._lock:
+            stats_list = [self._stats(proxy) for proxy in proxies]
+            available = [(proxy, stats) for proxy, stats in zip(proxies, stats_list) if stats.cooldown_until <= now]
+            if not available:
+                # 全部处于冷却中时，选择最早结束冷却的代理
+                return min(zip(proxies, stats_list), key=lambda item: item[1].cooldown_until)[0]
+            weights = [self.weight(stats) for _, stats in available]
+        return random.choices([proxy for proxy, _ in available], weights=weights)[0]
+
+    def report_success(self, proxy, latency):
+        if proxy is None:
+            return
+        with self._lock:
+            stats = self._stats(proxy)
+            stats.successes += 1
+            stats.consecutive_failures = 0
+            stats.cooldown_until = 0.0
+            if stats.latency is None:
+                stats.latency = latency
+            else:
+                stats.latency = self.alpha * latency + (1 - self.alpha) * stats.latency
+        self._maybe_save()
+
+    def report_failure(self, proxy):
+        if proxy is None:
+            return
+        with self._lock:
+            stats = self._stats(proxy)
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            cooldown = min(self.base_cooldown * 2 ** (stats.consecutive_failures - 1), self.max_cooldown)
+            stats.cooldown_until = time.time() + cooldown
+        self._maybe_save()
+
+    def _maybe_save(self):
+        with self._lock:
+            due = time.time() - self._last_save >= self.save_interval
+            if due:
+                self._last_save = time.time()
+        if due:
+            self.save()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: rate_limiter.py
+Update: 2026.10.18
+"""
+
+import time
+import random
+import asyncio
+import threading
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """
+    令牌桶：每秒补充 rate 个令牌，最多累积 burst 个。
+    reserve 立即预占一个令牌并返回需要等待的秒数，令牌可以透支，
+    因此并发的请求会按顺序排队，而不是同时醒来争抢。
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """
+    按目标主机（可选再按代理）分别限速的令牌桶集合，线程与协程均可使用。
+    host_rates 为 {主机: 每秒请求数}，未列出的主机使用 default_rate；速率不大于 0 表示不限速。
+    jitter 为等待时间的随机浮动比例，避免请求间隔过于规律。
+    """
+
+    def __init__(self, default_rate=0, burst=1, host_rates=None, per_proxy=False, jitter=0.2):
+        self.default_rate = default_rate
+        self.burst = burst
+        self.host_rates = {host.lower(): rate for host, rate in (host_rates or {}).items()}
+        self.per_proxy = per_proxy
+        self.jitter = jitter
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            default_rate=settings.get('rate_limit_default', 0),
+            burst=settings.get('rate_limit_burst', 1),
+            host_rates=settings.get('rate_limits', {}),
+            per_proxy=settings.get('rate_limit_per_proxy', False),
+            jitter=settings.get('rate_limit_jitter', 0.2),
+        )
+
+    def _rate_for(self, host):
+        # 依次匹配完整主机名与上级域名，如 img1.baidu.com 可匹配 baidu.com
+        parts = host.split('.')
+        for i in range(len(parts)):
+            rate = self.host_rates.get('.'.join(parts[i:]))
+            if rate is not None:
+                return rate
+        return self.default_rate
+
+    def reserve(self, url, proxy=None):
+        """
+        预占一个令牌，返回调用方需要等待的秒数。
+        """
+        host = (urlsplit(url).hostname or '').lower()
+        key = (host, proxy) if self.per_proxy else host
+        with self._lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                rate = self._rate_for(host)
+                if rate <= 0:
+                    return 0.0
+                bucket = self.buckets[key] = TokenBucket(rate, self.burst)
+            delay = bucket.reserve()
+        if delay > 0 and self.jitter > 0:
+            delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return delay
+
+    def acquire(self, url, proxy=None):
+        delay = self.reserve(url, proxy)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def async_acquire(self, url, proxy=None):
+        delay = self.reserve(url, proxy)
+        if delay > 0:
+            await asyncio.sleep(delay)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: retry_policy.py
+Update: 2026.10.18
+"""
+
+import time
+import heapq
+import random
+import asyncio
+import threading
+import itertools
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+import requests
+
+from image_fetch import ImageRejected, HTTPStatusError
+
+# 失败类型
+PERMANENT = 'permanent'  # 链接失效或内容不是图片，不再重试
+PROXY = 'proxy'  # 代理不可用或被目标站点封禁，换一个代理重试
+RATE_LIMITED = 'rate_limited'  # 被限流，按 Retry-After 等待后重试
+TRANSIENT = 'transient'  # 网络抖动或服务端临时错误，指数退避后重试
+
+PERMANENT_STATUSES = {400, 401, 404, 405, 410, 414, 451}
+PROXY_STATUSES = {403, 407}
+RATE_LIMITED_STATUSES = {429}
+
+
+def parse_retry_after(value):
+    """
+    解析 Retry-After 头（秒数或 HTTP 日期），返回需要等待的秒数，无法解析时返回 None。
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error, proxy=None):
+    """
+    对下载异常分类，proxy 为本次请求实际使用的代理（未使用代理时为 None）。
+    """
+    if isinstance(error, ImageRejected):
+        return PERMANENT
+    if isinstance(error, HTTPStatusError):
+        if error.status in PERMANENT_STATUSES:
+            return PERMANENT
+        if error.status in RATE_LIMITED_STATUSES or (error.status == 503 and error.retry_after is not None):
+            return RATE_LIMITED
+        if error.status in PROXY_STATUSES:
+            # 未走代理时 403 多为防盗链，换代理也无济于事
+            return PROXY if proxy else PERMANENT
+        if error.status >= 500:
+            return TRANSIENT
+        return PERMANENT
+    if isinstance(error, (requests.exceptions.ProxyError, aiohttp.ClientProxyConnectionError,
+                          aiohttp.ClientHttpProxyError)):
+        return PROXY
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, aiohttp.ClientConnectionError,
+                          aiohttp.ClientPayloadError, asyncio.TimeoutError)):
+        return PROXY if proxy else TRANSIENT
+    if isinstance(error, (requests.exceptions.InvalidURL, requests.exceptions.MissingSchema,
+                          requests.exceptions.InvalidSchema, aiohttp.InvalidURL)):
+        return PERMANENT
+    return TRANSIENT
+
+
+class RetryPolicy:
+    """
+    根据失败类型决定是否重试以及重试前的等待时间，最多尝试 max_attempts 次。
+    """
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=60.0, jitter=0.5):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            max_attempts=settings.get('retry_max_attempts', 4),
+            base_delay=settings.get('retry_base_delay', 1.0),
+            max_delay=settings.get('retry_max_delay', 60.0),
+            jitter=settings.get('retry_jitter', 0.5),
+        )
+
+    def retry_delay(self, kind, attempt, error=None):
+        """
+        返回第 attempt 次（从 1 开始）失败后重试前的等待秒数，不再重试时返回 None。
+        """
+        if kind == PERMANENT or attempt >= self.max_attempts:
+            return None
+        if kind == PROXY:
+            return 0.0  # 换代理立即重试
+        if kind == RATE_LIMITED:
+            retry_after = parse_retry_after(getattr(error, 'retry_after', None))
+            if retry_after is not None:
+                return min(retry_after, self.max_delay)
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def reschedule(self, task, error, retry_queue, proxy=None):
+        """
+        按错误类型把失败的任务放回队列，proxy 为本次实际使用的代理。
+        返回 (失败类型, 等待秒数)，不再重试时等待秒数为 None。
+        """
+        kind = classify_error(error, proxy)
+        task.attempt += 1
+        delay = self.retry_delay(kind, task.attempt, error)
+        if delay is not None:
+            task.avoid_proxy = proxy if kind == PROXY else None
+            retry_queue.push(task, delay)
+        return kind, delay
+
+
+class RetryTask:
+    """
+    下载任务及其重试状态，item 为调用方自定义的任务内容。
+    """
+
+    def __init__(self, item, attempt=0, avoid_proxy=None):
+        self.item = item
+        self.attempt = attempt
+        self.avoid_proxy = avoid_proxy
+
+
+class RetryQueue:
+    """
+    下载任务队列：新任务按顺序取出，需要重试的任务按可执行时间放回，到期后优先取出。
+    取任务从不阻塞，等待重试的任务不占用下载线程。
+    """
+
+    def __init__(self, items=()):
+        self.pending = deque(RetryTask(item) for item in items)
+        self.delayed = []  # (可执行时间, 序号, 任务)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def push(self, task, delay=0.0):
+        with self._lock:
+            heapq.heappush(self.delayed, (time.monotonic() + delay, next(self._seq), task))
+
+    def pop(self):
+        """
+        取出一个可以立即执行的任务，没有时返回 None。
+        """
+        with self._lock:
+            if self.delayed and self.delayed[0][0] <= time.monotonic():
+                return heapq.heappop(self.delayed)[2]
+            if self.pending:
+                return self.pending.popleft()
+            return None
+
+    def next_delay(self):
+        """
+        距离下一个任务可执行的秒数，队列已空时返回 None。
+        """
+        with self._lock:
+            if self.pending:
+                return 0.0
+            if self.delayed:
+                return max(0.0, self.delayed[0][0] - time.monotonic())
+            return None
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: scheduler.py
+Update: 2026.10.18
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+
+from logger import logger
+from job_process import JobProcessor
+from session_pool import SessionPool
+from proxy_pool import ProxyPool
+from rate_limiter import RateLimiter
+from postprocess import PostProcessor
+from search_cache import SearchCache
+
+
+class FairExecutor:
+    """
+    多个任务共享的下载线程池。每个任务通过 lane() 获得独立的提交队列，空闲线程按任务轮流取出工作，
+    某个任务排队的工作再多，其他任务也能分到线程。
+    """
+
+    def __init__(self, max_workers=10):
+        self.max_workers = max(1, max_workers)
+        self._ready = deque()  # 有待执行工作的队列，按轮转顺序排列
+        self._cond = threading.Condition()
+        self._threads = []
+        self._shutdown = False
+
+    def lane(self, name=None):
+        return FairLane(self, name)
+
+    def _enqueue(self, lane, item):
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new work after shutdown")
+            lane.items.append(item)
+            if not lane.ready:
+                lane.ready = True
+                self._ready.append(lane)
+            if len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._worker, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._shutdown:
+                    self._cond.wait()
+                if not self._ready:
+                    return
+                lane = self._ready.popleft()
+                future, fn, args, kwargs = lane.items.popleft()
+                if lane.items:
+                    self._ready.append(lane)  # 排到队尾，下一次先执行其他任务的工作
+                else:
+                    lane.ready = False
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def _cancel(self, lane):
+        with self._cond:
+            items = list(lane.items)
+            lane.items.clear()
+        for future, _, _, _ in items:
+            future.cancel()
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+class FairLane:
+    """
+    FairExecutor 中单个任务的提交队列，接口与 ThreadPoolExecutor 相同，关闭时只等待本队列的工作。
+    """
+
+    def __init__(self, executor, name=None):
+        self.executor = executor
+        self.name = name
+        self.items = deque()
+        self.ready = False  # 是否已在执行器的轮转队列中
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+        self.executor._enqueue(self, (future, fn, args, kwargs))
+        return future
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        if cancel_futures:
+            self.executor._cancel(self)
+        if wait:
+            with self._lock:
+                futures = list(self._futures)
+            wait_futures(futures)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(wait=True)
+        return False
+
+
+def combine_summaries(summaries):
+    """
+    合并多个任务的统计（不含 elapsed），各格式的数量分别相加。
+    """
+    totals = {'urls_found': 0, 'downloaded': 0, 'skipped': 0, 'failed': 0, 'bytes': 0, 'formats': {}}
+    for summary in summaries:
+        for name, value in summary.items():
+            if name == 'formats':
+                for image_format, count in value.items():
+                    totals['formats'][image_format] = totals['formats'].get(image_format, 0) + count
+            elif name in totals:
+                totals[name] += value
+    return totals
+
+
+class CrawlJob:
+    """
+    调度器中的一个 (关键词, 搜索引擎, 数量) 任务及其状态：pending、running、done、failed 或 cancelled。
+    """
+
+    def __init__(self, keyword, web_name, num_images, download_folder, processor):
+        self.keyword = keyword
+        self.web_name = web_name
+        self.num_images = num_images
+        self.download_folder = download_folder
+        self.processor = processor
+        self.status = 'pending'
+        self.error = None
+        self.summary = None
+
+    @property
+    def name(self):
+        return f"{self.keyword}/{self.web_name}"
+
+    def progress(self):
+        """
+        返回任务的状态、目标数量与当前统计，运行中的任务也可随时调用。
+        """
+        summary = self.summary if self.summary is not None else self.processor.stats.summary()
+        return dict(summary, name=self.name, status=self.status, target=self.num_images)
+
+
+class JobScheduler:
+    """
+    批量运行 (关键词, 搜索引擎, 数量) 任务：同时运行的任务数不超过 max_jobs，
+    所有任务共享连接池、代理池、按主机限速、全局请求并发上限、后处理进程池、搜索结果缓存与下载线程。
+    只有多线程下载方式（download_way = 1）的下载线程按任务轮流分配，大任务不会让其他任务等待；
+    其余下载方式各任务独立下载，只共享连接、代理、限速与请求并发上限。
+    max_jobs、max_workers 为 None 时使用设置中的 scheduler_max_jobs、threads_num，
+    每次 run() 前按最新设置重建共享资源，界面中修改的设置对下一次任务生效。
+    """
+
+    def __init__(self, pic_utils_instance, max_jobs=None, max_workers=None, max_requests=None,
+                 time_settings_path='setting/time_settings.toml'):
+        self.pic_utils_instance = pic_utils_instance
+        self.time_settings_path = time_settings_path
+        self.requested_jobs = max_jobs
+        self.requested_workers = max_workers
+        self.proxy_pool = ProxyPool(pic_utils_instance.get_proxies)
+        self.request_slots = threading.BoundedSemaphore(max_requests) if max_requests else None
+        self.session_pool = None
+        self.rate_limiter = None
+        self.post_processor = None
+        self.search_cache = None
+        self.executor = None
+        self._settings = None  # 创建当前共享资源时的设置
+        self._running = False
+        self.reload_settings()
+
+        self.jobs = []
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def reload_settings(self):
+        """
+        设置有变化时按新设置重建连接池、限速、后处理进程池、搜索结果缓存、下载线程池与同时运行的任务数，
+        代理池与请求并发上限保持不变。任务运行期间不重建，返回是否已重建。
+        """
+        time_settings = self.pic_utils_instance.get_settings(self.time_settings_path)
+        if self._running or time_settings == self._settings:
+            return False
+        self._close_resources()
+        self._settings = time_settings
+        self.max_jobs = max(1, self.requested_jobs or time_settings.get('scheduler_max_jobs', 4))
+        self.session_pool = SessionPool(
+            pool_connections=time_settings.get('pool_connections', 10),
+            pool_maxsize=time_settings.get('pool_maxsize', 10),
+        )
+        self.rate_limiter = RateLimiter.from_settings(time_settings)
+        self.post_processor = None
+        if time_settings.get('postprocess', False):
+            self.post_processor = PostProcessor.from_settings(time_settings)
+        self.search_cache = SearchCache.from_settings(time_settings)
+        self.executor = FairExecutor(self.requested_workers or time_settings.get('threads_num', 10))
+        self.progress_interval = time_settings.get('scheduler_progress_interval', 10)
+        return True
+
+    def _close_resources(self):
+        if self.post_processor is not None:
+            self.post_processor.close()
+        if self.search_cache is not None:
+            self.search_cache.close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def create_processor(self):
+        """
+        创建使用共享资源的 JobProcessor。
+        """
+        return JobProcessor(self.pic_utils_instance, self.session_pool, self.proxy_pool, self.request_slots,
+                            self.rate_limiter, self.post_processor, self.search_cache, self.executor)
+
+    def add(self, keyword, web_name, num_images, download_folder):
+        processor = self.create_processor()
+        job = CrawlJob(keyword, web_name, num_images, download_folder, processor)
+        with self._lock:
+            self.jobs.append(job)
+            self._pending.append(job)
+        return job
+
+    def run(self):
+        """
+        按加入顺序运行所有待运行的任务，阻塞直到全部结束，返回本次运行的任务列表。
+        """
+        with self._lock:
+            jobs = list(self._pending)
+            self._pending.clear()
+        if not jobs:
+            return jobs
+        if self.reload_settings():
+            # 设置已变化，尚未开始的任务改用新的共享资源
+            for job in jobs:
+                job.processor = self.create_processor()
+        self._running = True
+        self._stopped.clear()
+
+        reporter_stop = threading.Event()
+        if self.progress_interval and self.progress_interval > 0:
+            threading.Thread(target=self._report_progress, args=(jobs, reporter_stop), daemon=True).start()
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.max_jobs, len(jobs))) as executor:
+                futures = [executor.submit(self._run_job, job) for job in jobs]
+                try:
+                    wait_futures(futures)
+                except KeyboardInterrupt:
+                    logger.warning("Interrupted, stopping all jobs...")
+                    self.stop()
+                    wait_futures(futures)
+        finally:
+            self._running = False
+            reporter_stop.set()
+            self.proxy_pool.save()
+        return jobs
+
+    def _run_job(self, job):
+        if self._stopped.is_set():
+            job.status = 'cancelled'
+            return
+        job.status = 'running'
+        logger.info(f"Job {job.name} started")
+        try:
+            job.summary = job.processor.run_job(job.web_name, job.keyword, job.num_images, job.download_folder)
+            job.status = 'cancelled' if self._stopped.is_set() else 'done'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            logger.error(f"Job {job.name} failed: {e}")
+
+    def _report_progress(self, jobs, stop_event):
+        while not stop_event.wait(self.progress_interval):
+            finished = sum(1 for job in jobs if job.status not in ('pending', 'running'))
+            for job in jobs:
+                if job.status != 'running':
+                    continue
+                progress = job.progress()
+                logger.info(f"[{finished}/{len(jobs)} jobs] {job.name}: downloaded {progress['downloaded']}"
+                            f"/{job.num_images}, skipped {progress['skipped']}, failed {progress['failed']}")
+
+    def progress(self):
+        return [job.progress() for job in self.jobs]
+
+    def stop(self):
+        """
+        终止正在运行的任务，尚未开始的任务不再运行。
+        """
+        self._stopped.set()
+        for job in list(self.jobs):
+            job.processor.terminate_download()
+
+    def close(self):
+        self.proxy_pool.save()
+        self._close_resources()
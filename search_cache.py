@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: search_cache.py
+Update: 2026.10.18
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from logger import logger
+
+
+class SearchCache:
+    """
+    搜索结果页的磁盘缓存（SQLite），按搜索引擎给出的缓存键保存解析后的链接列表，
+    重复运行同一关键词时既不请求网络也不重新解析。
+    条目超过 ttl 秒后失效；条目数超过 max_entries 时按最近使用时间淘汰。
+    多个任务可共享同一个实例。
+    """
+
+    def __init__(self, path='lake/search_cache.sqlite3', ttl=86400, max_entries=20000, evict_interval=100):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_interval = evict_interval  # 每写入多少条检查一次容量
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "key TEXT PRIMARY KEY, urls TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_last_used ON pages (last_used)")
+        with self._lock:
+            self._purge()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """
+        search_cache 为 false 时不启用缓存，返回 None。
+        """
+        if not settings.get('search_cache', True):
+            return None
+        try:
+            return cls(
+                path=settings.get('search_cache_path', 'lake/search_cache.sqlite3'),
+                ttl=settings.get('search_cache_ttl', 86400),
+                max_entries=settings.get('search_cache_max_entries', 20000),
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to open search cache: {e}")
+            return None
+
+    def get(self, key):
+        """
+        返回缓存的链接列表，未命中或已过期时返回 None。
+        """
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute("SELECT urls, created FROM pages WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if self.ttl and now - row[1] > self.ttl:
+                    self._conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+                    self._conn.commit()
+                    return None
+                self._conn.execute("UPDATE pages SET last_used = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to read search cache: {e}")
+                return None
+        return json.loads(row[0])
+
+    def put(self, key, urls):
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pages (key, urls, created, last_used) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(urls, ensure_ascii=False), now, now),
+                )
+                self._writes += 1
+                if self._writes % self.evict_interval == 0:
+                    self._purge()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to write search cache: {e}")
+
+    def _purge(self):
+        # 删除过期条目，再按最近使用时间淘汰超出容量的条目
+        if self.ttl:
+            self._conn.execute("DELETE FROM pages WHERE created < ?", (time.time() - self.ttl,))
+        if self.max_entries:
+            self._conn.execute(
+                "DELETE FROM pages WHERE key IN (SELECT key FROM pages ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._purge()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to clean up search cache: {e}")
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: search_engines.py
+Update: 2026.10.18
+"""
+
+import abc
+import json
+import inspect
+from urllib.parse import urlsplit, urlunsplit, parse_qsl
+
+from extractors import extract_so, extract_sogou, extract_bing, extract_baidu
+
+# 搜索引擎名称 -> 搜索引擎类，按注册顺序排列
+ENGINES = {}
+
+
+def register_engine(cls):
+    """
+    类装饰器，把搜索引擎注册到 ENGINES 中，界面、命令行与下载流程都从这里获取可用的搜索引擎。
+    未实现全部抽象方法或没有 name 的类在注册时即报错。
+    """
+    if inspect.isabstract(cls):
+        missing = ', '.join(sorted(cls.__abstractmethods__))
+        raise TypeError(f"Search engine {cls.__name__} does not implement: {missing}")
+    if not cls.name:
+        raise TypeError(f"Search engine {cls.__name__} has no name")
+    ENGINES[cls.name] = cls
+    return cls
+
+
+def engine_names():
+    return list(ENGINES)
+
+
+def create_engine(web_name, keyword, pic_utils_instance):
+    try:
+        engine_class = ENGINES[web_name]
+    except KeyError:
+        raise ValueError(f"Unknown search engine: {web_name}") from None
+    return engine_class(keyword, pic_utils_instance)
+
+
+class SearchEngine(abc.ABC):
+    """
+    搜索引擎的公共接口：构造某一页的请求、解析结果页、每页结果数以及结果是否已取完。
+    每个实例对应一个关键词，各页可在多个线程中并发请求。
+    """
+    name = None
+    page_size = 30  # 每页返回的图片数量
+    encoding = 'utf-8'  # 结果页编码，为 None 时使用 requests 的判断
+    volatile_params = ()  # 不影响搜索结果的参数（如日志编号），不计入缓存键
+
+    def __init__(self, keyword, pic_utils_instance):
+        self.keyword = keyword
+        self.pic_utils_instance = pic_utils_instance
+        self.headers = {
+            "User-Agent": pic_utils_instance.get_random_user_agent(),
+        }
+
+    @abc.abstractmethod
+    def build_request(self, pn):
+        """
+        返回第 pn 页（从 0 开始）的 (url, params)，params 为 None 时链接已包含全部参数。
+        """
+
+    @abc.abstractmethod
+    def parse(self, page):
+        """
+        从结果页文本中提取图片链接列表。
+        """
+
+    def cache_key(self, pn):
+        """
+        第 pn 页的缓存键：搜索引擎名称、链接与排序后的参数，忽略空参数与 volatile_params。
+        """
+        search_url, params = self.build_request(pn)
+        parts = urlsplit(search_url)
+        query = parse_qsl(parts.query, keep_blank_values=True) + [(str(k), str(v)) for k, v in (params or {}).items()]
+        query = sorted((k, v) for k, v in query if v != '' and k not in self.volatile_params)
+        base_url = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, '', ''))
+        return json.dumps([self.name, base_url, query, pn], ensure_ascii=False)
+
+    @classmethod
+    def page_count(cls, num_images):
+        """
+        取到 num_images 张图片预计需要的页数，实际页数由翻页过程根据结果调整。
+        """
+        return int(num_images / cls.page_size + 1)
+
+    def is_exhausted(self, pn, img_urls):
+        """
+        根据第 pn 页的结果判断后续页面是否已没有结果。空页与重复页由翻页过程统一处理，
+        这里只需处理搜索引擎特有的结束标志。
+        """
+        return False
+
+
+@register_engine
+class BaiduEngine(SearchEngine):
+    name = 'baidu'
+    page_size = 30
+    search_url = "https://image.baidu.com/search/index?tn=baiduimage&word="
+    volatile_params = ('logid', 'gsm', '1660633609940')
+
+    def __init__(self, keyword, pic_utils_instance):
+        super().__init__(keyword, pic_utils_instance)
+        self.params = pic_utils_instance.get_params('baidu_text_search_param.json')
+        self.params['queryWord'] = keyword
+        self.params['word'] = keyword
+
+    def build_request(self, pn):
+        # 各页并发请求，每页使用独立的参数副本
+        return self.search_url, dict(self.params, pn=pn * self.page_size)
+
+    def parse(self, page):
+        return extract_baidu(page)
+
+
+@register_engine
+class BingEngine(SearchEngine):
+    name = 'bing'
+    page_size = 35
+    encoding = None
+
+    def build_request(self, pn):
+        search_url = (f"https://www.bing.com/images/search?q={self.keyword}"
+                      f"&first={pn * self.page_size + 1}&count={self.page_size}")
+        return search_url, None
+
+    def parse(self, page):
+        return extract_bing(page)
+
+
+@register_engine
+class SogouEngine(SearchEngine):
+    name = 'sogou'
+    page_size = 48
+    search_url = "https://pic.sogou.com/pics?"
+
+    def __init__(self, keyword, pic_utils_instance):
+        super().__init__(keyword, pic_utils_instance)
+        self.params = pic_utils_instance.get_params('sogou_text_search_param.json')
+        self.params['query'] = keyword
+
+    def build_request(self, pn):
+        return self.search_url, dict(self.params, start=pn * self.page_size)
+
+    def parse(self, page):
+        return extract_sogou(page)
+
+
+@register_engine
+class SoEngine(SearchEngine):
+    name = '360'
+    page_size = 30
+
+    def build_request(self, pn):
+        return f"https://image.so.com/i?q={self.keyword}&sn={pn * self.page_size}", None
+
+    def parse(self, page):
+        return extract_so(page)
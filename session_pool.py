@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: session_pool.py
+Update: 2026.10.18
+"""
+
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SessionPool:
+    """
+    按 (代理, 主机) 复用 requests.Session，保持长连接以省去重复的 TCP/TLS 握手。
+    搜索与下载共用同一个实例，可在线程池中并发调用。
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, max_sessions=256):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @staticmethod
+    def effective_proxy(url, proxy):
+        # 代理只对 http 链接生效，https 链接无论选中哪个代理都直接连接，共用同一个会话
+        return proxy if url.startswith('http://') else None
+
+    def get_session(self, url, proxy=None):
+        key = (self.effective_proxy(url, proxy), urlsplit(url).netloc)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._create_session()
+                self._sessions[key] = session
+                # 超出上限时关闭最久未使用的会话
+                if len(self._sessions) > self.max_sessions:
+                    _, old_session = self._sessions.popitem(last=False)
+                    old_session.close()
+            else:
+                self._sessions.move_to_end(key)
+        return session
+
+    def get(self, url, proxy=None, **kwargs):
+        proxy = self.effective_proxy(url, proxy)
+        session = self.get_session(url, proxy)
+        proxies = {'http': proxy} if proxy else None
+        return session.get(url, proxies=proxies, **kwargs)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
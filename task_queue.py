@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: task_queue.py
+Update: 2026.10.18
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from multiprocessing.managers import BaseManager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    keyword TEXT NOT NULL,
+    web_name TEXT NOT NULL,
+    num_images INTEGER NOT NULL,
+    download_folder TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'running',
+    downloaded INTEGER NOT NULL DEFAULT 0,
+    next_pn INTEGER NOT NULL DEFAULT 0,
+    max_pages INTEGER NOT NULL DEFAULT 0,
+    name_base INTEGER NOT NULL DEFAULT 0,
+    last_leased REAL NOT NULL DEFAULT 0,
+    UNIQUE (keyword, web_name, download_folder)
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    avoid_proxy TEXT,
+    not_before REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    found INTEGER,
+    UNIQUE (job_id, kind, key)
+);
+CREATE INDEX IF NOT EXISTS tasks_pending ON tasks (status, not_before);
+CREATE INDEX IF NOT EXISTS tasks_job ON tasks (job_id, status);
+CREATE TABLE IF NOT EXISTS digests (
+    job_id INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    task_id INTEGER NOT NULL,
+    url TEXT,
+    file_name TEXT,
+    PRIMARY KEY (job_id, digest)
+);
+CREATE INDEX IF NOT EXISTS digests_task ON digests (task_id);
+CREATE TABLE IF NOT EXISTS slots (
+    job_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    task_id INTEGER NOT NULL UNIQUE,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+"""
+
+
+class QueueTask:
+    """
+    租用到的一个任务，kind 为 search（payload 含 engine、pn）或 download（payload 含 url）。
+    """
+
+    def __init__(self, task_id, job_id, kind, payload, attempts, avoid_proxy):
+        self.id = task_id
+        self.job_id = job_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+        self.avoid_proxy = avoid_proxy
+
+
+class TaskQueue:
+    """
+    放在共享目录中的任务队列（SQLite），协调进程写入任务，多个节点上的工作进程租用任务并汇报结果。
+    工作进程定期发送心跳延长租约，租约过期（进程崩溃或失联）的任务重新排队，
+    重新排队超过 max_attempts 次的任务记为失败。
+    下载任务登记的内容摘要与文件序号都记在任务名下：任务重新排队后由新的租用者沿用，
+    任务失败、跳过或取消时释放；任务完成（done）后才计入已下载数量。
+    SQLite 依赖文件锁，NFS、SMB 等网络文件系统上的文件锁并不可靠，可能导致数据库损坏，
+    因此只在同一台机器的多个进程之间直接打开数据库文件；跨机器时用 serve_queue 在一台机器上
+    提供 TCP 服务，其他节点通过 connect_queue 访问。
+    每个线程使用独立的数据库连接，可在多个线程与进程中并发使用。
+    """
+
+    def __init__(self, path, max_attempts=4, requeue_interval=1.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.requeue_interval = requeue_interval  # 租用任务时检查过期租约的最短间隔
+        self._next_requeue = 0
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        # WAL 依赖共享内存，不能用于网络文件系统，使用默认的回滚日志
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # 自动提交模式，需要原子性的操作显式开启事务
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ---------- 协调进程 ----------
+
+    def add_job(self, keyword, web_name, num_images, download_folder, max_pages, name_base=0):
+        """
+        新建任务并返回 (任务编号, 是否新建)，同一关键词、搜索引擎与下载目录的任务已存在时沿用原任务。
+        name_base 为文件序号的起点，下载目录中已有同名前缀的文件时从其最大序号之后继续编号。
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT id FROM jobs WHERE keyword = ? AND web_name = ? AND download_folder = ?",
+                               (keyword, web_name, download_folder)).fetchone()
+            if row is not None:
+                return row['id'], False
+            cursor = conn.execute(
+                "INSERT INTO jobs (keyword, web_name, num_images, download_folder, max_pages, name_base) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (keyword, web_name, num_images, download_folder, max_pages, name_base),
+            )
+            return cursor.lastrowid, True
+
+    def get_job(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def jobs(self):
+        return [dict(row) for row in self._connect().execute("SELECT * FROM jobs ORDER BY id")]
+
+    def add_search_pages(self, job_id, engines, start_pn, end_pn):
+        """
+        为任务加入 [start_pn, end_pn) 页的搜索任务，每页对每个搜索引擎各一个任务。
+        """
+        with self._transaction() as conn:
+            for pn in range(start_pn, end_pn):
+                for engine in engines:
+                    payload = json.dumps({'engine': engine, 'pn': pn})
+                    conn.execute(
+                        "INSERT OR IGNORE INTO tasks (job_id, kind, key, payload) VALUES (?, 'search', ?, ?)",
+                        (job_id, f"{engine}:{pn}", payload))
+            conn.execute("UPDATE jobs SET next_pn = MAX(next_pn, ?) WHERE id = ?", (end_pn, job_id))
+
+    def task_counts(self, job_id):
+        """
+        返回任务各状态的数量，如 {('search', 'done'): 3, ('download', 'pending'): 40}。
+        """
+        rows = self._connect().execute(
+            "SELECT kind, status, COUNT(*) AS count FROM tasks WHERE job_id = ? GROUP BY kind, status", (job_id,))
+        return {(row['kind'], row['status']): row['count'] for row in rows}
+
+    def trailing_empty_pages(self, job_id):
+        """
+        返回末尾连续没有新链接的搜索页数。各搜索引擎的同一页合并计算，
+        没有一个搜索引擎成功获取的页面（全部失败）既不计为空页，也不中断计数。
+        """
+        rows = self._connect().execute(
+            "SELECT payload, found FROM tasks WHERE job_id = ? AND kind = 'search' AND status = 'done'", (job_id,))
+        found_by_page = {}
+        for row in rows:
+            pn = json.loads(row['payload'])['pn']
+            found_by_page[pn] = found_by_page.get(pn, 0) + (row['found'] or 0)
+        empty = 0
+        for pn in sorted(found_by_page, reverse=True):
+            if found_by_page[pn] > 0:
+                break
+            empty += 1
+        return empty
+
+    def finish_job(self, job_id):
+        """
+        结束任务，尚未执行的子任务不再执行。
+        """
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET status = 'done' WHERE id = ?", (job_id,))
+            conn.execute("UPDATE tasks SET status = 'cancelled' WHERE job_id = ? AND status = 'pending'", (job_id,))
+
+    def requeue_expired(self):
+        """
+        把租约过期的任务重新排队，返回重新排队的任务数。
+        重新排队的任务保留已登记的摘要与序号，由下一个租用者沿用；达到 max_attempts 的任务记为失败并释放。
+        """
+        now = time.time()
+        requeued = 0
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT id, attempts FROM tasks WHERE status = 'leased' AND lease_expires < ?",
+                                (now,)).fetchall()
+            for row in rows:
+                if row['attempts'] + 1 >= self.max_attempts:
+                    conn.execute("UPDATE tasks SET status = 'failed', lease_owner = NULL WHERE id = ?", (row['id'],))
+                    self._release_claims(conn, row['id'])
+                else:
+                    conn.execute("UPDATE tasks SET status = 'pending', attempts = attempts + 1, lease_owner = NULL "
+                                 "WHERE id = ?", (row['id'],))
+                    requeued += 1
+        return requeued
+
+    @staticmethod
+    def _release_claims(conn, task_id):
+        conn.execute("DELETE FROM digests WHERE task_id = ?", (task_id,))
+        conn.execute("DELETE FROM slots WHERE task_id = ?", (task_id,))
+
+    # ---------- 工作进程 ----------
+
+    def lease(self, worker_id, lease_seconds=60):
+        """
+        租用一个可执行的任务，没有时返回 None。各任务之间轮流分配，同一任务中优先执行下载。
+        """
+        now = time.time()
+        if now >= self._next_requeue:
+            self._next_requeue = now + self.requeue_interval
+            self.requeue_expired()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT t.* FROM tasks t JOIN jobs j ON t.job_id = j.id "
+                "WHERE t.status = 'pending' AND t.not_before <= ? AND j.status = 'running' "
+                "ORDER BY j.last_leased, t.kind = 'search', t.id LIMIT 1", (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ? WHERE id = ?",
+                         (worker_id, now + lease_seconds, row['id']))
+            conn.execute("UPDATE jobs SET last_leased = ? WHERE id = ?", (now, row['job_id']))
+        return QueueTask(row['id'], row['job_id'], row['kind'], json.loads(row['payload']), row['attempts'],
+                         row['avoid_proxy'])
+
+    def heartbeat(self, worker_id, lease_seconds=60):
+        """
+        延长该工作进程持有的所有租约。
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO workers (id, heartbeat) VALUES (?, ?)", (worker_id, now))
+            conn.execute("UPDATE tasks SET lease_expires = ? WHERE status = 'leased' AND lease_owner = ?",
+                         (now + lease_seconds, worker_id))
+
+    def complete(self, task_id, worker_id, status='done', found=None):
+        """
+        汇报任务结果，租约已失效（任务已被重新分配）时返回 False。
+        下载任务完成（done）时计入已下载数量，其他结果释放任务登记的摘要与序号。
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT job_id, kind FROM tasks WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                               (task_id, worker_id)).fetchone()
+            if row is None:
+                return False
+            conn.execute("UPDATE tasks SET status = ?, found = ?, lease_owner = NULL WHERE id = ?",
+                         (status, found, task_id))
+            if status != 'done':
+                self._release_claims(conn, task_id)
+            elif row['kind'] == 'download':
+                conn.execute("UPDATE jobs SET downloaded = downloaded + 1 WHERE id = ?", (row['job_id'],))
+        return True
+
+    def retry(self, task_id, worker_id, delay, attempts, avoid_proxy=None):
+        """
+        把任务在 delay 秒后重新排队并释放其登记的摘要与序号，租约已失效时返回 False。
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'pending', attempts = ?, avoid_proxy = ?, not_before = ?, "
+                "lease_owner = NULL WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (attempts, avoid_proxy, time.time() + delay, task_id, worker_id))
+            if cursor.rowcount == 0:
+                return False
+            self._release_claims(conn, task_id)
+        return True
+
+    def add_downloads(self, job_id, items):
+        """
+        加入 (去重键, 链接) 形式的下载任务，去重键相同的链接只下载一次，返回新加入的任务数。
+        """
+        added = 0
+        with self._transaction() as conn:
+            for key, img_url in items:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO tasks (job_id, kind, key, payload) VALUES (?, 'download', ?, ?)",
+                    (job_id, key, json.dumps({'url': img_url})))
+                added += cursor.rowcount
+        return added
+
+    def claim_digest(self, job_id, digest, task_id):
+        """
+        以任务 task_id 的名义登记图片内容摘要，已由其他任务登记过相同内容时返回 False。
+        """
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO digests (job_id, digest, task_id) VALUES (?, ?, ?)",
+                         (job_id, digest, task_id))
+            row = conn.execute("SELECT task_id FROM digests WHERE job_id = ? AND digest = ?",
+                               (job_id, digest)).fetchone()
+        return row['task_id'] == task_id
+
+    def release_digest(self, job_id, digest, task_id):
+        self._connect().execute("DELETE FROM digests WHERE job_id = ? AND digest = ? AND task_id = ?",
+                                (job_id, digest, task_id))
+
+    def record_digest(self, job_id, digest, img_url, file_name):
+        self._connect().execute("UPDATE digests SET url = ?, file_name = ? WHERE job_id = ? AND digest = ?",
+                                (img_url, file_name, job_id, digest))
+
+    def claim_slot(self, job_id, task_id):
+        """
+        为下载任务 task_id 中通过检查的图片分配序号（从 1 开始，优先使用已释放的最小序号），
+        任务已分配过序号时返回原序号。已分配的序号达到 num_images 或任务已结束时返回 None。
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT idx FROM slots WHERE task_id = ?", (task_id,)).fetchone()
+            if row is not None:
+                return row['idx']
+            job = conn.execute("SELECT num_images, status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None or job['status'] != 'running':
+                return None
+            used = {row['idx'] for row in conn.execute("SELECT idx FROM slots WHERE job_id = ?", (job_id,))}
+            if len(used) >= job['num_images']:
+                return None
+            idx = next(idx for idx in range(1, len(used) + 2) if idx not in used)
+            conn.execute("INSERT INTO slots (job_id, idx, task_id) VALUES (?, ?, ?)", (job_id, idx, task_id))
+        return idx
+
+    def has_running_jobs(self):
+        row = self._connect().execute("SELECT COUNT(*) AS count FROM jobs WHERE status = 'running'").fetchone()
+        return row['count'] > 0
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class QueueManager(BaseManager):
+    """
+    通过 TCP 共享同一个 TaskQueue，数据库文件只由服务进程在本机打开。
+    """
+
+
+QueueManager.register('task_queue')
+
+
+def serve_queue(task_queue, host, port, authkey):
+    """
+    在 (host, port) 上提供 task_queue 的 TCP 服务，阻塞运行。authkey 为各节点共用的密钥（bytes）。
+    """
+    class QueueServer(QueueManager):
+        pass
+
+    QueueServer.register('task_queue', callable=lambda: task_queue)
+    QueueServer(address=(host, port), authkey=authkey).get_server().serve_forever()
+
+
+def connect_queue(host, port, authkey):
+    """
+    连接 serve_queue 提供的服务，返回接口与 TaskQueue 相同的代理对象，可在多个线程中使用。
+    """
+    manager = QueueManager(address=(host, port), authkey=authkey)
+    manager.connect()
+    return manager.task_queue()
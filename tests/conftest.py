@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: conftest.py
+Update: 2026.10.18
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def project_root(monkeypatch):
+    # 配置文件等均按相对于项目根目录的路径读取
+    monkeypatch.chdir(ROOT)
+    return ROOT
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: distributed_node.py
+Update: 2026.10.18
+"""
+
+import os
+import sys
+import json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import distributed
+from search_engines import SearchEngine, register_engine
+from utils import pic_utils
+
+# 测试用的协调进程或工作进程：注册指向本机服务（CRAWLER_TEST_SERVER）的 local 搜索引擎，不使用代理，
+# 并用 CRAWLER_TEST_SETTINGS（JSON）覆盖部分时间设置
+
+
+@register_engine
+class LocalEngine(SearchEngine):
+    name = 'local'
+    page_size = 10
+
+    def build_request(self, pn):
+        return f"{os.environ['CRAWLER_TEST_SERVER']}/search/{pn}", None
+
+    def parse(self, page):
+        return page.split()
+
+
+overrides = json.loads(os.environ.get('CRAWLER_TEST_SETTINGS', '{}'))
+read_settings = pic_utils.get_settings
+
+
+def get_settings(self, settings_path):
+    settings = read_settings(self, settings_path)
+    if settings_path.endswith('time_settings.toml'):
+        settings.update(overrides)
+    return settings
+
+
+pic_utils.get_settings = get_settings
+pic_utils.get_proxies = lambda self: []
+
+if __name__ == "__main__":
+    sys.exit(distributed.main(sys.argv[1:]))
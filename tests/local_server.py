@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: local_server.py
+Update: 2026.10.18
+"""
+
+import io
+import os
+import time
+import socket
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+from PIL import Image
+
+from search_engines import SearchEngine
+
+
+def jpeg_body(size=3000):
+    return b'\xff\xd8\xff\xe0' + os.urandom(size - 4)
+
+
+def valid_jpeg(seed):
+    pixels = np.random.RandomState(seed).randint(0, 255, (64, 64, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # 客户端超时断开等情况不输出异常
+
+
+class LocalServer:
+    """
+    在后台线程中运行的本机 HTTP 服务，handle(path, hits) 返回 (状态码, 响应头, 响应体)，
+    hits 为该路径被请求的次数（从 1 开始）。可作为上下文管理器使用。
+    """
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.hits = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.hits[self.path] = server.hits.get(self.path, 0) + 1
+                    hits = server.hits[self.path]
+                status, headers, body = server.handle(self.path, hits)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = QuietServer(('127.0.0.1', 0), Handler)
+        self.port = self.httpd.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class LocalEngine(SearchEngine):
+    """
+    指向本机服务的搜索引擎（不注册），结果页每行一个链接。
+    """
+    name = 'local'
+    page_size = 30
+    base_url = None
+
+    def build_request(self, pn):
+        return f"{self.base_url}/search/{pn}", None
+
+    def parse(self, page):
+        return page.split()
+
+
+def forwarding_proxy(delay=0.0, status=None):
+    """
+    最简单的 HTTP 正向代理：等待 delay 秒后转发请求，指定 status 时直接返回该状态码。
+    """
+    def handle(path, hits):
+        time.sleep(delay)
+        if status is not None:
+            return status, {}, b''
+        with urllib.request.urlopen(path, timeout=5) as response:  # 代理收到的是完整链接
+            return response.status, {}, response.read()
+    return LocalServer(handle)
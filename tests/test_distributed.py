@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_distributed.py
+Update: 2026.10.18
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import subprocess
+
+from distributed import Coordinator, Worker
+from postprocess import PostProcessor
+from proxy_pool import ProxyPool
+from task_queue import TaskQueue
+from utils import pic_utils
+from local_server import LocalServer, jpeg_body, valid_jpeg
+
+NODE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'distributed_node.py')
+SETTINGS = {
+    'distributed_lease_seconds': 2,
+    'distributed_poll_interval': 0.1,
+    'retry_max_attempts': 3,
+    'retry_base_delay': 0.05,
+    'retry_jitter': 0.0,
+    'search_cache': False,
+    'postprocess': False,
+    'metrics_interval': 0,
+    'metrics_port': 0,
+    'rate_limit_default': 0,
+}
+
+
+def crawl_server(pages=2, failures=4):
+    """
+    第 0 至 pages - 1 页各 10 个图片链接，之后为空页；第 1 页前 failures 次请求返回 500。
+    图片延迟 1 秒返回，内容由路径决定，重新下载得到相同的图片。
+    """
+    def handle(path, hits):
+        if path.startswith('/search/'):
+            pn = int(path.rsplit('/', 1)[1])
+            if pn == 1 and hits <= failures:
+                return 500, {}, b''
+            if pn >= pages:
+                return 200, {}, b''
+            return 200, {}, '\n'.join(f"{server.url}/img/{pn}/{i}.jpg" for i in range(10)).encode()
+        time.sleep(1.0)
+        return 200, {'Content-Type': 'image/jpeg'}, b'\xff\xd8\xff\xe0' + hashlib.sha256(path.encode()).digest() * 100
+    server = LocalServer(handle)
+    return server
+
+
+def start_node(server, *args):
+    env = dict(os.environ, CRAWLER_TEST_SERVER=server.url, CRAWLER_TEST_SETTINGS=json.dumps(SETTINGS))
+    return subprocess.Popen([sys.executable, NODE, '--log-level', 'WARNING', *args], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+# 整个测试的时间上限，任何一步卡住时尽快失败而不是拖住整个测试
+TEST_TIMEOUT = 60
+
+
+def query(queue_path, sql, params=()):
+    conn = sqlite3.connect(queue_path, timeout=5)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def wait_until(condition, deadline, what):
+    while not condition():
+        assert time.time() < deadline, f"timed out waiting for {what}"
+        time.sleep(0.05)
+
+
+def query_jobs(queue_path):
+    # 协调进程创建数据库与写入任务之间可能读到空库或未建表
+    if not os.path.exists(queue_path):
+        return []
+    try:
+        return query(queue_path, "SELECT id FROM jobs")
+    except sqlite3.OperationalError:
+        return []
+
+
+def test_killed_worker_tasks_are_requeued(tmp_path):
+    queue_path = str(tmp_path / 'queue.sqlite3')
+    output = tmp_path / 'downloads'
+    keywords = tmp_path / 'keywords.txt'
+    keywords.write_text('kw,20\n', encoding='utf-8')  # 正好是全部的图片数量，崩溃节点的任务必须重新执行
+
+    processes = []
+    deadline = time.time() + TEST_TIMEOUT
+    with crawl_server() as server:
+        try:
+            coordinator = start_node(server, 'coordinator', '-q', queue_path, '-k', str(keywords), '-e', 'local',
+                                     '-o', str(output))
+            processes.append(coordinator)
+            wait_until(lambda: coordinator.poll() is not None or query_jobs(queue_path), deadline, "the job")
+            assert coordinator.poll() is None, "coordinator exited before queueing the job"
+            victim = start_node(server, 'worker', '-q', queue_path, '-t', '2', '--id', 'victim')
+            processes.append(victim)
+            for index in range(2):
+                processes.append(start_node(server, 'worker', '-q', queue_path, '-t', '2', '--id', f"w{index}"))
+
+            # 等崩溃节点持有下载任务后强制结束
+            wait_until(lambda: query(queue_path, "SELECT id FROM tasks WHERE kind = 'download' "
+                                                 "AND status = 'leased' AND lease_owner = 'victim'"),
+                       deadline, "the victim to lease a download")
+            victim.kill()
+            victim.wait()
+            killed = [row[0] for row in query(queue_path, "SELECT id FROM tasks WHERE status = 'leased' "
+                                                          "AND lease_owner = 'victim'")]
+            assert killed
+
+            assert coordinator.wait(timeout=max(0.1, deadline - time.time())) == 0
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+
+    (downloaded, status), = query(queue_path, "SELECT downloaded, status FROM jobs")
+    assert (downloaded, status) == (20, 'done')
+    for task_id in killed:
+        (task_status, attempts), = query(queue_path, "SELECT status, attempts FROM tasks WHERE id = ?", (task_id,))
+        assert task_status == 'done' and attempts >= 1
+
+    # 获取失败的第 1 页重新排队后成功，没有被当作空页
+    (page_status, page_attempts), = query(queue_path, "SELECT status, attempts FROM tasks WHERE kind = 'search' "
+                                                      "AND key = 'local:1'")
+    assert page_status == 'done' and page_attempts >= 1
+
+    files = sorted(name for name in os.listdir(output / 'kw') if not name.startswith('.'))
+    assert files == sorted(f"kw_local_{idx}.jpg" for idx in range(1, 21))
+
+
+def test_invalid_images_do_not_count_as_downloaded(tmp_path):
+    # 前 4 个链接只有 JPEG 文件头，保存后由后处理判定无效并删除，不能占用下载数量
+    def handle(path, hits):
+        kind, name = path.strip('/').split('/')
+        body = valid_jpeg(int(name.split('.')[0])) if kind == 'good' else jpeg_body()
+        return 200, {'Content-Type': 'image/jpeg'}, body
+
+    task_queue = TaskQueue(str(tmp_path / 'queue.sqlite3'))
+    folder = tmp_path / 'kw'
+    job_id, _ = task_queue.add_job('kw', 'baidu', 6, str(folder), 0)
+    worker = Worker(task_queue, pic_utils(), 'w1', num_threads=2)
+    worker.resources.proxy_pool = ProxyPool(lambda: [], stats_path=str(tmp_path / 'stats.json'))
+    worker.resources.post_processor = PostProcessor(max_workers=1)
+    coordinator = Coordinator(task_queue, pic_utils())
+    coordinator.poll_interval = 0.1
+
+    with LocalServer(handle) as server:
+        task_queue.add_downloads(job_id, [(f"bad{i}", f"{server.url}/bad/{i}.jpg") for i in range(4)] +
+                                 [(f"good{i}", f"{server.url}/good/{i}.jpg") for i in range(8)])
+        deadline = time.time() + TEST_TIMEOUT
+        threads = [threading.Thread(target=worker.run, daemon=True),
+                   threading.Thread(target=coordinator.run, daemon=True)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join(timeout=max(0.1, deadline - time.time()))
+                assert not thread.is_alive(), "worker or coordinator did not finish in time"
+        finally:
+            worker.stop()
+
+    assert task_queue.get_job(job_id)['downloaded'] == 6
+    assert sorted(os.listdir(folder)) == sorted(f"kw_baidu_{idx}.jpg" for idx in range(1, 7))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_file_names.py
+Update: 2026.10.18
+"""
+
+import os
+
+from job_process import JobProcessor
+from proxy_pool import ProxyPool
+from utils import pic_utils
+from local_server import LocalServer, valid_jpeg
+
+
+def image_server():
+    def handle(path, hits):
+        return 200, {'Content-Type': 'image/jpeg'}, valid_jpeg(int(path.rsplit('/', 1)[1].split('.')[0]))
+    return LocalServer(handle)
+
+
+def saved_files(folder):
+    return {name: (folder / name).read_bytes() for name in os.listdir(folder) if not name.startswith('.')}
+
+
+def test_rerun_keeps_earlier_downloads(tmp_path):
+    folder = tmp_path / 'images'
+    with image_server() as server:
+        urls = [f"{server.url}/img/{i}.jpg" for i in range(8)]
+        processor = JobProcessor(pic_utils(), proxy_pool=ProxyPool(lambda: [], stats_path=str(tmp_path / 's.json')))
+        processor.download_images(urls[:5], 'kw', 'baidu', str(folder))
+        first = saved_files(folder)
+        assert sorted(first) == [f"kw_baidu_{idx}.jpg" for idx in range(1, 6)]
+
+        # 重复运行：已下载的链接由去重索引跳过，新图片的首选名称与已有文件相同
+        processor = JobProcessor(pic_utils(), proxy_pool=ProxyPool(lambda: [], stats_path=str(tmp_path / 's.json')))
+        processor.download_images(urls[2:], 'kw', 'baidu', str(folder))
+        second = saved_files(folder)
+
+    for name, body in first.items():
+        assert second[name] == body
+    assert sorted(set(second) - set(first)) == [f"kw_baidu_{idx}.jpg" for idx in range(6, 9)]
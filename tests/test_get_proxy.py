@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_get_proxy.py
+Update: 2026.10.18
+"""
+
+from get_proxy import validate_proxy, validate_proxies
+from local_server import LocalServer, forwarding_proxy, free_port
+
+
+def test_validate_proxy_reports_latency():
+    with LocalServer(lambda path, hits: (200, {}, b'ok')) as probe, forwarding_proxy(0.1) as proxy:
+        latency = validate_proxy(proxy.url, probe.url + '/', timeout=2)
+    assert latency is not None and latency >= 0.1
+    assert probe.hits == {'/': 1}
+
+
+def test_validate_proxies_filters_and_ranks():
+    probe = LocalServer(lambda path, hits: (200, {}, b'ok')).start()
+    slow = forwarding_proxy(0.3).start()
+    fast = forwarding_proxy(0.0).start()
+    broken = forwarding_proxy(status=502).start()
+    dead = f"http://127.0.0.1:{free_port()}"  # 没有服务监听
+    try:
+        live = validate_proxies([slow.url, dead, broken.url, fast.url], probe.url + '/', timeout=2)
+    finally:
+        for server in (probe, slow, fast, broken):
+            server.close()
+    assert live == [fast.url, slow.url]
+
+
+def test_validate_proxies_drops_timeouts():
+    with LocalServer(lambda path, hits: (200, {}, b'ok')) as probe, forwarding_proxy(1.0) as hanging:
+        assert validate_proxies([hanging.url], probe.url + '/', timeout=0.3) == []
+
+
+def test_validate_proxies_empty():
+    assert validate_proxies([]) == []
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_image_formats.py
+Update: 2026.10.18
+"""
+
+from PIL import Image
+
+from image_fetch import format_extension, sniff_image_format
+from image_tasks import process_image
+
+
+def test_saved_extensions_match_post_processing(tmp_path):
+    # 下载时按文件头选择的扩展名，后处理必须认为是正确的扩展名
+    for image_format in ('JPEG', 'PNG', 'GIF', 'BMP', 'TIFF', 'WEBP'):
+        path = tmp_path / f"image{format_extension(image_format)}"
+        Image.new('RGB', (8, 8), 'red').save(path, format=image_format)
+        with open(path, 'rb') as file:
+            assert sniff_image_format(file.read(16)) == image_format.lower()
+        result = process_image(str(path))
+        assert result['valid'] and result['extension_ok'], image_format
+
+
+def test_formats_pillow_cannot_decode_are_kept(tmp_path):
+    path = tmp_path / 'image.heic'
+    path.write_bytes(b'\x00\x00\x00\x18ftypheic' + b'\x00' * 64)
+    assert sniff_image_format(path.read_bytes()[:16]) == 'heic'
+    if '.heic' in Image.registered_extensions():
+        return  # 已安装 HEIC 插件时会正常解码校验
+    result = process_image(str(path))
+    assert result['valid'] and result['extension_ok']
+    assert path.exists()
+
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_journal.py
+Update: 2026.10.18
+"""
+
+import os
+
+import pytest
+
+from job_process import JobProcessor
+from journal import JobJournal
+from proxy_pool import ProxyPool
+from retry_policy import RetryPolicy
+from utils import pic_utils
+from local_server import LocalServer, LocalEngine, jpeg_body
+
+# 顺序下载，关闭持久化去重索引，恢复行为只由检查点日志决定
+SETTINGS = """download_way = 0
+journal = true
+dedup_index = false
+search_cache = false
+postprocess = false
+metrics_interval = 0
+"""
+
+
+class JobServer:
+    """
+    第 0 页给出 10 个图片链接；statuses 为 {图片序号: 状态码}，请求 stop_at 号图片时终止任务。
+    """
+
+    def __init__(self, statuses=None, stop_at=None):
+        self.statuses = statuses or {}
+        self.stop_at = stop_at
+        self.processor = None
+        self.server = LocalServer(self.handle)
+
+    def handle(self, path, hits):
+        if path.startswith('/search/'):
+            return 200, {}, '\n'.join(f"{self.server.url}/img/{i}.jpg" for i in range(10)).encode()
+        idx = int(path.rsplit('/', 1)[1].split('.')[0])
+        if idx == self.stop_at and self.processor is not None:
+            self.processor.terminate_download()
+        status = self.statuses.get(idx, 200)
+        if status != 200:
+            return status, {}, b''
+        return 200, {'Content-Type': 'image/jpeg'}, jpeg_body()
+
+    def hits(self, idx):
+        return self.server.hits.get(f"/img/{idx}.jpg", 0)
+
+    def create_processor(self, tmp_path):
+        settings_path = tmp_path / 'time_settings.toml'
+        settings_path.write_text(SETTINGS, encoding='utf-8')
+        processor = JobProcessor(pic_utils(), proxy_pool=ProxyPool(lambda: [], stats_path=str(tmp_path / 's.json')))
+        processor.time_settings_path = str(settings_path)
+        processor.search_cache = None
+        processor.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.01, jitter=0.0)
+
+        def create_engine(web_name, keyword):
+            engine = LocalEngine(keyword, pic_utils())
+            engine.base_url = self.server.url
+            return engine
+
+        processor.create_engine = create_engine
+        self.processor = processor
+        return processor
+
+    def __enter__(self):
+        self.server.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.close()
+        return False
+
+
+def journal_entries(folder):
+    return JobJournal.for_job(str(folder), 'kw', 'local')
+
+
+def test_terminated_job_resumes_without_refetching(tmp_path):
+    folder = tmp_path / 'images'
+    with JobServer(stop_at=3) as server:
+        server.create_processor(tmp_path).run_job('local', 'kw', 10, str(folder))
+        first_images = {idx for idx in range(10) if server.hits(idx)}
+        assert first_images == {0, 1, 2, 3}
+
+        server.stop_at = None
+        summary = server.create_processor(tmp_path).run_job('local', 'kw', 10, str(folder))
+        assert server.server.hits['/search/0'] == 1  # 搜索页从检查点日志读取
+        assert all(server.hits(idx) == 1 for idx in range(10))
+        assert summary['downloaded'] == 6
+    assert len([name for name in os.listdir(folder) if name.endswith('.jpg')]) == 10
+
+
+def test_crashed_job_keeps_its_journal(tmp_path):
+    folder = tmp_path / 'images'
+    with JobServer() as server:
+        processor = server.create_processor(tmp_path)
+
+        def crash(*args):
+            raise RuntimeError("disk full")
+
+        processor.download_images = crash
+        with pytest.raises(RuntimeError):
+            processor.run_job('local', 'kw', 10, str(folder))
+
+        journal = journal_entries(folder)
+        try:
+            assert not journal.completed
+            assert len(journal.get_page('local', 0)) == 10
+        finally:
+            journal.close()
+
+        server.create_processor(tmp_path).run_job('local', 'kw', 10, str(folder))
+        assert server.server.hits['/search/0'] == 1
+
+
+def test_permanent_failures_are_not_retried_on_resume(tmp_path):
+    folder = tmp_path / 'images'
+    with JobServer(statuses={1: 404, 2: 503}, stop_at=9) as server:
+        server.create_processor(tmp_path).run_job('local', 'kw', 10, str(folder))
+        assert server.hits(1) == 1 and server.hits(2) >= 1
+        transient_hits = server.hits(2)
+
+        server.stop_at = None
+        server.create_processor(tmp_path).run_job('local', 'kw', 10, str(folder))
+        assert server.hits(1) == 1  # 404 记为永久性失败，恢复时不再请求
+        assert server.hits(2) > transient_hits  # 临时错误在恢复时重试
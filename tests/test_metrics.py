@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_metrics.py
+Update: 2026.10.18
+"""
+
+from metrics import Metrics
+
+
+def test_prometheus_output_has_types_and_escaped_labels():
+    metrics = Metrics()
+    metrics.inc('images_by_format', engine='baidu', format='jpeg')
+    metrics.inc('requests_total', host='a"b\\c', proxy='direct', outcome='ok')
+    metrics.inc('requests_total', host='example.com', proxy='direct', outcome='error')
+    metrics.observe('request_seconds', 0.2, host='line\nbreak', proxy='direct')
+    lines = metrics.render_prometheus().splitlines()
+
+    assert lines.count('# TYPE crawler_requests_total counter') == 1
+    assert '# TYPE crawler_images_by_format gauge' in lines
+    assert '# TYPE crawler_request_seconds histogram' in lines
+    assert any(line.startswith('# HELP crawler_request_seconds ') for line in lines)
+    assert 'crawler_requests_total{host="a\\"b\\\\c",outcome="ok",proxy="direct"} 1' in lines
+    assert 'crawler_request_seconds_count{host="line\\nbreak",proxy="direct"} 1' in lines
+
+    # 每个指标的样本紧跟在自己的 TYPE 行之后
+    families = [line.split()[2] for line in lines if line.startswith('# TYPE')]
+    assert len(families) == len(set(families)) == 3
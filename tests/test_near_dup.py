@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_near_dup.py
+Update: 2026.10.18
+"""
+
+import hashlib
+
+import pytest
+
+from dedup import DedupIndex
+from image_fetch import DownloadedImage
+from job_process import JobProcessor
+from near_dup import NearDupFilter
+from proxy_pool import ProxyPool
+from utils import pic_utils
+from local_server import valid_jpeg
+
+
+def downloaded_image(folder, seed):
+    body = valid_jpeg(seed)
+    path = folder / f".{seed}.part"
+    path.write_bytes(body)
+    return DownloadedImage(str(path), len(body), hashlib.sha1(body).hexdigest(), 'jpeg')
+
+
+def test_discarded_hash_does_not_match_itself(tmp_path):
+    image = downloaded_image(tmp_path, 1)
+    near_dup = NearDupFilter(str(tmp_path))
+    keep, value, _ = near_dup.add_image(image.path)
+    assert keep
+    near_dup.discard(value)
+    assert near_dup.add_image(image.path)[0]
+    near_dup.close()
+
+
+def test_failed_save_can_be_retried(tmp_path):
+    processor = JobProcessor(pic_utils(), proxy_pool=ProxyPool(lambda: [], stats_path=str(tmp_path / 'stats.json')))
+    dedup = DedupIndex()
+    near_dup = NearDupFilter(str(tmp_path))
+
+    image = downloaded_image(tmp_path, 2)
+    phash = processor.check_image(image, 'img', dedup, near_dup)
+    with pytest.raises(OSError):
+        # 目标目录不存在，保存失败
+        processor.write_image(image, 'http://img.test/2.jpg', 'kw_1', str(tmp_path / 'missing'), dedup, near_dup,
+                              phash)
+
+    retry = downloaded_image(tmp_path, 2)
+    phash = processor.check_image(retry, 'img', dedup, near_dup)
+    assert phash is not False
+    processor.write_image(retry, 'http://img.test/2.jpg', 'kw_1', str(tmp_path), dedup, near_dup, phash)
+    assert (tmp_path / 'kw_1.jpg').exists()
+    near_dup.close()
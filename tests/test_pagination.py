@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_pagination.py
+Update: 2026.10.18
+"""
+
+import os
+
+from job_process import JobProcessor
+from proxy_pool import ProxyPool
+from retry_policy import RetryPolicy
+from utils import pic_utils
+from local_server import LocalServer, LocalEngine, forwarding_proxy, free_port, jpeg_body
+
+
+def search_server(failures=None, last_page=100):
+    """
+    每页 30 个不同的链接，failures 为 {页码: 前几次请求返回 500}，last_page 之后的页面为空。
+    """
+    failures = failures or {}
+
+    def handle(path, hits):
+        pn = int(path.rsplit('/', 1)[1])
+        if hits <= failures.get(pn, 0):
+            return 500, {}, b''
+        if pn > last_page:
+            return 200, {}, b''
+        return 200, {}, '\n'.join(f"http://img.test/{pn}/{i}.jpg" for i in range(30)).encode()
+    return LocalServer(handle)
+
+
+def search(server, num_images, proxies=(), tmp_path=None, max_attempts=3):
+    processor = JobProcessor(pic_utils(), proxy_pool=ProxyPool(lambda: list(proxies),
+                                                               stats_path=str(tmp_path / 'stats.json')))
+    processor.search_cache = None
+    processor.retry_policy = RetryPolicy(max_attempts=max_attempts, base_delay=0.01, jitter=0.0)
+    engine = LocalEngine('kw', pic_utils())
+    engine.base_url = server.url
+    return [url for urls in processor._iter_pages(engine, num_images) for url in urls]
+
+
+def test_failed_pages_are_retried(tmp_path):
+    with search_server(failures={0: 1, 1: 2}) as server:
+        urls = search(server, 300, tmp_path=tmp_path)
+        hits = dict(server.hits)
+    assert len(set(urls)) >= 300
+    assert hits['/search/0'] == 2 and hits['/search/1'] == 3
+
+
+def test_failed_proxy_is_replaced(tmp_path):
+    dead_proxy = f"http://127.0.0.1:{free_port()}"
+    with search_server() as server, forwarding_proxy() as proxy:
+        urls = search(server, 300, proxies=[dead_proxy, proxy.url], tmp_path=tmp_path)
+    assert len(set(urls)) >= 300
+
+
+def test_pages_that_keep_failing_are_not_empty_pages(tmp_path):
+    # 前两页始终失败，不能当作连续两个空页而停止
+    with search_server(failures={0: 99, 1: 99}) as server:
+        urls = search(server, 300, tmp_path=tmp_path, max_attempts=2)
+    assert len(set(urls)) >= 300
+
+
+def test_empty_pages_stop_paging(tmp_path):
+    with search_server(last_page=2) as server:
+        urls = search(server, 300, tmp_path=tmp_path)
+        hits = dict(server.hits)
+    assert len(set(urls)) == 90
+    assert max(int(path.rsplit('/', 1)[1]) for path in hits) < 10
+
+
+def test_stream_keeps_paging_until_enough_images_are_saved(tmp_path):
+    # 每页 30 个链接，其中一半返回 404；按链接数停止翻页时只能保存到一半
+    def handle(path, hits):
+        if path.startswith('/search/'):
+            pn = int(path.rsplit('/', 1)[1])
+            return 200, {}, '\n'.join(f"{server.url}/img/{pn}/{i}.jpg" for i in range(30)).encode()
+        if int(path.rsplit('/', 1)[1].split('.')[0]) % 2:
+            return 404, {}, b''
+        return 200, {'Content-Type': 'image/jpeg'}, jpeg_body()
+
+    server = LocalServer(handle)
+    processor = JobProcessor(pic_utils(), proxy_pool=ProxyPool(lambda: [], stats_path=str(tmp_path / 'stats.json')))
+    processor.search_cache = None
+
+    def create_engine(web_name, keyword):
+        engine = LocalEngine(keyword, pic_utils())
+        engine.base_url = server.url
+        return engine
+
+    processor.create_engine = create_engine
+    with server:
+        processor.stream_download_images(['local'], 'kw', 'local', str(tmp_path / 'images'), 60)
+        pages = {path for path in server.hits if path.startswith('/search/')}
+    images = [name for name in os.listdir(tmp_path / 'images') if name.endswith('.jpg')]
+    assert len(images) == 60
+    assert processor.stats.counts['downloaded'] == 60
+    assert len(pages) >= 4
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_postprocess.py
+Update: 2026.10.18
+"""
+
+import os
+
+from PIL import Image
+
+from dedup import DedupIndex
+from job_process import JobProcessor
+from near_dup import NearDupFilter
+from postprocess import PostProcessor
+from proxy_pool import ProxyPool
+from utils import pic_utils
+from local_server import LocalServer, jpeg_body, valid_jpeg
+
+
+def image_server():
+    """
+    /good/<n>.jpg 返回可以解码的图片，/bad/<n>.jpg 返回只有 JPEG 文件头的随机数据。
+    """
+    def handle(path, hits):
+        kind, name = path.strip('/').split('/')
+        body = valid_jpeg(int(name.split('.')[0])) if kind == 'good' else jpeg_body()
+        return 200, {'Content-Type': 'image/jpeg'}, body
+    return LocalServer(handle)
+
+
+def create_processor(tmp_path, post_processor):
+    return JobProcessor(pic_utils(), proxy_pool=ProxyPool(lambda: [], stats_path=str(tmp_path / 'stats.json')),
+                        post_processor=post_processor)
+
+
+def saved_images(folder):
+    return sorted(name for name in os.listdir(folder) if name.endswith('.jpg'))
+
+
+def test_stream_replaces_invalid_images(tmp_path):
+    post_processor = PostProcessor(max_workers=2, max_in_flight=4)
+    processor = create_processor(tmp_path, post_processor)
+    with image_server() as server:
+        # 每页先给出无效图片，只有后处理释放名额后才能凑够数量
+        pages = [[f"{server.url}/bad/{page}{i}.jpg" for i in range(3)] +
+                 [f"{server.url}/good/{page}{i}.jpg" for i in range(3)] for page in range(1, 5)]
+
+        def iter_image_search(web_name, keyword, num_images, need_more=None):
+            yield from pages
+
+        processor.iter_image_search = iter_image_search
+        try:
+            processor.stream_download_images(['baidu'], 'kw', 'baidu', str(tmp_path / 'images'), 5)
+        finally:
+            post_processor.close()
+
+    images = saved_images(tmp_path / 'images')
+    assert len(images) == 5
+    for name in images:
+        with Image.open(tmp_path / 'images' / name) as img:
+            img.load()
+    assert processor.stats.counts['downloaded'] == 5
+
+
+def test_async_post_processing_back_pressure(tmp_path):
+    post_processor = PostProcessor(max_workers=1, max_in_flight=1)
+    processor = create_processor(tmp_path, post_processor)
+    with image_server() as server:
+        urls = [f"{server.url}/good/{i}.jpg" for i in range(20)] + [f"{server.url}/bad/{i}.jpg" for i in range(5)]
+        try:
+            processor.async_download_images(urls, 'kw', 'baidu', str(tmp_path / 'images'))
+            processor.wait_post_processing()
+        finally:
+            post_processor.close()
+
+    assert len(saved_images(tmp_path / 'images')) == 20
+    assert processor.stats.counts['downloaded'] == 20
+    assert processor.stats.counts['skipped'] == 5
+
+
+def test_converted_images_stay_in_indexes(tmp_path):
+    folder = tmp_path / 'images'
+    with image_server() as server:
+        urls = [f"{server.url}/good/{i}.jpg" for i in range(3)]
+        for _ in range(2):
+            post_processor = PostProcessor(max_workers=1, target_format='png')
+            processor = create_processor(tmp_path, post_processor)
+            processor.create_near_dup_filter = lambda path: NearDupFilter(path, radius=0)
+            try:
+                processor.threads_download_images(urls, 'kw', 'baidu', str(folder))
+            finally:
+                post_processor.close()
+        hits = dict(server.hits)
+
+    # 第二次运行时转换后的文件仍被索引识别，不会重新下载
+    assert all(count == 1 for count in hits.values())
+    assert sorted(name for name in os.listdir(folder) if not name.startswith('.')) == \
+        ['kw_baidu_1.png', 'kw_baidu_2.png', 'kw_baidu_3.png']
+    assert len(DedupIndex(str(folder), persist=True).seen_hashes) == 3
+    assert sorted(NearDupFilter(str(folder)).names.values()) == ['kw_baidu_1.png', 'kw_baidu_2.png', 'kw_baidu_3.png']
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_retry_policy.py
+Update: 2026.10.18
+"""
+
+import os
+
+import pytest
+import requests
+
+from image_fetch import ImageFetcher, ImageRejected, HTTPStatusError
+from job_process import JobProcessor
+from proxy_pool import ProxyPool
+from retry_policy import (RetryPolicy, RetryQueue, RetryTask, classify_error, parse_retry_after,
+                          PERMANENT, PROXY, RATE_LIMITED, TRANSIENT)
+from utils import pic_utils
+from local_server import LocalServer, free_port, jpeg_body
+
+
+def status_server():
+    """
+    /<状态码>/<失败次数>/... 前若干次返回该状态码，之后返回图片；/html 返回网页。
+    """
+    def handle(path, hits):
+        parts = path.strip('/').split('/')
+        if parts[0] == 'html':
+            return 200, {'Content-Type': 'text/html'}, b'<html>' + b' ' * 2000
+        status, failures = int(parts[0]), int(parts[1])
+        if hits <= failures:
+            headers = {'Retry-After': '0'} if status in (429, 503) else {}
+            return status, headers, b''
+        return 200, {'Content-Type': 'image/jpeg'}, jpeg_body()
+    return LocalServer(handle)
+
+
+def fetch_error(url, proxy=None):
+    try:
+        response = requests.get(url, timeout=2, stream=True)
+        with response:
+            ImageFetcher().fetch(response, os.path.dirname(os.path.abspath(__file__)))
+    except Exception as e:
+        return classify_error(e, proxy)
+    return None
+
+
+def test_classify_local_responses():
+    with status_server() as server:
+        assert fetch_error(f"{server.url}/404/9/a.jpg") == PERMANENT
+        assert fetch_error(f"{server.url}/410/9/a.jpg") == PERMANENT
+        assert fetch_error(f"{server.url}/500/9/a.jpg") == TRANSIENT
+        assert fetch_error(f"{server.url}/429/9/a.jpg") == RATE_LIMITED
+        assert fetch_error(f"{server.url}/503/9/a.jpg") == RATE_LIMITED  # 带 Retry-After
+        assert fetch_error(f"{server.url}/html") == PERMANENT
+        # 403 只有走代理时才换代理重试
+        assert fetch_error(f"{server.url}/403/9/a.jpg") == PERMANENT
+        assert fetch_error(f"{server.url}/403/9/a.jpg", proxy='http://127.0.0.1:1') == PROXY
+
+
+def test_classify_connection_errors():
+    url = f"http://127.0.0.1:{free_port()}/a.jpg"  # 没有服务监听
+    assert fetch_error(url) == TRANSIENT
+    assert fetch_error(url, proxy='http://127.0.0.1:1') == PROXY
+    assert classify_error(ImageRejected("too small")) == PERMANENT
+
+
+def test_retry_delay():
+    policy = RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=3.0, jitter=0.0)
+    assert policy.retry_delay(PERMANENT, 1) is None
+    assert policy.retry_delay(PROXY, 1) == 0.0
+    assert policy.retry_delay(TRANSIENT, 1) == 1.0
+    assert policy.retry_delay(TRANSIENT, 3) == 3.0  # 退避时间不超过 max_delay
+    assert policy.retry_delay(TRANSIENT, 4) is None  # 已达到最大尝试次数
+    assert policy.retry_delay(RATE_LIMITED, 1, HTTPStatusError(429, '2')) == 2.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert parse_retry_after('soon') is None
+
+
+def test_reschedule_pushes_proxy_retry():
+    policy = RetryPolicy(max_attempts=3, jitter=0.0)
+    retry_queue = RetryQueue()
+    task = RetryTask('http://example.com/a.jpg')
+    kind, delay = policy.reschedule(task, requests.exceptions.ProxyError(), retry_queue, 'http://1.2.3.4:80')
+    assert (kind, delay, task.attempt, task.avoid_proxy) == (PROXY, 0.0, 1, 'http://1.2.3.4:80')
+    assert retry_queue.pop() is task
+
+
+@pytest.mark.parametrize('download_way', ['download_images', 'threads_download_images', 'async_download_images'])
+def test_downloads_retry_by_failure_kind(tmp_path, download_way):
+    processor = JobProcessor(pic_utils(), proxy_pool=ProxyPool(lambda: [], stats_path=str(tmp_path / 'stats.json')))
+    processor.retry_policy = RetryPolicy(max_attempts=3, base_delay=0.01, jitter=0.0)
+    with status_server() as server:
+        paths = ['/404/9/a.jpg', '/500/2/b.jpg', '/429/1/c.jpg', '/500/9/d.jpg']
+        getattr(processor, download_way)([server.url + path for path in paths], 'kw', 'baidu',
+                                         str(tmp_path / 'images'))
+        hits = dict(server.hits)
+
+    assert hits == {'/404/9/a.jpg': 1, '/500/2/b.jpg': 3, '/429/1/c.jpg': 2, '/500/9/d.jpg': 3}
+    assert sorted(name for name in os.listdir(tmp_path / 'images') if not name.startswith('.')) == \
+        ['kw_baidu_2.jpg', 'kw_baidu_3.jpg']
+    assert processor.stats.counts['failed'] == 2
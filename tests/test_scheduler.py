@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_scheduler.py
+Update: 2026.10.18
+"""
+
+import threading
+
+from image_fetch import ImageFetcher
+from job_process import JobProcessor
+from proxy_pool import ProxyPool
+from scheduler import JobScheduler
+from utils import pic_utils
+from local_server import LocalServer, jpeg_body
+
+
+def write_settings(path, threads_num, max_jobs):
+    path.write_text(f"threads_num = {threads_num}\nscheduler_max_jobs = {max_jobs}\nsearch_cache = false\n",
+                    encoding='utf-8')
+
+
+def test_settings_changed_after_creation_are_used(tmp_path):
+    settings_path = tmp_path / 'time_settings.toml'
+    write_settings(settings_path, 3, 2)
+    scheduler = JobScheduler(pic_utils(), time_settings_path=str(settings_path))
+    try:
+        job = scheduler.add('kw', 'baidu', 1, str(tmp_path / 'images'))
+        assert scheduler.max_jobs == 2
+        first_executor = scheduler.executor
+
+        # 未变化时不重建
+        assert not scheduler.reload_settings()
+        assert scheduler.executor is first_executor
+
+        write_settings(settings_path, 12, 5)
+        assert scheduler.reload_settings()
+        assert scheduler.max_jobs == 5
+        assert scheduler.executor is not first_executor
+        assert scheduler.executor.max_workers == 12
+        assert job.processor.download_executor is first_executor  # run() 开始时才替换尚未运行任务的资源
+    finally:
+        scheduler.close()
+
+
+def test_explicit_limits_override_settings(tmp_path):
+    settings_path = tmp_path / 'time_settings.toml'
+    write_settings(settings_path, 3, 2)
+    scheduler = JobScheduler(pic_utils(), max_jobs=1, max_workers=9, time_settings_path=str(settings_path))
+    try:
+        write_settings(settings_path, 14, 6)
+        scheduler.reload_settings()
+        assert scheduler.max_jobs == 1
+        assert scheduler.executor.max_workers == 9
+    finally:
+        scheduler.close()
+
+
+def test_request_slot_is_held_while_image_body_is_read(tmp_path):
+    # 流式下载在读取响应体时才真正传输数据，这期间不能让出请求并发名额
+    request_slots = threading.BoundedSemaphore(1)
+    processor = JobProcessor(pic_utils(), proxy_pool=ProxyPool(lambda: [], stats_path=str(tmp_path / 'stats.json')),
+                             request_slots=request_slots)
+    held = []
+
+    class RecordingFetcher(ImageFetcher):
+        def fetch(self, response, download_path):
+            held.append(not request_slots.acquire(blocking=False))
+            return super().fetch(response, download_path)
+
+    with LocalServer(lambda path, hits: (200, {'Content-Type': 'image/jpeg'}, jpeg_body())) as server:
+        image = processor.download_image(f"{server.url}/a.jpg", None, str(tmp_path), RecordingFetcher())
+    image.discard()
+    assert held == [True]
+    assert request_slots.acquire(blocking=False)
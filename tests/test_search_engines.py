@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_search_engines.py
+Update: 2026.10.18
+"""
+
+import pytest
+
+from search_engines import ENGINES, SearchEngine, register_engine, create_engine, engine_names
+from utils import pic_utils
+
+
+def test_incomplete_engine_is_rejected_at_registration():
+    class NoParse(SearchEngine):
+        name = 'no_parse'
+
+        def build_request(self, pn):
+            return 'http://example.com/', None
+
+    with pytest.raises(TypeError, match='parse'):
+        register_engine(NoParse)
+    assert 'no_parse' not in ENGINES
+    with pytest.raises(TypeError):
+        NoParse('kw', pic_utils())
+
+
+def test_registered_engines_are_complete():
+    for web_name in engine_names():
+        engine = create_engine(web_name, 'kw', pic_utils())
+        search_url, _ = engine.build_request(1)
+        assert search_url.startswith('https://')
+        assert engine.parse('') == []
+    with pytest.raises(ValueError):
+        create_engine('missing', 'kw', pic_utils())
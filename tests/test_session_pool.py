@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_session_pool.py
+Update: 2026.10.18
+"""
+
+from session_pool import SessionPool
+
+
+def test_https_hosts_share_one_session_across_proxies():
+    pool = SessionPool()
+    proxies = [f"http://10.0.0.{i}:8080" for i in range(5)]
+    sessions = {id(pool.get_session("https://img.example.com/a.jpg", proxy)) for proxy in proxies}
+    assert len(sessions) == 1
+    assert pool.get_session("https://img.example.com/b.jpg") is pool.get_session("https://img.example.com/a.jpg",
+                                                                                  proxies[0])
+    pool.close()
+
+
+def test_http_hosts_keep_one_session_per_proxy():
+    pool = SessionPool()
+    first = pool.get_session("http://img.example.com/a.jpg", "http://10.0.0.1:8080")
+    second = pool.get_session("http://img.example.com/a.jpg", "http://10.0.0.2:8080")
+    assert first is not second
+    assert pool.get_session("http://img.example.com/b.jpg", "http://10.0.0.1:8080") is first
+    pool.close()
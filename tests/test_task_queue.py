@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""
+Project Name: Crawler
+File Created: 2026.10.18
+Author: ZhangYuetao
+File Name: test_task_queue.py
+Update: 2026.10.18
+"""
+
+import time
+import threading
+
+from task_queue import TaskQueue, serve_queue, connect_queue
+from local_server import free_port
+
+
+def create_queue(tmp_path, max_attempts=4, num_images=10):
+    task_queue = TaskQueue(str(tmp_path / 'queue.sqlite3'), max_attempts=max_attempts, requeue_interval=0)
+    job_id, _ = task_queue.add_job('kw', 'baidu', num_images, str(tmp_path / 'kw'), 10)
+    return task_queue, job_id
+
+
+def expire(task_queue, worker_id, task_id):
+    # 把租约改为已过期，模拟工作进程崩溃后不再发送心跳
+    task_queue._connect().execute("UPDATE tasks SET lease_expires = ? WHERE id = ? AND lease_owner = ?",
+                                  (time.time() - 1, task_id, worker_id))
+
+
+def task_row(task_queue, task_id):
+    return dict(task_queue._connect().execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone())
+
+
+def test_lease_and_complete(tmp_path):
+    task_queue, job_id = create_queue(tmp_path)
+    task_queue.add_search_pages(job_id, ['baidu'], 0, 1)
+    task_queue.add_downloads(job_id, [('a', 'http://img.test/a.jpg')])
+
+    first = task_queue.lease('w1')
+    assert first.kind == 'download'  # 同一任务中优先执行下载
+    second = task_queue.lease('w1')
+    assert second.kind == 'search' and second.payload == {'engine': 'baidu', 'pn': 0}
+    assert task_queue.lease('w1') is None
+
+    assert task_queue.complete(second.id, 'w1', 'done', found=3)
+    assert not task_queue.complete(second.id, 'w1', 'done', found=3)
+    assert task_queue.task_counts(job_id) == {('download', 'leased'): 1, ('search', 'done'): 1}
+
+
+def test_heartbeat_keeps_lease(tmp_path):
+    task_queue, job_id = create_queue(tmp_path)
+    task_queue.add_search_pages(job_id, ['baidu'], 0, 1)
+    task = task_queue.lease('w1', lease_seconds=0.2)
+    task_queue.heartbeat('w1', lease_seconds=30)
+    time.sleep(0.3)
+    assert task_queue.requeue_expired() == 0
+    assert task_row(task_queue, task.id)['status'] == 'leased'
+
+
+def test_expired_lease_is_requeued(tmp_path):
+    task_queue, job_id = create_queue(tmp_path)
+    task_queue.add_search_pages(job_id, ['baidu'], 0, 1)
+    task = task_queue.lease('w1')
+    expire(task_queue, 'w1', task.id)
+
+    again = task_queue.lease('w2')
+    assert again.id == task.id and again.attempts == 1
+    assert not task_queue.complete(task.id, 'w1')  # 原工作进程的租约已失效
+    assert task_queue.complete(task.id, 'w2')
+
+
+def test_max_attempts(tmp_path):
+    task_queue, job_id = create_queue(tmp_path, max_attempts=2)
+    task_queue.add_search_pages(job_id, ['baidu'], 0, 1)
+    for attempt in range(2):
+        task = task_queue.lease('w1')
+        assert task.attempts == attempt
+        expire(task_queue, 'w1', task.id)
+        task_queue.requeue_expired()
+    assert task_queue.lease('w1') is None
+    assert task_row(task_queue, task.id)['status'] == 'failed'
+
+
+def test_claims_are_reused_after_requeue(tmp_path):
+    task_queue, job_id = create_queue(tmp_path)
+    task_queue.add_downloads(job_id, [('a', 'http://img.test/a.jpg'), ('b', 'http://img.test/b.jpg')])
+    task = task_queue.lease('w1')
+    assert task_queue.claim_digest(job_id, 'digest-a', task.id)
+    assert task_queue.claim_slot(job_id, task.id) == 1
+    expire(task_queue, 'w1', task.id)
+
+    again = task_queue.lease('w2')
+    assert again.id == task.id
+    assert task_queue.claim_digest(job_id, 'digest-a', again.id)
+    assert task_queue.claim_slot(job_id, again.id) == 1
+
+    other = task_queue.lease('w2')
+    assert not task_queue.claim_digest(job_id, 'digest-a', other.id)
+    assert task_queue.claim_slot(job_id, other.id) == 2
+
+
+def test_claims_are_released_when_task_fails(tmp_path):
+    task_queue, job_id = create_queue(tmp_path, max_attempts=1, num_images=1)
+    task_queue.add_downloads(job_id, [('a', 'http://img.test/a.jpg'), ('b', 'http://img.test/b.jpg')])
+    first = task_queue.lease('w1')
+    second = task_queue.lease('w2')
+    assert task_queue.claim_digest(job_id, 'digest', first.id)
+    assert task_queue.claim_slot(job_id, first.id) == 1
+    assert task_queue.claim_slot(job_id, second.id) is None  # 数量已分配完
+
+    expire(task_queue, 'w1', first.id)
+    task_queue.requeue_expired()
+    assert task_row(task_queue, first.id)['status'] == 'failed'
+    assert task_queue.claim_digest(job_id, 'digest', second.id)
+    assert task_queue.claim_slot(job_id, second.id) == 1
+
+
+def test_retry_and_skip_release_claims(tmp_path):
+    task_queue, job_id = create_queue(tmp_path)
+    task_queue.add_downloads(job_id, [('a', 'http://img.test/a.jpg'), ('b', 'http://img.test/b.jpg')])
+    first = task_queue.lease('w1')
+    second = task_queue.lease('w1')
+    task_queue.claim_slot(job_id, first.id)
+    task_queue.claim_slot(job_id, second.id)
+
+    assert task_queue.retry(first.id, 'w1', 0, 1)
+    task_queue.complete(second.id, 'w1', 'skipped')
+    assert task_queue._connect().execute("SELECT COUNT(*) FROM slots").fetchone()[0] == 0
+
+
+def test_downloaded_counts_completed_tasks_only(tmp_path):
+    task_queue, job_id = create_queue(tmp_path)
+    task_queue.add_downloads(job_id, [('a', 'http://img.test/a.jpg')])
+    task = task_queue.lease('w1')
+    task_queue.claim_slot(job_id, task.id)
+    assert task_queue.get_job(job_id)['downloaded'] == 0
+    task_queue.complete(task.id, 'w1', 'done')
+    assert task_queue.get_job(job_id)['downloaded'] == 1
+
+
+def test_trailing_empty_pages_ignores_failed_pages(tmp_path):
+    task_queue, job_id = create_queue(tmp_path)
+    task_queue.add_search_pages(job_id, ['baidu'], 0, 4)
+    results = {0: ('done', 5), 1: ('done', 0), 2: ('failed', None), 3: ('done', 0)}
+    while True:
+        task = task_queue.lease('w1')
+        if task is None:
+            break
+        status, found = results[task.payload['pn']]
+        task_queue.complete(task.id, 'w1', status, found)
+    assert task_queue.trailing_empty_pages(job_id) == 2
+
+
+def test_queue_over_tcp(tmp_path):
+    task_queue = TaskQueue(str(tmp_path / 'queue.sqlite3'))
+    port = free_port()
+    threading.Thread(target=serve_queue, args=(task_queue, '127.0.0.1', port, b'secret'), daemon=True).start()
+    for _ in range(50):
+        try:
+            remote = connect_queue('127.0.0.1', port, b'secret')
+            break
+        except ConnectionRefusedError:
+            time.sleep(0.1)
+
+    job_id, created = remote.add_job('kw', 'baidu', 5, str(tmp_path / 'kw'), 10)
+    assert created
+    remote.add_search_pages(job_id, ['baidu'], 0, 1)
+    task = remote.lease('w1')
+    assert task.payload == {'engine': 'baidu', 'pn': 0}
+    assert remote.complete(task.id, 'w1', 'done', 2)
+    assert task_queue.task_counts(job_id) == {('search', 'done'): 1}
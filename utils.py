@@ -5,16 +5,63 @@ Project Name: Crawler
 File Created: 2024.05.24
 Author: ZhangYuetao
 File Name: utils.py
-Update: 2024.06.04
+Update: 2026.10.18
 """
 
 import os
+import copy
 import random
 import json
+import threading
 import toml
 import chardet
 from logger import logger
-from get_proxy import get_zdaye_proxies, save_proxies_to_file, get_docip_proxies
+from get_proxy import harvest_proxies, validate_proxies, save_proxies_to_file, DEFAULT_PROBE_URL
+
+
+# 文件读取缓存：{路径: ((mtime_ns, size), 内容)}，所有 pic_utils 实例共享
+_file_cache = {}
+_file_cache_lock = threading.Lock()
+
+
+def load_cached(path, loader):
+    """
+    读取文件并缓存解析结果，文件的修改时间或大小变化后自动重新加载。
+    文件不存在时抛出 FileNotFoundError，解析失败时抛出 loader 的异常，均不写入缓存。
+    """
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _file_cache_lock:
+        entry = _file_cache.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+    value = loader(path)
+    with _file_cache_lock:
+        _file_cache[path] = (signature, value)
+    return value
+
+
+def clear_file_cache():
+    with _file_cache_lock:
+        _file_cache.clear()
+
+
+def _read_lines(path):
+    with open(path, "r", encoding='utf-8') as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def _read_json(path):
+    with open(path, "r", encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _read_toml(path):
+    with open(path, 'rb') as f:
+        raw_data = f.read()
+    encoding = chardet.detect(raw_data)['encoding']
+    return toml.loads(raw_data.decode(encoding or 'utf-8'))
 
 
 class pic_utils:
@@ -25,11 +72,16 @@ class pic_utils:
         self.settings_path = 'setting/settings.toml'
         self.web_dir = 'setting/web_list.txt'
 
+    @staticmethod
+    def reload():
+        """
+        清空文件缓存，下次读取时重新加载 user agents、代理、参数与设置文件。
+        """
+        clear_file_cache()
+
     def get_user_agents(self):
         try:
-            with open(self.user_agents_path, "r", encoding='utf-8') as file:
-                user_agents = [line.strip() for line in file if line.strip()]
-            return user_agents
+            return load_cached(self.user_agents_path, _read_lines)
         except FileNotFoundError:
             logger.error("User-Agent file not found.")
             return []
@@ -40,9 +92,7 @@ class pic_utils:
 
     def get_proxies(self):
         try:
-            with open(self.proxies_path, "r", encoding='utf-8') as file:
-                proxies = [line.strip() for line in file if line.strip()]
-            return proxies
+            return load_cached(self.proxies_path, _read_lines)
         except FileNotFoundError:
             logger.error("Proxies file not found.")
             return []
@@ -53,9 +103,8 @@ class pic_utils:
 
     def get_params(self, params_name):
         try:
-            with open(os.path.join(self.param_dir, params_name), "r", encoding='utf-8') as file:
-                params = json.load(file)
-            return params
+            # 调用方会修改参数，返回副本以免污染缓存
+            return copy.deepcopy(load_cached(os.path.join(self.param_dir, params_name), _read_json))
         except FileNotFoundError:
             logger.error("Params file not found.")
             return {}
@@ -65,14 +114,7 @@ class pic_utils:
 
     def get_settings(self, settings_path):
         try:
-            with open(settings_path, 'rb') as f:
-                raw_data = f.read()
-                result = chardet.detect(raw_data)
-                encoding = result['encoding']
-
-            with open(settings_path, 'r', encoding=encoding) as f:
-                settings = toml.load(f)
-            return settings
+            return copy.deepcopy(load_cached(settings_path, _read_toml))
         except FileNotFoundError:
             logger.error("Settings file not found.")
             return {}
@@ -104,12 +146,10 @@ class pic_utils:
         except Exception as e:
             logger.error(f"Failed to update settings: {e}")
 
-    def refresh_proxies(self):
-        proxies_zdaye = get_zdaye_proxies(5)
-        proxies_docip = get_docip_proxies()
-        all_proxies = [proxies_zdaye]
-        all_proxies.extend(proxies_docip)
-        if all_proxies is not None and all_proxies != []:
+    def refresh_proxies(self, probe_url=DEFAULT_PROBE_URL, timeout=5):
+        # 并行获取候选代理，验证后只保存可用代理，按延迟排序
+        all_proxies = validate_proxies(harvest_proxies(5), probe_url=probe_url, timeout=timeout)
+        if all_proxies:
             save_proxies_to_file(all_proxies, self.proxies_path)
         else:
             logger.warning("Failed to update proxies.")